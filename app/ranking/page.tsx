@@ -1,8 +1,9 @@
 'use client';
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useRouter } from 'next/navigation';
 import { getUser, getRecords, getCurrentSession } from '@/lib/storage';
+import { getRankingSnapshot, getUserRanking } from '@/lib/ranking';
 import { User, Record } from '@/lib/types';
 
 type ModeFilter = 'all' | 'simple' | 'color' | 'sprint' | 'dual';
@@ -15,6 +16,9 @@ export default function RankingPage() {
   const [modeFilter, setModeFilter] = useState<ModeFilter>('simple');
   const [typeFilter, setTypeFilter] = useState<TypeFilter>('all');
   const [session, setSession] = useState<{ name: string; date: string } | null>(null);
+  // 事前計算した全記録の中でのベストと順位 (スナップショットが無ければ null)
+  const [userStanding, setUserStanding] = useState<[number, number] | null>(null);
+  const allRecordsRef = useRef<Record[] | null>(null);
 
   useEffect(() => {
     const loadData = async () => {
@@ -27,12 +31,6 @@ export default function RankingPage() {
       }
       setUser(currentUser);
       
-      // 全記録を取得
-      const allRecords = await getRecords();
-      console.log('📊 取得した全記録数:', allRecords.length);
-      console.log('📋 取得したデータ:', allRecords);
-      setRecords(allRecords);
-      
       // セッション情報を取得
       const sessionData = await getCurrentSession();
       setSession(sessionData);
@@ -41,6 +39,47 @@ export default function RankingPage() {
     loadData();
   }, [router]);
 
+  useEffect(() => {
+    let cancelled = false;
+    const loadRecords = async () => {
+      // 事前計算したランキング (python3 -m shimane_records.ranking) があれば、選んだモードの上位だけを読む
+      const snapshot = await getRankingSnapshot(modeFilter, typeFilter);
+      if (snapshot) {
+        console.log('📊 ランキングのスナップショット:', snapshot.length, '件');
+        if (!cancelled) setRecords(snapshot);
+        return;
+      }
+
+      // 無ければ全記録を取得 (1回だけ)
+      if (!allRecordsRef.current) {
+        const allRecords = await getRecords();
+        console.log('📊 取得した全記録数:', allRecords.length);
+        console.log('📋 取得したデータ:', allRecords);
+        allRecordsRef.current = allRecords;
+      }
+      if (!cancelled) setRecords(allRecordsRef.current);
+    };
+
+    loadRecords();
+    return () => {
+      cancelled = true;
+    };
+  }, [modeFilter, typeFilter]);
+
+  useEffect(() => {
+    if (!user) return;
+    let cancelled = false;
+    const loadStanding = async () => {
+      // トップ50に入っていなくても順位がわかる (ユーザー別のファイルを1つだけ読む)
+      const ranking = await getUserRanking(user.id);
+      if (!cancelled) setUserStanding(ranking?.[modeFilter]?.[typeFilter] ?? null);
+    };
+
+    loadStanding();
+    return () => {
+      cancelled = true;
+    };
+  }, [user, modeFilter, typeFilter]);
 
   // フィルタリングとソート
   const filteredRecords = records
@@ -52,8 +91,10 @@ export default function RankingPage() {
     .sort((a, b) => a.reactionTime - b.reactionTime)
     .slice(0, 50); // トップ50まで
 
-  // ユーザーの順位を見つける
-  const userRank = user
+  // ユーザーの順位を見つける (事前計算が無ければ表示中のトップ50から)
+  const userRank = userStanding
+    ? userStanding[1]
+    : user
     ? filteredRecords.findIndex((r) => r.userId === user.id) + 1
     : 0;
 
@@ -61,6 +102,8 @@ export default function RankingPage() {
     ? filteredRecords.find((r) => r.userId === user.id)
     : null;
 
+  const userBestTime = userStanding ? userStanding[0] : userBestRecord?.reactionTime;
+
   const getMedalEmoji = (rank: number) => {
     if (rank === 1) return '🥇';
     if (rank === 2) return '🥈';
@@ -106,7 +149,7 @@ export default function RankingPage() {
       </div>
 
       {/* ユーザーの記録 */}
-      {user && userBestRecord && (
+      {user && userBestTime !== undefined && (
         <div className="bg-gradient-to-r from-yellow-400 to-yellow-500 rounded-xl shadow-lg p-6 mb-6 text-white">
           <div className="flex items-center justify-between">
             <div>
@@ -116,7 +159,7 @@ export default function RankingPage() {
             <div className="text-right">
               <p className="text-sm opacity-80 mb-1">ベスト記録</p>
               <p className="text-4xl font-bold">
-                {(userBestRecord.reactionTime / 1000).toFixed(3)}
+                {(userBestTime / 1000).toFixed(3)}
                 <span className="text-xl">s</span>
               </p>
             </div>
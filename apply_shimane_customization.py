@@ -5,142 +5,178 @@
 """
 
 import os
-import re
 from pathlib import Path
 
-def read_file(filepath):
-    """ファイルを読み込む"""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return f.read()
+from shimane_pipeline import bytepath, discover, rules, tsx
+from shimane_pipeline.backups import BackupStore
+from shimane_pipeline.rewrite import LiteralSet, RuleSet
+from shimane_pipeline.runner import build_parser, preview_transforms, run_transforms
 
-def write_file(filepath, content):
-    """ファイルに書き込む"""
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(content)
+# ⑪ ミリ秒の式 → 秒に直した式
+SECONDS_EXPRESSIONS = {
+    'time': '(time/1000).toFixed(3)',
+    'reaction': '(reaction/1000).toFixed(3)',
+    'stats.average': '(stats.average/1000).toFixed(3)',
+    'stats.stdDev': '(stats.stdDev/1000).toFixed(3)',
+}
 
-def modify_layout_tsx(content):
-    """app/layout.tsx の修正 (①②⑥⑦)"""
-    print("📝 app/layout.tsx を修正中...")
-    
+# ⑪ 元のページの書き方 ({time}ms など) の変換
+# これで何も変わらなかったページだけ、{式}ms の子 (式の前後に空白があるものなど) を tsx の索引で探す
+SECONDS_RULES = RuleSet([
+    rules.rule('unit.time', r'{(time/1000).toFixed(3)}s'),
+    rules.rule('unit.reaction', r'{(reaction/1000).toFixed(3)}s'),
+    rules.rule('unit.stats_average', r'{(stats.average/1000).toFixed(3)}s'),
+    rules.rule('unit.stats_stddev', r'{(stats.stdDev/1000).toFixed(3)}s'),
+], name='customization.seconds')
+
+# app/layout.tsx の文言の置換 (①②⑥⑦)
+# 固定文字列の置換なので、互いに干渉しないことを確かめた LiteralSet にまとめて適用する
+LAYOUT_LITERALS = LiteralSet([
     # ① タイトル変更
-    content = content.replace(
-        '⚡ リアクショントレーニングシステム',
-        '⚡リアクショントレーニングシステム⚡<br />⛰️島根県大田市限定版⛰️'
-    )
+    ('layout.title',
+     '⚡ リアクショントレーニングシステム',
+     '⚡リアクショントレーニングシステム⚡<br />⛰️島根県大田市限定版⛰️'),
     
     # ② 説明文に改行追加
-    content = content.replace(
-        '本システムは2025年11月9日開催の島根県大田市と学校法人日本体育大学の自治体連携協定推進事業に際して作成されました。',
-        '本システムは2025年11月9日開催の<br />島根県大田市と学校法人日本体育大学の<br />自治体連携協定推進事業に際して作成されました。'
-    )
+    ('layout.description',
+     '本システムは2025年11月9日開催の島根県大田市と学校法人日本体育大学の自治体連携協定推進事業に際して作成されました。',
+     '本システムは2025年11月9日開催の<br />島根県大田市と学校法人日本体育大学の<br />自治体連携協定推進事業に際して作成されました。'),
     
     # ⑥ フッターテキスト変更
-    content = content.replace(
-        '認知・判断・行動を科学的にトレーニング',
-        '島根県大田市内の方々にご利用いただけます'
-    )
+    ('layout.footer',
+     '認知・判断・行動を科学的にトレーニング',
+     '島根県大田市内の方々にご利用いただけます'),
     
     # ⑦ コピーライト変更
-    content = content.replace(
-        '© 2025 島根県大田市 × 学校法人日本体育大学 自治体連携協定推進事業',
-        'Built by Kedo Bot and Yuzu Bot / NSSU'
-    )
+    ('layout.copyright',
+     '© 2025 島根県大田市 × 学校法人日本体育大学 自治体連携協定推進事業',
+     'Built by Kedo Bot and Yuzu Bot / NSSU'),
+], name='customization.layout')
+
+@discover.requires(*LAYOUT_LITERALS.literals())
+def modify_layout_tsx(content):
+    """app/layout.tsx の修正 (①②⑥⑦)"""
+    print("📝 app/layout.tsx を修正中...")
+    
+    content = LAYOUT_LITERALS.apply(content)
     
     print("✅ app/layout.tsx の修正完了")
     return content
 
+@bytepath.variant(modify_layout_tsx)
+def modify_layout_tsx_bytes(buffer):
+    """modify_layout_tsx のバイト列版 (--mmap)"""
+    print("📝 app/layout.tsx を修正中...")
+    edits = LAYOUT_LITERALS.byte_edits(buffer)
+    print("✅ app/layout.tsx の修正完了")
+    return edits
+
+@discover.requires('シンプル反応', 'NEW!', 'みんなの記録を見て、目標を立てよう！')
 def modify_page_tsx(content):
     """app/page.tsx の修正 (③④⑤)"""
     print("📝 app/page.tsx を修正中...")
     
+    # 元のページそのままの空白で書かれた部分は固定文字列で置き換える
+    # 固定文字列が一致せず、文言は残っている編集だけ、インデントなどが違うものを索引で探す
+    rename = False
+    
     # ③ シンプル反応に「判断」追加
-    content = content.replace(
-        '<h3 className="text-xl font-bold text-gray-800 mb-2 group-hover:text-blue-600">\n              シンプル反応\n            </h3>\n            <p className="text-sm text-gray-600 mb-3">\n              シグナルに反応する速さを測定',
-        '<h3 className="text-xl font-bold text-gray-800 mb-2 group-hover:text-blue-600">\n              シンプル反応・判断\n            </h3>\n            <p className="text-sm text-gray-600 mb-3">\n              シグナルに反応する速さを測定'
-    )
+    # (見出しの文言はページの前の方にあるので先に in で確かめ、無ければ置換もしない)
+    if 'シンプル反応' in content:
+        replaced = content.replace(
+            '<h3 className="text-xl font-bold text-gray-800 mb-2 group-hover:text-blue-600">\n              シンプル反応\n            </h3>\n            <p className="text-sm text-gray-600 mb-3">\n              シグナルに反応する速さを測定',
+            '<h3 className="text-xl font-bold text-gray-800 mb-2 group-hover:text-blue-600">\n              シンプル反応・判断\n            </h3>\n            <p className="text-sm text-gray-600 mb-3">\n              シグナルに反応する速さを測定'
+        )
+        rename = replaced == content
+        content = replaced
     
     # ④ デュアルタスクから「NEW!」削除
-    content = re.sub(
-        r'<span className="bg-purple-100 text-purple-700 px-2 py-1 rounded text-xs font-bold">NEW!</span>',
-        '',
-        content
+    replaced = content.replace(
+        '<span className="bg-purple-100 text-purple-700 px-2 py-1 rounded text-xs font-bold">NEW!</span>',
+        ''
     )
+    remove_badge = replaced == content and 'NEW!' in content
+    content = replaced
     
     # ⑤ ランキングセクション簡略化
-    content = content.replace(
+    replaced = content.replace(
         '<p className="text-sm text-gray-700 mt-1">\n                みんなの記録を見て、目標を立てよう！\n              </p>',
         ''
     )
+    remove_note = replaced == content and 'みんなの記録を見て' in content
+    content = replaced
+    
+    # 索引は1回だけ作って編集をまとめて適用する (どの編集の候補も残っていなければ索引は作らない)
+    if rename or remove_badge or remove_note:
+        patch = tsx.edit(content)
+        
+        # ③ シンプル反応に「判断」追加
+        if rename:
+            tsx.rename_heading(patch, 'シンプル反応', 'シンプル反応・判断', description='シグナルに反応する速さを測定')
+        
+        # ④ デュアルタスクから「NEW!」削除
+        if remove_badge:
+            tsx.remove_elements(patch, 'span', text='NEW!')
+        
+        # ⑤ ランキングセクション簡略化
+        if remove_note:
+            tsx.remove_elements(patch, 'p', text='みんなの記録を見て、目標を立てよう！')
+        
+        content = patch.apply()
     
     print("✅ app/page.tsx の修正完了")
     return content
 
+def to_seconds(content):
+    """⑪ {式}ms の子を秒に直す (元の書き方のルールで変わらなかったときだけ索引で探す)"""
+    converted = SECONDS_RULES.apply(content)
+    if converted != content:
+        return converted
+    patch = tsx.edit(content)
+    tsx.convert_ms_children(patch, SECONDS_EXPRESSIONS)
+    return patch.apply()
+
+@discover.requires('}ms')
 def modify_simple_page(content):
     """app/simple/page.tsx の修正 (⑪)"""
     print("📝 app/simple/page.tsx を修正中...")
     
     # ⑪ 表示単位を ms → s に変更 (すべてのパターン)
-    # パターン1: {time}ms
-    content = re.sub(r'{time}ms', r'{(time/1000).toFixed(3)}s', content)
-    content = re.sub(r'{reaction}ms', r'{(reaction/1000).toFixed(3)}s', content)
-    
-    # パターン2: 平均反応時間の表示
-    content = re.sub(
-        r'{stats\.average}ms',
-        r'{(stats.average/1000).toFixed(3)}s',
-        content
-    )
-    
-    # パターン3: 標準偏差の表示（既に修正済みかもしれない）
-    if '(stats.stdDev/1000).toFixed(3)' not in content:
-        content = re.sub(
-            r'{stats\.stdDev}ms',
-            r'{(stats.stdDev/1000).toFixed(3)}s',
-            content
-        )
+    # {time}ms / {reaction}ms / {stats.average}ms / {stats.stdDev}ms の子を変換
+    # (変換済みの {(stats.stdDev/1000).toFixed(3)}s は対象の式に一致しないので触らない)
+    content = to_seconds(content)
     
     print("✅ app/simple/page.tsx の修正完了")
     return content
 
+@discover.requires('className="w-[150px] h-[150px]', '}ms')
 def modify_color_page(content):
     """app/color/page.tsx の修正 (⑩⑪)"""
     print("📝 app/color/page.tsx を修正中...")
     
     # ⑩ 表示サイズをデュアルと統一
     # カラーページのシグナル表示を150px→200pxに変更
-    content = re.sub(
-        r'(className="w-\[)150(px\] h-\[)150(px\])',
-        r'\g<1>200\g<2>200\g<3>',
-        content
-    )
+    content = rules.sub('color.signal_size', r'\g<1>200\g<2>200\g<3>', content)
     
     # ⑪ 表示単位を ms → s に変更
-    content = re.sub(r'{time}ms', r'{(time/1000).toFixed(3)}s', content)
-    content = re.sub(r'{reaction}ms', r'{(reaction/1000).toFixed(3)}s', content)
-    content = re.sub(r'{stats\.average}ms', r'{(stats.average/1000).toFixed(3)}s', content)
-    
-    if '(stats.stdDev/1000).toFixed(3)' not in content:
-        content = re.sub(r'{stats\.stdDev}ms', r'{(stats.stdDev/1000).toFixed(3)}s', content)
+    content = to_seconds(content)
     
     print("✅ app/color/page.tsx の修正完了")
     return content
 
+@discover.requires('}ms')
 def modify_dual_page(content):
     """app/dual/page.tsx の修正 (⑩⑪)"""
     print("📝 app/dual/page.tsx を修正中...")
     
     # ⑩ 表示サイズは既に200pxのはずなので確認のみ
     # ⑪ 表示単位を ms → s に変更
-    content = re.sub(r'{time}ms', r'{(time/1000).toFixed(3)}s', content)
-    content = re.sub(r'{reaction}ms', r'{(reaction/1000).toFixed(3)}s', content)
-    content = re.sub(r'{stats\.average}ms', r'{(stats.average/1000).toFixed(3)}s', content)
-    
-    if '(stats.stdDev/1000).toFixed(3)' not in content:
-        content = re.sub(r'{stats\.stdDev}ms', r'{(stats.stdDev/1000).toFixed(3)}s', content)
+    content = to_seconds(content)
     
     print("✅ app/dual/page.tsx の修正完了")
     return content
 
+@discover.requires('講座', 'session')
 def modify_ranking_page(content):
     """app/ranking/page.tsx の修正 (⑧)"""
     print("📝 app/ranking/page.tsx を修正中...")
@@ -170,7 +206,35 @@ def modify_ranking_page(content):
     print("✅ app/ranking/page.tsx の修正完了")
     return content
 
+def stage_tasks():
+    """このスクリプトの (ファイルパス, 変換関数) のリスト (python3 -m shimane_pipeline からも使う)"""
+    return [
+        ('app/layout.tsx', modify_layout_tsx),         # 1. (①②⑥⑦)
+        ('app/page.tsx', modify_page_tsx),             # 2. (③④⑤)
+        ('app/simple/page.tsx', modify_simple_page),   # 3. (⑪)
+        ('app/color/page.tsx', modify_color_page),     # 4. (⑩⑪)
+        ('app/dual/page.tsx', modify_dual_page),       # 5. (⑩⑪)
+        ('app/ranking/page.tsx', modify_ranking_page), # 6. (⑧)
+    ]
+
+def remove_sprint_mode():
+    """スプリントモード削除 (⑨)"""
+    print("\n📝 スプリントモード削除中...")
+    sprint_dir = Path('app/sprint')
+    if sprint_dir.exists():
+        import shutil
+        shutil.rmtree(sprint_dir)
+        print("✅ app/sprint/ フォルダを削除しました")
+    else:
+        print("ℹ️  app/sprint/ は既に存在しません")
+
 def main():
+    args = build_parser("島根県大田市カスタマイズ - 11項目修正スクリプト").parse_args()
+    if args.dry_run:
+        # 書き込まずに diff だけを表示する (バックアップ・スプリントモード削除も行わない)
+        preview_transforms(stage_tasks(), jobs=args.jobs, profile=args.profile)
+        return
+    
     print("=" * 60)
     print("🎯 島根県大田市カスタマイズ - 11項目修正スクリプト")
     print("=" * 60)
@@ -182,77 +246,25 @@ def main():
         print("   プロジェクトのルートディレクトリで実行してください")
         return
     
-    # バックアップディレクトリ作成
-    backup_dir = Path('backup_before_shimane')
-    backup_dir.mkdir(exist_ok=True)
-    print(f"💾 バックアップを {backup_dir}/ に作成中...")
-    
-    files_to_modify = [
-        'app/layout.tsx',
-        'app/page.tsx',
-        'app/simple/page.tsx',
-        'app/color/page.tsx',
-        'app/dual/page.tsx',
-        'app/ranking/page.tsx',
-    ]
-    
-    # バックアップ作成
-    for filepath in files_to_modify:
-        if os.path.exists(filepath):
-            backup_path = backup_dir / filepath.replace('/', '_')
-            content = read_file(filepath)
-            write_file(backup_path, content)
+    # 対象ファイル
+    tasks = stage_tasks()
+    files_to_modify = [filepath for filepath, _ in tasks]
     
-    print("✅ バックアップ完了\n")
+    # バックアップ作成 (内容が同じファイルは保存済みのものを共有する)
+    print("💾 バックアップを作成中...")
+    snapshot_id = BackupStore().snapshot(files_to_modify, 'before_shimane')
+    print(f"✅ バックアップ完了 ({snapshot_id})\n")
     
     # 修正実行
     print("🔧 修正を適用中...\n")
     
-    # 1. app/layout.tsx (①②⑥⑦)
-    if os.path.exists('app/layout.tsx'):
-        content = read_file('app/layout.tsx')
-        content = modify_layout_tsx(content)
-        write_file('app/layout.tsx', content)
-    
-    # 2. app/page.tsx (③④⑤)
-    if os.path.exists('app/page.tsx'):
-        content = read_file('app/page.tsx')
-        content = modify_page_tsx(content)
-        write_file('app/page.tsx', content)
-    
-    # 3. app/simple/page.tsx (⑪)
-    if os.path.exists('app/simple/page.tsx'):
-        content = read_file('app/simple/page.tsx')
-        content = modify_simple_page(content)
-        write_file('app/simple/page.tsx', content)
-    
-    # 4. app/color/page.tsx (⑩⑪)
-    if os.path.exists('app/color/page.tsx'):
-        content = read_file('app/color/page.tsx')
-        content = modify_color_page(content)
-        write_file('app/color/page.tsx', content)
-    
-    # 5. app/dual/page.tsx (⑩⑪)
-    if os.path.exists('app/dual/page.tsx'):
-        content = read_file('app/dual/page.tsx')
-        content = modify_dual_page(content)
-        write_file('app/dual/page.tsx', content)
-    
-    # 6. app/ranking/page.tsx (⑧)
-    if os.path.exists('app/ranking/page.tsx'):
-        content = read_file('app/ranking/page.tsx')
-        content = modify_ranking_page(content)
-        write_file('app/ranking/page.tsx', content)
+    if not run_transforms(tasks, jobs=args.jobs, incremental=args.incremental, profile=args.profile,
+                          mapped=args.mmap, validate_output=not args.no_validate):
+        print(f"\n💾 ファイルは変更していません (バックアップ: スナップショット {snapshot_id})")
+        return
     
     # 7. スプリントモード削除 (⑨)
-    print("\n📝 スプリントモード削除中...")
-    sprint_dir = Path('app/sprint')
-    if sprint_dir.exists():
-        import shutil
-        shutil.rmtree(sprint_dir)
-        print("✅ app/sprint/ フォルダを削除しました")
-    else:
-        print("ℹ️  app/sprint/ は既に存在しません")
+    remove_sprint_mode()
     
     print("\n" + "=" * 60)
     print("✨ 修正完了！")
@@ -274,7 +286,8 @@ def main():
     print("  2. git add .")
     print("  3. git commit -m 'feat: 島根県大田市カスタマイズ適用'")
     print("  4. git push")
-    print("\n💾 バックアップ: backup_before_shimane/ フォルダに保存されています")
+    print(f"\n💾 バックアップ: スナップショット {snapshot_id}")
+    print(f"   元に戻す: python3 -m shimane_pipeline.backups restore {snapshot_id}")
     print()
 
 if __name__ == '__main__':
@@ -5,49 +5,87 @@
 """
 
 import os
-import re
-from pathlib import Path
+from functools import partial
 
-def read_file(filepath):
-    """ファイルを読み込む"""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return f.read()
+from shimane_pipeline import discover, rules, structure, tsx
+from shimane_pipeline.backups import BackupStore
+from shimane_pipeline.rewrite import ConvergenceError, LiteralSet, RuleSet
+from shimane_pipeline.runner import build_parser, preview_transforms, run_transforms
 
-def write_file(filepath, content):
-    """ファイルに書き込む"""
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(content)
+# トレーニングページの単位変換ルール (⑪)
+TRAINING_UNIT_RULES = RuleSet([
+    # パターン1: 直接的な time 変数
+    rules.rule('unit.time_b', r'{(time/1000).toFixed(3)}s'),
+    rules.rule('unit.reaction_b', r'{(reaction/1000).toFixed(3)}s'),
+    
+    # パターン2: stats.average
+    rules.rule('unit.stats_average_b', r'{(stats.average/1000).toFixed(3)}s'),
+    
+    # パターン3: stats.stdDev (既に変換済みのファイルではスキップ)
+    rules.rule('unit.stats_stddev_b', r'{(stats.stdDev/1000).toFixed(3)}s',
+               unless='(stats.stdDev/1000).toFixed(3)'),
+    
+    # パターン4: 個別の試行結果 (配列内)
+    rules.rule('unit.r_time_b', r'{(r.time/1000).toFixed(3)}s'),
+    rules.rule('unit.r_reaction_b', r'{(r.reaction/1000).toFixed(3)}s'),
+    
+    # パターン5: result.time や result.avgTime
+    rules.rule('unit.result_time_b', r'{(result.time/1000).toFixed(3)}s'),
+    rules.rule('unit.result_avg_time_b', r'{(result.avgTime/1000).toFixed(3)}s'),
+    
+    # 既に変換されているが、単位が ms のままのパターンを修正
+    rules.rule('unit.time_fixup', r'(time/1000).toFixed(3)}s'),
+    rules.rule('unit.reaction_fixup', r'(reaction/1000).toFixed(3)}s'),
+    rules.rule('unit.stats_average_fixup', r'(stats.average/1000).toFixed(3)}s'),
+], name='v2.training_units')
+
+# app/page.tsx の元のページそのままの空白で書かれた部分の置換 (③)
+# 一致しなかったときだけ、インデントなどが違うものを fix_page_tsx で tsx の索引を使って探す
+# タイトルを「シンプル反応」に戻す
+HEADING_LITERALS = LiteralSet([
+    ('page.simple_heading',
+     '<h3 className="text-xl font-bold text-gray-800 mb-2 group-hover:text-blue-600">\n              シンプル反応・判断\n            </h3>',
+     '<h3 className="text-xl font-bold text-gray-800 mb-2 group-hover:text-blue-600">\n              シンプル反応\n            </h3>'),
+], name='v2.heading_literals')
 
+# バッジを「認知」「判断」「行動」の3つに
+BADGE_LITERALS = LiteralSet([
+    ('page.badges',
+     '<div className="flex items-center space-x-2">\n              <span className="bg-red-100 text-red-700 px-2 py-1 rounded text-xs">認知</span>\n              <span className="bg-green-100 text-green-700 px-2 py-1 rounded text-xs">行動</span>\n            </div>',
+     '<div className="flex items-center space-x-2">\n              <span className="bg-red-100 text-red-700 px-2 py-1 rounded text-xs">認知</span>\n              <span className="bg-blue-100 text-blue-700 px-2 py-1 rounded text-xs">判断</span>\n              <span className="bg-green-100 text-green-700 px-2 py-1 rounded text-xs">行動</span>\n            </div>'),
+], name='v2.badge_literals')
+
+# 個別に修正するページ (トレーニングページの単位変換の対象外)
+NON_TRAINING_PAGES = ('app/page.tsx', 'app/ranking/page.tsx')
+# トレーニングページを処理する順 (ここに無いページはこの後にパスの順で続く)
+TRAINING_PAGES = ('app/simple/page.tsx', 'app/color/page.tsx', 'app/dual/page.tsx')
+
+@discover.requires('シンプル反応', '認知', structure.RANKING_MARKER)
 def fix_page_tsx(content):
     """app/page.tsx の追加修正 (③⑤)"""
     print("📝 app/page.tsx を再修正中...")
     
     # ③ 「シンプル反応・判断」→「シンプル反応」に戻し、バッジに「判断」追加
+    # 元のページそのままの部分は固定文字列で置き換え、一致せず文言は残っているときだけ索引で探す
+    original = content
+    content = HEADING_LITERALS.apply(content)
+    renamed = content
+    content = BADGE_LITERALS.apply(content)
+    patch = tsx.edit(content)
+    
     # まず、タイトルを「シンプル反応」に修正
-    content = re.sub(
-        r'シンプル反応・判断',
-        'シンプル反応',
-        content
-    )
+    if renamed == original and 'シンプル反応・判断' in content:
+        tsx.rename_heading(patch, 'シンプル反応・判断', 'シンプル反応')
     
     # バッジ部分を修正：「認知」「判断」「行動」の3つに
-    old_badges = '''<div className="flex items-center space-x-2">
-              <span className="bg-red-100 text-red-700 px-2 py-1 rounded text-xs">認知</span>
-              <span className="bg-green-100 text-green-700 px-2 py-1 rounded text-xs">行動</span>
-            </div>'''
+    # (見出しは同じ Patch で書き換え中なので、変更前・変更後のどちらの文言でも探す)
+    if content == renamed and '認知' in content:
+        judge_badge = '<span className="bg-blue-100 text-blue-700 px-2 py-1 rounded text-xs">判断</span>'
+        tsx.add_badge(patch, ('シンプル反応', 'シンプル反応・判断'), after='認知', badge='判断', markup=judge_badge)
     
-    new_badges = '''<div className="flex items-center space-x-2">
-              <span className="bg-red-100 text-red-700 px-2 py-1 rounded text-xs">認知</span>
-              <span className="bg-blue-100 text-blue-700 px-2 py-1 rounded text-xs">判断</span>
-              <span className="bg-green-100 text-green-700 px-2 py-1 rounded text-xs">行動</span>
-            </div>'''
-    
-    content = content.replace(old_badges, new_badges)
+    content = patch.apply()
     
     # ⑤ ランキングエリア全体を簡略化
-    # 古いランキングエリアのパターンを探す
-    ranking_pattern = r'(<!-- ランキングエリア -->.*?<div className="bg-gradient-to-r from-yellow-400 to-yellow-500 rounded-2xl shadow-xl p-8 mb-8">)(.*?)(</div>\s*</div>)'
-    
     new_ranking_section = '''<!-- ランキングエリア -->
         <div className="bg-gradient-to-r from-yellow-400 to-yellow-500 rounded-2xl shadow-xl p-8 mb-8">
           <div className="flex items-center justify-between">
@@ -65,136 +103,90 @@ def fix_page_tsx(content):
         </div>'''
     
     # ランキングエリア全体を置き換え
-    content = re.sub(
-        r'<!-- ランキングエリア -->.*?<div className="bg-gradient-to-r from-yellow-400 to-yellow-500 rounded-2xl shadow-xl p-8 mb-8">.*?</div>\s*</div>',
-        new_ranking_section,
-        content,
-        flags=re.DOTALL
-    )
+    content = structure.replace_ranking_box(content, new_ranking_section)
     
     print("✅ app/page.tsx の再修正完了")
     return content
 
+@discover.requires("setMode('sprint')", structure.RESULT_CARD, structure.ACCURACY_LABEL, 'record.avgTime')
 def fix_ranking_page(content):
     """app/ranking/page.tsx の追加修正 (⑨⑩⑪)"""
     print("📝 app/ranking/page.tsx を再修正中...")
     
     # ⑨ スプリントモードの選択肢を削除
-    content = re.sub(
-        r'<button[^>]*onClick=\{\(\) => setMode\(\'sprint\'\)\}[^>]*>.*?スプリント.*?</button>',
-        '',
-        content,
-        flags=re.DOTALL
-    )
+    # 元のパターンで消えなかったときだけ索引で探す
+    removed = rules.sub('ranking.sprint_button', '', content)
+    if removed != content:
+        content = removed
+    else:
+        patch = tsx.edit(content)
+        tsx.remove_elements(patch, 'button', onClick="() => setMode('sprint')")
+        content = patch.apply()
     
     # ⑩ カラーとデュアルの表示を統一（秒数と正確率を同じサイズで）
     # "text-3xl" → "text-xl" に変更して統一
     # カラーモードの結果表示部分
-    content = re.sub(
-        r'(<div className="bg-white rounded-lg p-4">.*?カラー判断.*?<p className="text-xs text-gray-500 mb-2">平均反応時間</p>.*?<p className=")(text-3xl|text-2xl)(.*?font-bold text-blue-600">)',
-        r'\1text-xl\3',
-        content,
-        flags=re.DOTALL
-    )
-    
-    content = re.sub(
-        r'(<p className="text-xs text-gray-500 mb-2">正確率</p>.*?<p className=")(text-3xl|text-2xl)(.*?font-bold text-green-600">)',
-        r'\1text-xl\3',
-        content,
-        flags=re.DOTALL
-    )
+    content = structure.resize_card_value(content, 'カラー判断', 'text-blue-600')
     
     # デュアルタスクの結果表示部分
-    content = re.sub(
-        r'(<div className="bg-white rounded-lg p-4">.*?デュアルタスク.*?<p className="text-xs text-gray-500 mb-2">平均反応時間</p>.*?<p className=")(text-3xl|text-2xl)(.*?font-bold text-purple-600">)',
-        r'\1text-xl\3',
-        content,
-        flags=re.DOTALL
-    )
+    content = structure.resize_card_value(content, 'デュアルタスク', 'text-purple-600')
     
-    content = re.sub(
-        r'(<p className="text-xs text-gray-500 mb-2">正確率</p>.*?<p className=")(text-3xl|text-2xl)(.*?font-bold text-green-600">)',
-        r'\1text-xl\3',
-        content,
-        flags=re.DOTALL
-    )
+    # 正確率の表示部分 (カラー・デュアル共通)
+    content = structure.resize_accuracy_value(content, 'text-green-600')
     
     # ⑪ ランキングページの表示単位を ms → s に変更
     # 既に toFixed(3) がある場合はスキップ
     if '.toFixed(3)' not in content:
         # record.avgTimeをミリ秒から秒に変換
-        content = re.sub(
-            r'{record\.avgTime}ms',
-            r'{(record.avgTime / 1000).toFixed(3)}s',
-            content
-        )
-        
-        content = re.sub(
-            r'{record\.avgTime}',
-            r'{(record.avgTime / 1000).toFixed(3)}',
-            content
-        )
+        content = rules.sub('ranking.avg_time_ms', r'{(record.avgTime / 1000).toFixed(3)}s', content)
+        content = rules.sub('ranking.avg_time', r'{(record.avgTime / 1000).toFixed(3)}', content)
     
     # すでに変換されているパターンも確認
     # パターン: (record.avgTime/1000).toFixed(3) があれば、単位が s になっているか確認
-    content = re.sub(
-        r'\(record\.avgTime/1000\)\.toFixed\(3\)\}ms',
-        r'(record.avgTime/1000).toFixed(3)}s',
-        content
-    )
+    content = rules.sub('ranking.avg_time_fixup', r'(record.avgTime/1000).toFixed(3)}s', content)
     
     print("✅ app/ranking/page.tsx の再修正完了")
     return content
 
+@discover.requires('}ms')
 def fix_all_training_pages(filepath, content):
     """全トレーニングページの表示単位を秒に統一 (⑪)"""
     print(f"📝 {filepath} の単位を秒に統一中...")
     
-    # 既に toFixed(3) が含まれている場合はスキップのパターンもある
     # すべての {time}ms, {reaction}ms パターンを変換
-    
-    # パターン1: 直接的な time 変数
-    content = re.sub(r'{time}ms\b', r'{(time/1000).toFixed(3)}s', content)
-    content = re.sub(r'{reaction}ms\b', r'{(reaction/1000).toFixed(3)}s', content)
-    
-    # パターン2: stats.average
-    content = re.sub(r'{stats\.average}ms\b', r'{(stats.average/1000).toFixed(3)}s', content)
-    
-    # パターン3: stats.stdDev
-    if '(stats.stdDev/1000).toFixed(3)' not in content:
-        content = re.sub(r'{stats\.stdDev}ms\b', r'{(stats.stdDev/1000).toFixed(3)}s', content)
-    
-    # パターン4: 個別の試行結果 (配列内)
-    content = re.sub(r'{r\.time}ms\b', r'{(r.time/1000).toFixed(3)}s', content)
-    content = re.sub(r'{r\.reaction}ms\b', r'{(r.reaction/1000).toFixed(3)}s', content)
-    
-    # パターン5: result.time や result.avgTime
-    content = re.sub(r'{result\.time}ms\b', r'{(result.time/1000).toFixed(3)}s', content)
-    content = re.sub(r'{result\.avgTime}ms\b', r'{(result.avgTime/1000).toFixed(3)}s', content)
-    
-    # 既に変換されているが、単位が ms のままのパターンを修正
-    content = re.sub(
-        r'\(time/1000\)\.toFixed\(3\)\}ms',
-        r'(time/1000).toFixed(3)}s',
-        content
-    )
-    
-    content = re.sub(
-        r'\(reaction/1000\)\.toFixed\(3\)\}ms',
-        r'(reaction/1000).toFixed(3)}s',
-        content
-    )
-    
-    content = re.sub(
-        r'\(stats\.average/1000\)\.toFixed\(3\)\}ms',
-        r'(stats.average/1000).toFixed(3)}s',
-        content
-    )
+    # TRAINING_UNIT_RULES を、書き換えた結果に再びマッチしなくなるまで適用する
+    # (2回目以降は書き換えた範囲の周りだけを走査する)
+    try:
+        content = TRAINING_UNIT_RULES.fixpoint(content)
+    except ConvergenceError as e:
+        print(f"⚠️  {filepath}: 単位の変換が収束しないので変更しません ({e})")
+        return content
     
     print(f"✅ {filepath} の単位統一完了")
     return content
 
+def stage_tasks():
+    """このスクリプトの (ファイルパス, 変換関数) のリスト (python3 -m shimane_pipeline からも使う)"""
+    # トレーニングページ: app/ 以下の page.tsx のうち、トップとランキング以外
+    training_pages = discover.find('app/**/page.tsx', exclude=NON_TRAINING_PAGES, first=TRAINING_PAGES)
+    
+    tasks = [
+        # 1. app/page.tsx (③⑤)
+        ('app/page.tsx', fix_page_tsx),
+        # 2. app/ranking/page.tsx (⑨⑩⑪)
+        ('app/ranking/page.tsx', fix_ranking_page),
+    ]
+    # 3. 全トレーニングページ (⑪)
+    tasks += [(filepath, partial(fix_all_training_pages, filepath)) for filepath in training_pages]
+    return tasks
+
 def main():
+    args = build_parser("島根県大田市カスタマイズ - 追加修正スクリプト v2").parse_args()
+    if args.dry_run:
+        # 書き込まずに diff だけを表示する (バックアップも作らない)
+        preview_transforms(stage_tasks(), jobs=args.jobs, profile=args.profile)
+        return
+    
     print("=" * 60)
     print("🎯 島根県大田市カスタマイズ - 追加修正スクリプト v2")
     print("=" * 60)
@@ -206,55 +198,22 @@ def main():
         print("   プロジェクトのルートディレクトリで実行してください")
         return
     
-    # バックアップディレクトリ作成
-    backup_dir = Path('backup_v2')
-    backup_dir.mkdir(exist_ok=True)
-    print(f"💾 バックアップを {backup_dir}/ に作成中...")
-    
-    files_to_modify = [
-        'app/page.tsx',
-        'app/ranking/page.tsx',
-        'app/simple/page.tsx',
-        'app/color/page.tsx',
-        'app/dual/page.tsx',
-    ]
-    
-    # バックアップ作成
-    for filepath in files_to_modify:
-        if os.path.exists(filepath):
-            backup_path = backup_dir / filepath.replace('/', '_')
-            content = read_file(filepath)
-            write_file(backup_path, content)
+    # 対象ファイル (トレーニングページは app/ 以下から探す)
+    tasks = stage_tasks()
+    files_to_modify = [filepath for filepath, _ in tasks]
     
-    print("✅ バックアップ完了\n")
+    # バックアップ作成 (内容が同じファイルは保存済みのものを共有する)
+    print("💾 バックアップを作成中...")
+    snapshot_id = BackupStore().snapshot(files_to_modify, 'v2')
+    print(f"✅ バックアップ完了 ({snapshot_id})\n")
     
     # 修正実行
     print("🔧 修正を適用中...\n")
     
-    # 1. app/page.tsx (③⑤)
-    if os.path.exists('app/page.tsx'):
-        content = read_file('app/page.tsx')
-        content = fix_page_tsx(content)
-        write_file('app/page.tsx', content)
-    
-    # 2. app/ranking/page.tsx (⑨⑩⑪)
-    if os.path.exists('app/ranking/page.tsx'):
-        content = read_file('app/ranking/page.tsx')
-        content = fix_ranking_page(content)
-        write_file('app/ranking/page.tsx', content)
-    
-    # 3. 全トレーニングページの単位統一 (⑪)
-    training_pages = [
-        'app/simple/page.tsx',
-        'app/color/page.tsx',
-        'app/dual/page.tsx',
-    ]
-    
-    for filepath in training_pages:
-        if os.path.exists(filepath):
-            content = read_file(filepath)
-            content = fix_all_training_pages(filepath, content)
-            write_file(filepath, content)
+    if not run_transforms(tasks, jobs=args.jobs, incremental=args.incremental, profile=args.profile,
+                          mapped=args.mmap, validate_output=not args.no_validate):
+        print(f"\n💾 ファイルは変更していません (バックアップ: スナップショット {snapshot_id})")
+        return
     
     print("\n" + "=" * 60)
     print("✨ 追加修正完了！")
@@ -270,7 +229,8 @@ def main():
     print("  2. git add .")
     print("  3. git commit -m 'fix: 島根県大田市カスタマイズ追加修正'")
     print("  4. git push")
-    print("\n💾 バックアップ: backup_v2/ フォルダに保存されています")
+    print(f"\n💾 バックアップ: スナップショット {snapshot_id}")
+    print(f"   元に戻す: python3 -m shimane_pipeline.backups restore {snapshot_id}")
     print()
 
 if __name__ == '__main__':
@@ -5,51 +5,86 @@
 """
 
 import os
-import re
-from pathlib import Path
+from functools import partial
 
-def read_file(filepath):
-    """ファイルを読み込む"""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return f.read()
+from shimane_pipeline import bytepath, discover, rules, structure, tsx
+from shimane_pipeline.backups import BackupStore
+from shimane_pipeline.rewrite import ConvergenceError, LiteralSet, RuleSet
+from shimane_pipeline.runner import build_parser, preview_transforms, run_transforms
 
-def write_file(filepath, content):
-    """ファイルに書き込む"""
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(content)
+# トレーニングページの単位変換ルール (⑪)
+TRAINING_UNIT_RULES = RuleSet([
+    # 1. 単純な変数参照
+    rules.rule('unit.time', r'{(time/1000).toFixed(3)}s'),
+    rules.rule('unit.reaction', r'{(reaction/1000).toFixed(3)}s'),
+    rules.rule('unit.r_time', r'{(r.time/1000).toFixed(3)}s'),
+    rules.rule('unit.r_reaction', r'{(r.reaction/1000).toFixed(3)}s'),
+    
+    # 2. stats オブジェクト
+    rules.rule('unit.stats_average', r'{(stats.average/1000).toFixed(3)}s'),
+    rules.rule('unit.stats_stddev', r'{(stats.stdDev/1000).toFixed(3)}s'),
+    
+    # 3. 既に変換されているが単位が ms のままのパターンを修正
+    rules.rule('unit.time_fixup', r'(time/1000).toFixed(3)}s'),
+    rules.rule('unit.reaction_fixup', r'(reaction/1000).toFixed(3)}s'),
+    rules.rule('unit.stats_average_fixup', r'(stats.average/1000).toFixed(3)}s'),
+    rules.rule('unit.stats_stddev_fixup', r'(stats.stdDev/1000).toFixed(3)}s'),
+    
+    # 4. 複数行にまたがるパターン（改行を含む）
+    rules.rule('unit.time_span', r'{(time/1000).toFixed(3)}<span className="text-sm">s</span>'),
+    rules.rule('unit.reaction_span', r'{(reaction/1000).toFixed(3)}<span className="text-sm">s</span>'),
+], name='v3.training_units')
+
+# app/page.tsx の元のページそのままの空白で書かれた見出しの置換 (③)
+# インデントなどが違って一致しなかったものだけを fix_page_tsx で tsx の索引を使って探す
+PAGE_LITERALS = LiteralSet([
+    ('page.simple_heading',
+     '<h3 className="text-xl font-bold text-gray-800 mb-2 group-hover:text-blue-600">\n              シンプル反応・判断\n            </h3>',
+     '<h3 className="text-xl font-bold text-gray-800 mb-2 group-hover:text-blue-600">\n              シンプル反応\n            </h3>'),
+], name='v3.page_literals')
+
+# ③ 「認知」と「行動」の間に入れるバッジ
+JUDGE_BADGES = '''<span className="bg-red-100 text-red-700 px-2 py-1 rounded text-xs">認知</span>
+              <span className="bg-blue-100 text-blue-700 px-2 py-1 rounded text-xs">判断</span>
+              <span className="bg-green-100 text-green-700 px-2 py-1 rounded text-xs">行動</span>'''
+
+# ランキングページの固定文字列の置換
+RANKING_LITERALS = LiteralSet([
+    ('ranking.grid_cols', 'grid-cols-2 md:grid-cols-5', 'grid-cols-2 md:grid-cols-4'),
+], name='v3.ranking_literals')
 
+# 個別に修正するページ (トレーニングページの単位変換の対象外)
+NON_TRAINING_PAGES = ('app/page.tsx', 'app/ranking/page.tsx')
+# トレーニングページを処理する順 (ここに無いページはこの後にパスの順で続く)
+TRAINING_PAGES = ('app/simple/page.tsx', 'app/color/page.tsx', 'app/dual/page.tsx')
+
+@discover.requires('シンプル反応', '認知', structure.RANKING_MARKER)
 def fix_page_tsx(content):
     """app/page.tsx の追加修正 (③⑤)"""
     print("📝 app/page.tsx を再修正中...")
     
     # ③ 「シンプル反応・判断」→「シンプル反応」に戻し、バッジに「判断」追加
-    content = re.sub(
-        r'シンプル反応・判断',
-        'シンプル反応',
-        content
-    )
+    # 元のページそのままの部分は固定文字列と元のパターンで置き換え、一致せず文言は残っているときだけ索引で探す
+    # (元のスクリプトはバッジの置換を HTML コメントの <!-- シンプル反応モード --> がある場合に
+    # 限っていたが、実際のページの JSX コメントには一致しないので、その条件は外している)
+    original = content
+    content = PAGE_LITERALS.apply(content)
+    renamed = content
+    content = rules.sub('page.judge_badge', JUDGE_BADGES, content)
+    patch = tsx.edit(content)
+    if renamed == original and 'シンプル反応・判断' in content:
+        tsx.rename_heading(patch, 'シンプル反応・判断', 'シンプル反応')
     
     # バッジ部分を正確に修正
-    # シンプル反応のバッジ部分を探して置換
-    simple_section = re.search(
-        r'(<!-- シンプル反応モード -->.*?<div className="flex items-center space-x-2">)(.*?)(</div>\s*</button>)',
-        content,
-        re.DOTALL
-    )
+    # シンプル反応のカードで「認知」の後ろに「判断」を追加 (既にあれば何もしない)
+    if content == renamed and '認知' in content:
+        judge_badge = '<span className="bg-blue-100 text-blue-700 px-2 py-1 rounded text-xs">判断</span>'
+        tsx.add_badge(patch, ('シンプル反応', 'シンプル反応・判断'), after='認知', badge='判断', markup=judge_badge)
     
-    if simple_section:
-        # 既存のバッジを削除して新しく追加
-        old_badges_pattern = r'<span className="bg-red-100 text-red-700 px-2 py-1 rounded text-xs">認知</span>\s*<span className="bg-green-100 text-green-700 px-2 py-1 rounded text-xs">行動</span>'
-        new_badges = '''<span className="bg-red-100 text-red-700 px-2 py-1 rounded text-xs">認知</span>
-              <span className="bg-blue-100 text-blue-700 px-2 py-1 rounded text-xs">判断</span>
-              <span className="bg-green-100 text-green-700 px-2 py-1 rounded text-xs">行動</span>'''
-        
-        content = re.sub(old_badges_pattern, new_badges, content)
+    content = patch.apply()
     
     # ⑤ ランキングエリアを完全に書き換え
-    # 古いランキングエリアを探して置換
-    old_ranking = r'<!-- ランキングエリア -->.*?</div>\s*</div>\s*(?=</>)'
-    
+    # ランキングエリアの先頭から、囲んでいるフラグメントの閉じタグ </> の直前までを置換
     new_ranking = '''<!-- ランキングエリア -->
         <div className="bg-gradient-to-r from-yellow-400 to-yellow-500 rounded-2xl shadow-xl p-8 mb-8">
           <div className="flex items-center justify-between">
@@ -67,60 +102,64 @@ def fix_page_tsx(content):
         </div>
         </>'''
     
-    content = re.sub(old_ranking, new_ranking, content, flags=re.DOTALL)
+    content = structure.replace_ranking_to_fragment_end(content, new_ranking)
     
     print("✅ app/page.tsx の再修正完了")
     return content
 
+@discover.requires("setModeFilter('sprint')", 'grid-cols-2 md:grid-cols-5', 'reactionTime', 'filteredRecords')
 def fix_ranking_page_complete(content):
     """app/ranking/page.tsx の完全修正 (⑨⑩⑪)"""
     print("📝 app/ranking/page.tsx を完全修正中...")
     
     # ⑨ スプリントボタンを完全削除
-    sprint_button_pattern = r'<button\s+onClick=\{\(\) => setModeFilter\(\'sprint\'\)\}[^>]*>.*?🏃 スプリント.*?</button>'
-    content = re.sub(sprint_button_pattern, '', content, flags=re.DOTALL)
+    # 元のパターンで消えなかったときだけ索引で探す
+    removed = rules.sub('ranking.sprint_filter_button', '', content)
+    if removed != content:
+        content = removed
+    else:
+        patch = tsx.edit(content)
+        tsx.remove_elements(patch, 'button', onClick="() => setModeFilter('sprint')")
+        content = patch.apply()
     
     # グリッドのクラスを修正 (5列 → 4列)
-    content = content.replace(
-        'grid-cols-2 md:grid-cols-5',
-        'grid-cols-2 md:grid-cols-4'
-    )
+    content = RANKING_LITERALS.apply(content)
     
     # ⑩ カラー・デュアルの表示サイズを統一
     # すべての text-2xl, text-3xl を text-xl に統一
     
     # ⑪ 表示単位を ms → s に変更
     # パターン1: ユーザーのベスト記録
-    content = re.sub(
-        r'<p className="text-4xl font-bold">\s*\{userBestRecord\.reactionTime\}\s*<span className="text-xl">ms</span>',
+    content = rules.sub(
+        'ranking.best_record',
         r'<p className="text-4xl font-bold">\n                {(userBestRecord.reactionTime / 1000).toFixed(3)}\n                <span className="text-xl">s</span>',
         content
     )
     
     # パターン2: ランキングリストの記録表示
-    content = re.sub(
-        r'<p className="text-2xl font-bold text-gray-800">\s*\{record\.reactionTime\}\s*<span className="text-sm text-gray-500 ml-1">ms</span>',
+    content = rules.sub(
+        'ranking.record_time',
         r'<p className="text-xl font-bold text-gray-800">\n                      {(record.reactionTime / 1000).toFixed(3)}\n                      <span className="text-sm text-gray-500 ml-1">s</span>',
         content
     )
     
     # パターン3: 統計情報の平均タイム
-    content = re.sub(
-        r'<p className="text-2xl font-bold">\s*\{Math\.round\(\s*filteredRecords\.reduce\(\(sum, r\) => sum \+ r\.reactionTime, 0\) /\s*filteredRecords\.length\s*\)\}\s*<span className="text-sm">ms</span>',
+    content = rules.sub(
+        'ranking.average',
         r'<p className="text-xl font-bold">\n                {(\n                  filteredRecords.reduce((sum, r) => sum + r.reactionTime, 0) /\n                    filteredRecords.length / 1000\n                ).toFixed(3)}\n                <span className="text-sm">s</span>',
         content
     )
     
     # パターン4: 統計情報の最速記録
-    content = re.sub(
-        r'<p className="text-2xl font-bold">\s*\{filteredRecords\[0\]\.reactionTime \|\| 0\}\s*<span className="text-sm">ms</span>',
+    content = rules.sub(
+        'ranking.fastest',
         r'<p className="text-xl font-bold">\n                {((filteredRecords[0]?.reactionTime || 0) / 1000).toFixed(3)}\n                <span className="text-sm">s</span>',
         content
     )
     
     # パターン5: 参加者数も text-xl に統一
-    content = re.sub(
-        r'<p className="text-2xl font-bold">\s*\{new Set\(filteredRecords\.map\(r => r\.userId\)\)\.size\}人',
+    content = rules.sub(
+        'ranking.participants',
         r'<p className="text-xl font-bold">\n                {new Set(filteredRecords.map(r => r.userId)).size}人',
         content
     )
@@ -128,42 +167,58 @@ def fix_ranking_page_complete(content):
     print("✅ app/ranking/page.tsx の完全修正完了")
     return content
 
+@discover.requires('}ms', '>ms<')
 def fix_training_page_units(filepath, content):
     """トレーニングページの単位を完全に秒に変換 (⑪)"""
     print(f"📝 {filepath} の単位を秒に統一中...")
     
     # すべての {xxx}ms パターンを {(xxx/1000).toFixed(3)}s に変換
-    # パターンを順番に処理
-    
-    # 1. 単純な変数参照
-    patterns = [
-        (r'\{time\}ms', r'{(time/1000).toFixed(3)}s'),
-        (r'\{reaction\}ms', r'{(reaction/1000).toFixed(3)}s'),
-        (r'\{r\.time\}ms', r'{(r.time/1000).toFixed(3)}s'),
-        (r'\{r\.reaction\}ms', r'{(r.reaction/1000).toFixed(3)}s'),
-    ]
-    
-    for pattern, replacement in patterns:
-        content = re.sub(pattern, replacement, content)
-    
-    # 2. stats オブジェクト
-    content = re.sub(r'\{stats\.average\}ms', r'{(stats.average/1000).toFixed(3)}s', content)
-    content = re.sub(r'\{stats\.stdDev\}ms', r'{(stats.stdDev/1000).toFixed(3)}s', content)
-    
-    # 3. 既に変換されているが単位が ms のままのパターンを修正
-    content = re.sub(r'\(time/1000\)\.toFixed\(3\)\}ms', r'(time/1000).toFixed(3)}s', content)
-    content = re.sub(r'\(reaction/1000\)\.toFixed\(3\)\}ms', r'(reaction/1000).toFixed(3)}s', content)
-    content = re.sub(r'\(stats\.average/1000\)\.toFixed\(3\)\}ms', r'(stats.average/1000).toFixed(3)}s', content)
-    content = re.sub(r'\(stats\.stdDev/1000\)\.toFixed\(3\)\}ms', r'(stats.stdDev/1000).toFixed(3)}s', content)
-    
-    # 4. 複数行にまたがるパターン（改行を含む）
-    content = re.sub(r'\{time\}\s*<span[^>]*>ms</span>', r'{(time/1000).toFixed(3)}<span className="text-sm">s</span>', content)
-    content = re.sub(r'\{reaction\}\s*<span[^>]*>ms</span>', r'{(reaction/1000).toFixed(3)}<span className="text-sm">s</span>', content)
+    # TRAINING_UNIT_RULES を、書き換えた結果に再びマッチしなくなるまで適用する
+    # (2回目以降は書き換えた範囲の周りだけを走査する)
+    try:
+        content = TRAINING_UNIT_RULES.fixpoint(content)
+    except ConvergenceError as e:
+        print(f"⚠️  {filepath}: 単位の変換が収束しないので変更しません ({e})")
+        return content
     
     print(f"✅ {filepath} の単位統一完了")
     return content
 
+@bytepath.variant(fix_training_page_units)
+def fix_training_page_units_bytes(filepath, buffer):
+    """fix_training_page_units のバイト列版 (--mmap)
+
+    1回だけ走査する。TRAINING_UNIT_RULES の置換結果には再びマッチしないので、fixpoint と同じ結果になる。
+    """
+    if not TRAINING_UNIT_RULES.byte_safe:
+        return None
+    print(f"📝 {filepath} の単位を秒に統一中...")
+    edits = TRAINING_UNIT_RULES.byte_edits(buffer)
+    print(f"✅ {filepath} の単位統一完了")
+    return edits
+
+def stage_tasks():
+    """このスクリプトの (ファイルパス, 変換関数) のリスト (python3 -m shimane_pipeline からも使う)"""
+    # トレーニングページ: app/ 以下の page.tsx のうち、トップとランキング以外
+    training_pages = discover.find('app/**/page.tsx', exclude=NON_TRAINING_PAGES, first=TRAINING_PAGES)
+    
+    tasks = [
+        # 1. app/page.tsx (③⑤)
+        ('app/page.tsx', fix_page_tsx),
+        # 2. app/ranking/page.tsx (⑨⑩⑪)
+        ('app/ranking/page.tsx', fix_ranking_page_complete),
+    ]
+    # 3. 全トレーニングページ (⑪)
+    tasks += [(filepath, partial(fix_training_page_units, filepath)) for filepath in training_pages]
+    return tasks
+
 def main():
+    args = build_parser("島根県大田市カスタマイズ - 追加修正スクリプト v3 (完全版)").parse_args()
+    if args.dry_run:
+        # 書き込まずに diff だけを表示する (バックアップも作らない)
+        preview_transforms(stage_tasks(), jobs=args.jobs, profile=args.profile)
+        return
+    
     print("=" * 70)
     print("🎯 島根県大田市カスタマイズ - 追加修正スクリプト v3 (完全版)")
     print("=" * 70)
@@ -175,55 +230,22 @@ def main():
         print("   プロジェクトのルートディレクトリで実行してください")
         return
     
-    # バックアップディレクトリ作成
-    backup_dir = Path('backup_v3_complete')
-    backup_dir.mkdir(exist_ok=True)
-    print(f"💾 バックアップを {backup_dir}/ に作成中...")
-    
-    files_to_modify = [
-        'app/page.tsx',
-        'app/ranking/page.tsx',
-        'app/simple/page.tsx',
-        'app/color/page.tsx',
-        'app/dual/page.tsx',
-    ]
-    
-    # バックアップ作成
-    for filepath in files_to_modify:
-        if os.path.exists(filepath):
-            backup_path = backup_dir / filepath.replace('/', '_')
-            content = read_file(filepath)
-            write_file(backup_path, content)
+    # 対象ファイル (トレーニングページは app/ 以下から探す)
+    tasks = stage_tasks()
+    files_to_modify = [filepath for filepath, _ in tasks]
     
-    print("✅ バックアップ完了\n")
+    # バックアップ作成 (内容が同じファイルは保存済みのものを共有する)
+    print("💾 バックアップを作成中...")
+    snapshot_id = BackupStore().snapshot(files_to_modify, 'v3')
+    print(f"✅ バックアップ完了 ({snapshot_id})\n")
     
     # 修正実行
     print("🔧 修正を適用中...\n")
     
-    # 1. app/page.tsx (③⑤)
-    if os.path.exists('app/page.tsx'):
-        content = read_file('app/page.tsx')
-        content = fix_page_tsx(content)
-        write_file('app/page.tsx', content)
-    
-    # 2. app/ranking/page.tsx (⑨⑩⑪)
-    if os.path.exists('app/ranking/page.tsx'):
-        content = read_file('app/ranking/page.tsx')
-        content = fix_ranking_page_complete(content)
-        write_file('app/ranking/page.tsx', content)
-    
-    # 3. 全トレーニングページの単位統一 (⑪)
-    training_pages = [
-        'app/simple/page.tsx',
-        'app/color/page.tsx',
-        'app/dual/page.tsx',
-    ]
-    
-    for filepath in training_pages:
-        if os.path.exists(filepath):
-            content = read_file(filepath)
-            content = fix_training_page_units(filepath, content)
-            write_file(filepath, content)
+    if not run_transforms(tasks, jobs=args.jobs, incremental=args.incremental, profile=args.profile,
+                          mapped=args.mmap, validate_output=not args.no_validate):
+        print(f"\n💾 ファイルは変更していません (バックアップ: スナップショット {snapshot_id})")
+        return
     
     print("\n" + "=" * 70)
     print("✨ 追加修正完了！")
@@ -256,7 +278,8 @@ def main():
     print("     git commit -m 'fix: 島根県大田市カスタマイズ完全適用'")
     print("     git push")
     print()
-    print("💾 バックアップ: backup_v3_complete/ フォルダに保存されています")
+    print(f"💾 バックアップ: スナップショット {snapshot_id}")
+    print(f"   元に戻す: python3 -m shimane_pipeline.backups restore {snapshot_id}")
     print()
 
 if __name__ == '__main__':
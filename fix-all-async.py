@@ -1,14 +1,30 @@
-import re
 import os
 
-files = [
-    'app/page.tsx',
-    'app/color/page.tsx',
-    'app/simple/page.tsx',
-    'app/sprint/page.tsx',
-    'app/dual/page.tsx',
-    'app/ranking/page.tsx'
-]
+from shimane_pipeline import discover, jsblocks, tsx
+
+# app/ 以下の page.tsx をすべて対象にする (getUser() も await も含まないファイルは読むだけでスキップ)
+FILE_PATTERN = 'app/**/page.tsx'
+
+@discover.requires('getUser()', 'await')
+def fix_content(content):
+    """1ファイル分の内容を async/await 化する"""
+    # useEffect / handle 関数の本体を1回の走査で索引にしてから変換する
+    blocks = jsblocks.index(content)
+    patch = tsx.edit(content)
+    
+    # パターン1: app/page.tsx のuseEffect
+    jsblocks.convert_home_effect(patch, blocks)
+    
+    # パターン2: 他のページのuseEffect（getUser + router.push）
+    # 本体全体を loadUser() で包む (対応する閉じカッコも同時に追加)
+    jsblocks.convert_load_user(patch, blocks, deps='router')
+    
+    # パターン3: handleStart, handleComplete など
+    # const handleXxx = () => { で始まり、内部にawaitがある場合
+    jsblocks.convert_handlers(patch, blocks)
+    
+    content = patch.apply()
+    return content
 
 def fix_file(filepath):
     if not os.path.exists(filepath):
@@ -20,51 +36,8 @@ def fix_file(filepath):
     
     original_content = content
     
-    # パターン1: app/page.tsx のuseEffect
-    pattern1 = r'(useEffect\(\(\) => \{)\s*const user = getUser\(\);\s*setCurrentUser\(user\);'
-    replacement1 = r'\1\n    const loadData = async () => {\n      const user = await getUser();\n      setCurrentUser(user);'
-    
-    if 'const user = getUser();' in content and 'setCurrentUser(user);' in content:
-        # app/page.tsxの特殊なパターン
-        content = re.sub(
-            r'useEffect\(\(\) => \{\s*const user = getUser\(\);\s*setCurrentUser\(user\);\s*const sessionData = getCurrentSession\(\);\s*setSession\(sessionData\);\s*\}, \[\]\);',
-            '''useEffect(() => {
-    const loadData = async () => {
-      const user = await getUser();
-      setCurrentUser(user);
-      
-      const sessionData = await getCurrentSession();
-      setSession(sessionData);
-    };
-    loadData();
-  }, []);''',
-            content
-        )
-    
-    # パターン2: 他のページのuseEffect（getUser + router.push）
-    if 'const currentUser = getUser();' in content:
-        content = re.sub(
-            r'useEffect\(\(\) => \{\s*const currentUser = getUser\(\);',
-            '''useEffect(() => {
-    const loadUser = async () => {
-      const currentUser = await getUser();''',
-            content
-        )
-        # 対応する閉じカッコを追加
-        content = re.sub(
-            r'(setUser\(currentUser\);)\s*(\}, \[router\]\);)',
-            r'\1\n    };\n    loadUser();\n  }, [router]);',
-            content
-        )
-    
-    # パターン3: handleStart, handleComplete など
-    # const handleXxx = () => { で始まり、内部にawaitがある場合
-    content = re.sub(
-        r'const (handle\w+) = \(\) => \{([^}]*await [^}]*)\}',
-        r'const \1 = async () => {\2}',
-        content,
-        flags=re.DOTALL
-    )
+    if discover.may_change(fix_content, content):
+        content = fix_content(content)
     
     if content != original_content:
         with open(filepath, 'w', encoding='utf-8') as f:
@@ -75,10 +48,14 @@ def fix_file(filepath):
         print(f"- No changes needed for {filepath}")
         return False
 
-print("Fixing async/await issues in all pages...\n")
-fixed_count = 0
-for file in files:
-    if fix_file(file):
-        fixed_count += 1
+def main():
+    print("Fixing async/await issues in all pages...\n")
+    fixed_count = 0
+    for file in discover.find(FILE_PATTERN):
+        if fix_file(file):
+            fixed_count += 1
+
+    print(f"\n✓ Fixed {fixed_count} file(s)")
 
-print(f"\n✓ Fixed {fixed_count} file(s)")
+if __name__ == '__main__':
+    main()
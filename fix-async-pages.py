@@ -1,47 +1,37 @@
-import re
-import os
+from shimane_pipeline import discover, jsblocks, tsx
 
-files = [
-    'app/color/page.tsx',
-    'app/simple/page.tsx',
-    'app/sprint/page.tsx',
-    'app/dual/page.tsx',
-    'app/ranking/page.tsx'
-]
+# app/ 以下の page.tsx のうちトップページ以外 (getUser() を含まないファイルは読むだけでスキップ)
+FILE_PATTERN = 'app/**/page.tsx'
+EXCLUDE = ('app/page.tsx',)
 
-# パターン1: useEffect内でgetUser()を直接使用している
-pattern1 = r'useEffect\(\(\) => \{\s*const currentUser = getUser\(\);'
-replacement1 = '''useEffect(() => {
-    const loadUser = async () => {
-      const currentUser = await getUser();'''
-
-# パターン2: useEffect内でgetUser()を使った後のsetUserまで
-pattern2 = r'(useEffect\(\(\) => \{\s*)const currentUser = getUser\(\);(\s*if \(!currentUser\) \{[^}]*\}\s*setUser\(currentUser\);)(\s*\}, \[)'
+@discover.requires('getUser()')
+def fix_content(content):
+    """1ファイル分の内容の useEffect を async/await 化する"""
+    # パターン2の修正（より包括的）
+    # useEffect内でgetUser()を使った後のsetUserまで (依存配列は問わない)
+    patch = tsx.edit(content)
+    jsblocks.convert_load_user(patch, jsblocks.index(content), guarded=True)
+    content = patch.apply()
+    return content
 
-def fix_pattern2(match):
-    return f'''{match.group(1)}const loadUser = async () => {{
-      const currentUser = await getUser();{match.group(2)}
-    }};
-    loadUser();{match.group(3)}'''
+def main():
+    for file in discover.find(FILE_PATTERN, exclude=EXCLUDE):
+        with open(file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        
+        original_content = content
+        
+        if discover.may_change(fix_content, content):
+            content = fix_content(content)
+        
+        if content != original_content:
+            with open(file, 'w', encoding='utf-8') as f:
+                f.write(content)
+            print(f"✓ Fixed {file}")
+        else:
+            print(f"- No changes needed for {file}")
 
-for file in files:
-    if not os.path.exists(file):
-        print(f"Skipping {file} (not found)")
-        continue
-    
-    with open(file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    original_content = content
-    
-    # パターン2の修正（より包括的）
-    content = re.sub(pattern2, fix_pattern2, content, flags=re.DOTALL)
-    
-    if content != original_content:
-        with open(file, 'w', encoding='utf-8') as f:
-            f.write(content)
-        print(f"✓ Fixed {file}")
-    else:
-        print(f"- No changes needed for {file}")
+    print("\nDone!")
 
-print("\nDone!")
+if __name__ == '__main__':
+    main()
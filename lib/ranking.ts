@@ -0,0 +1,62 @@
+// 事前計算したランキングのスナップショット
+// python3 -m shimane_records.ranking で public/ranking-data/ に書き出したものを読む
+import { Record } from './types';
+
+const BASE_PATH = '/ranking-data';
+
+interface RankingManifest {
+  version: string;
+  generatedAt: string;
+  k: number;
+  records: number;
+  rankings: { [mode: string]: { [type: string]: string } };
+  users: { shards: number; path: string };
+}
+
+interface RankingShard {
+  mode: string;
+  type: string;
+  total: number;
+  records: Record[];
+}
+
+// userId → モード → タイプ → [ベスト(ミリ秒), 順位]
+export type UserRanking = { [mode: string]: { [type: string]: [number, number] } };
+
+const fetchJson = async <T>(path: string): Promise<T | null> => {
+  try {
+    const response = await fetch(`${BASE_PATH}/${path}`, { cache: 'no-cache' });
+    if (!response.ok) return null;
+    return (await response.json()) as T;
+  } catch {
+    return null;
+  }
+};
+
+// userId のファイル番号 (FNV-1a、shimane_records/ranking.py の shard_of と同じ計算)
+const shardOf = (userId: string, shards: number): number => {
+  let hash = 0x811c9dc5;
+  for (let i = 0; i < userId.length; i++) {
+    hash ^= userId.charCodeAt(i);
+    hash = Math.imul(hash, 0x01000193) >>> 0;
+  }
+  return hash % shards;
+};
+
+// モード・タイプ別の上位の記録 (速い順)。スナップショットが無ければ null
+export const getRankingSnapshot = async (mode: string, type: string): Promise<Record[] | null> => {
+  const manifest = await fetchJson<RankingManifest>('manifest.json');
+  const path = manifest?.rankings[mode]?.[type];
+  if (!path) return null;
+  const shard = await fetchJson<RankingShard>(path);
+  return shard ? shard.records : null;
+};
+
+// ユーザーのモード・タイプ別のベストと順位 (全記録の中での順位)。スナップショットが無ければ null
+export const getUserRanking = async (userId: string): Promise<UserRanking | null> => {
+  const manifest = await fetchJson<RankingManifest>('manifest.json');
+  if (!manifest) return null;
+  const path = manifest.users.path.replace('{shard}', String(shardOf(userId, manifest.users.shards)));
+  const table = await fetchJson<{ [userId: string]: UserRanking }>(path);
+  return table?.[userId] ?? null;
+};
@@ -0,0 +1,4 @@
+"""
+島根県大田市カスタマイズ用の共通ツール群
+apply_shimane_*.py などのスクリプトから import して使う
+"""
@@ -0,0 +1,9 @@
+"""
+python3 -m shimane_pipeline で合成パイプラインを実行する
+"""
+
+import sys
+
+from shimane_pipeline.pipeline import main
+
+sys.exit(main())
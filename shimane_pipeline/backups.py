@@ -0,0 +1,216 @@
+"""
+コンテンツアドレス方式のバックアップストア
+実行ごとにフォルダへ全ファイルをコピーする代わりに、内容の SHA-256 をキーにした
+圧縮オブジェクトとして1回だけ保存し、実行ごとのスナップショットは索引だけを持つ。
+
+    .shimane_backups/
+        objects/ab/cdef...     zlib 圧縮した内容 (同じ内容は1つだけ)
+        files/abcdef...        復元用に展開した内容 (ハードリンクで作業ツリーへ戻す)
+        snapshots/<ID>.json    スナップショットの索引 {パス: ハッシュ}
+        stat_cache.json        (サイズ, mtime) → ハッシュ (変更のないファイルは読まない)
+
+戻す:
+    python3 -m shimane_pipeline.backups list
+    python3 -m shimane_pipeline.backups restore [スナップショットID]  (省略時は最新)
+"""
+
+import argparse
+import json
+import os
+import sys
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+from shimane_pipeline.fileio import atomic_write, content_hash
+
+STORE_DIR = Path('.shimane_backups')
+
+
+class BackupStore:
+    """重複排除したバックアップの保存先"""
+
+    def __init__(self, root=STORE_DIR):
+        self.root = Path(root)
+        self.objects_dir = self.root / 'objects'
+        self.files_dir = self.root / 'files'
+        self.snapshots_dir = self.root / 'snapshots'
+        self.stat_cache_path = self.root / 'stat_cache.json'
+        self._stat_cache = None
+
+    # ---------------------------------------------------------------
+    # オブジェクト
+    # ---------------------------------------------------------------
+    def _object_path(self, digest):
+        return self.objects_dir / digest[:2] / digest[2:]
+
+    def has_object(self, digest):
+        return self._object_path(digest).exists()
+
+    def put_object(self, data, digest=None):
+        """内容を保存してハッシュを返す (既にあれば書き込まない)"""
+        digest = digest or content_hash(data)
+        path = self._object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write(path, zlib.compress(data))
+        return digest
+
+    def get_object(self, digest):
+        """保存済みの内容を返す"""
+        data = zlib.decompress(self._object_path(digest).read_bytes())
+        if content_hash(data) != digest:
+            raise ValueError(f"バックアップが壊れています: {digest}")
+        return data
+
+    # ---------------------------------------------------------------
+    # stat キャッシュ (サイズと mtime が同じファイルはハッシュを再計算しない)
+    # ---------------------------------------------------------------
+    def _load_stat_cache(self):
+        if self._stat_cache is None:
+            try:
+                self._stat_cache = json.loads(self.stat_cache_path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                self._stat_cache = {}
+        return self._stat_cache
+
+    def _save_stat_cache(self):
+        if self._stat_cache is not None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            atomic_write(self.stat_cache_path, json.dumps(self._stat_cache, sort_keys=True).encode('utf-8'))
+
+    def file_hash(self, filepath):
+        """ファイルのハッシュ (変更がなければキャッシュを使い、中身を読まない)"""
+        st = os.stat(filepath)
+        key = [st.st_size, st.st_mtime_ns]
+        cache = self._load_stat_cache()
+        entry = cache.get(str(filepath))
+        if entry and entry[:2] == key:
+            return entry[2]
+        digest = content_hash(Path(filepath).read_bytes())
+        cache[str(filepath)] = key + [digest]
+        return digest
+
+    # ---------------------------------------------------------------
+    # スナップショット
+    # ---------------------------------------------------------------
+    def snapshot(self, filepaths, label):
+        """ファイル群のスナップショットを作り、スナップショットIDを返す
+
+        新しく保存するのは、ストアにまだ無い内容のファイルだけ。
+        """
+        files = {}
+        for filepath in filepaths:
+            if not os.path.exists(filepath):
+                continue
+            digest = self.file_hash(filepath)
+            if not self.has_object(digest):
+                data = Path(filepath).read_bytes()
+                # 読み込みとハッシュ計算の間に書き換わった場合に備えて計算し直す
+                digest = self.put_object(data)
+                st = os.stat(filepath)
+                self._load_stat_cache()[str(filepath)] = [st.st_size, st.st_mtime_ns, digest]
+            files[str(filepath)] = digest
+
+        self.snapshots_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        snapshot_id = f'{stamp}-{label}'
+        n = 1
+        while (self.snapshots_dir / f'{snapshot_id}.json').exists():
+            n += 1
+            snapshot_id = f'{stamp}-{label}-{n}'
+        index = {'id': snapshot_id, 'label': label, 'created': datetime.now().isoformat(), 'files': files}
+        atomic_write(
+            self.snapshots_dir / f'{snapshot_id}.json',
+            json.dumps(index, ensure_ascii=False, indent=2).encode('utf-8'),
+        )
+        self._save_stat_cache()
+        return snapshot_id
+
+    def snapshots(self):
+        """スナップショットの索引を古い順に返す"""
+        if not self.snapshots_dir.exists():
+            return []
+        indexes = [
+            json.loads(path.read_text(encoding='utf-8'))
+            for path in self.snapshots_dir.glob('*.json')
+        ]
+        return sorted(indexes, key=lambda index: (index['created'], index['id']))
+
+    def load_snapshot(self, snapshot_id=None):
+        """スナップショットの索引を返す (ID 省略時は最新)"""
+        if snapshot_id is None:
+            indexes = self.snapshots()
+            if not indexes:
+                raise FileNotFoundError("スナップショットがありません")
+            return indexes[-1]
+        path = self.snapshots_dir / f'{snapshot_id}.json'
+        if not path.exists():
+            raise FileNotFoundError(f"スナップショットが見つかりません: {snapshot_id}")
+        return json.loads(path.read_text(encoding='utf-8'))
+
+    def _materialize(self, digest):
+        """復元用に展開した内容のパスを返す (壊れていれば作り直す)"""
+        path = self.files_dir / digest
+        if path.exists() and content_hash(path.read_bytes()) == digest:
+            return path
+        self.files_dir.mkdir(parents=True, exist_ok=True)
+        atomic_write(path, self.get_object(digest))
+        return path
+
+    def restore(self, snapshot_id=None):
+        """スナップショットの状態に戻し、戻したファイルのリストを返す
+
+        現在の内容とハッシュが同じファイルには触らない。
+        戻すファイルはストア内の展開済みファイルをハードリンクで置き換える
+        (別ファイルシステムなどでリンクできない場合はコピー)。
+        """
+        index = self.load_snapshot(snapshot_id)
+        restored = []
+        for filepath, digest in index['files'].items():
+            if os.path.exists(filepath) and self.file_hash(filepath) == digest:
+                continue
+            source = self._materialize(digest)
+            target = Path(filepath)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_name(target.name + '.restore')
+            if tmp.exists():
+                tmp.unlink()
+            try:
+                os.link(source, tmp)
+                os.replace(tmp, target)
+            except OSError:
+                atomic_write(target, source.read_bytes())
+            restored.append(filepath)
+        self._save_stat_cache()
+        return restored
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="カスタマイズ前のバックアップを一覧・復元する")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help='スナップショットの一覧')
+    restore = sub.add_parser('restore', help='スナップショットの状態に戻す')
+    restore.add_argument('snapshot', nargs='?', help='スナップショットID (省略時は最新)')
+    args = parser.parse_args(argv)
+
+    store = BackupStore()
+    if args.command == 'list':
+        for index in store.snapshots():
+            print(f"{index['id']}  ({len(index['files'])} ファイル)")
+        return 0
+
+    try:
+        index = store.load_snapshot(args.snapshot)
+    except FileNotFoundError as e:
+        print(f"❌ エラー: {e}")
+        return 1
+    restored = store.restore(index['id'])
+    for filepath in restored:
+        print(f"↩️  {filepath}")
+    print(f"✅ {index['id']} に戻しました ({len(restored)} ファイルを復元)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
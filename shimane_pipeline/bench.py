@@ -0,0 +1,419 @@
+"""
+変換関数とパイプラインのスケーリングベンチマーク
+実行方法:
+    python3 -m shimane_pipeline.bench                  測定してベースラインと比較 (遅くなっていれば終了コード 1)
+    python3 -m shimane_pipeline.bench --save-baseline  測定結果をベースラインとして保存
+    python3 -m shimane_pipeline.bench --max-mb 50      50MB まで測定 (既定は 4MB まで)
+
+入力は app/*.tsx と backup_*/*.tsx の実ページから作る。目標サイズより小さいサイズでは
+ページの先頭を切り出し、大きいサイズではページ (バリエーションを順番に) を繰り返す。
+ベースラインとの比較は MB/s で行い、--tolerance を超えて遅くなったものを回帰とする。
+legacy:<名前> は同じ処理の以前の実装 (ルールごとに re.sub を繰り返す) で、<名前> がそれより
+--tolerance を超えて遅ければ、ベースラインに関係なく回帰とする。
+original:<名前> は最適化前のスクリプト (tests/original/ にそのまま残したもの) の同じ名前の関数で、
+速さの比を表示し、<名前> がそれより --tolerance を超えて遅ければ、これも回帰とする。
+小さい入力は1回の測定が MIN_SAMPLE_TIME 以上になるように繰り返して測る (timeit と同じ)。
+(構造マッチャと旧 DOTALL パターンの比較は bench_structure.py)
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import re
+import sys
+import time
+from functools import partial
+from pathlib import Path
+
+from shimane_pipeline import tsx
+from shimane_pipeline.manifest import transform_name
+from shimane_pipeline.rewrite import LiteralSet, RuleSet
+from shimane_pipeline.pipeline import DEFAULT_ORDER, STAGES, build_tasks
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'bench_baseline.json'
+# 最適化前のスクリプト (比較用のテストの固定データで、パッケージには含めない)
+ORIGINAL_DIR = Path(__file__).resolve().parent.parent / 'tests' / 'original'
+
+KB = 1024
+MB = 1024 * 1024
+SCALES = [1 * KB, 16 * KB, 256 * KB, 4 * MB, 50 * MB]
+
+# 1回の測定の最短時間 (これより速い入力は内側で何回も実行してまとめて測る)
+MIN_SAMPLE_TIME = 0.005
+
+# 非同期化スクリプト (ファイル名にハイフンがあるのでパスから読み込む)
+ASYNC_SCRIPTS = {
+    'fix-all-async.py': ['app/page.tsx', 'app/color/page.tsx', 'app/simple/page.tsx',
+                         'app/dual/page.tsx', 'app/ranking/page.tsx'],
+    'fix-async-pages.py': ['app/color/page.tsx', 'app/simple/page.tsx',
+                           'app/dual/page.tsx', 'app/ranking/page.tsx'],
+}
+
+
+def page_sources(filepath):
+    """app/xxx/page.tsx に対応する実ページ (app/ と backup_*/ のもの) の内容"""
+    sources = []
+    if os.path.exists(filepath):
+        sources.append(Path(filepath).read_text(encoding='utf-8'))
+    backup_name = filepath.replace('/', '_')
+    for backup_dir in sorted(Path('.').glob('backup_*')):
+        path = backup_dir / backup_name
+        if path.exists():
+            text = path.read_text(encoding='utf-8')
+            if text not in sources:
+                sources.append(text)
+    return sources
+
+
+def synthetic_page(sources, size):
+    """実ページから約 size バイトの入力を作る"""
+    if not sources:
+        return ''
+    first = sources[0]
+    if size <= len(first.encode('utf-8')):
+        return first.encode('utf-8')[:size].decode('utf-8', errors='ignore')
+    parts = []
+    total = 0
+    i = 0
+    while total < size:
+        page = sources[i % len(sources)]
+        parts.append(page)
+        total += len(page.encode('utf-8'))
+        i += 1
+    return ''.join(parts)
+
+
+class Case:
+    """測定対象1つ分 (files の各ファイルにそれぞれの変換を適用する)"""
+
+    def __init__(self, name, tasks):
+        self.name = name
+        self.tasks = tasks      # (ファイルパス, 変換関数) のリスト
+
+    def inputs(self, size):
+        """ファイルごとに約 size / ファイル数 バイトの入力"""
+        per_file = max(1, size // len(self.tasks))
+        return [(transform, synthetic_page(page_sources(filepath), per_file))
+                for filepath, transform in self.tasks]
+
+    def run(self, inputs):
+        for transform, content in inputs:
+            transform(content)
+
+# スクリプトのルールセットを測るページ (無いものは app/page.tsx)
+RULE_SET_PAGES = {
+    'customization.layout': 'app/layout.tsx',
+    'v2.training_units': 'app/simple/page.tsx',
+    'v3.training_units': 'app/simple/page.tsx',
+    'v3.ranking_literals': 'app/ranking/page.tsx',
+}
+
+LEGACY = 'legacy:'
+ORIGINAL = 'original:'
+
+
+def legacy_chain(rule_set):
+    """ルールセットと同じ置換を、以前のスクリプトのようにルールごとに re.sub / str.replace で行う関数"""
+    if isinstance(rule_set, LiteralSet):
+        def chain(content):
+            for _, old, new in rule_set.rules:
+                content = content.replace(old, new)
+            return content
+    else:
+        def chain(content):
+            active = rule_set.active_rules(content)
+            for index in active:
+                rule = rule_set.rules[index]
+                content = rule.regex.sub(rule.repl, content)
+            return content
+    return chain
+
+
+def rule_set_cases(module):
+    """モジュールのルールセットごとに、1パスの適用とルールごとの re.sub の連鎖の2つの測定対象"""
+    cases = []
+    for value in vars(module).values():
+        if isinstance(value, (RuleSet, LiteralSet)):
+            filepath = RULE_SET_PAGES.get(value.name, 'app/page.tsx')
+            name = f'ruleset:{value.name}'
+            cases.append(Case(name, [(filepath, value.apply)]))
+            cases.append(Case(LEGACY + name, [(filepath, legacy_chain(value))]))
+    return cases
+
+
+def _load_script(filename, name=None):
+    name = name or filename[:-3].replace('-', '_')
+    spec = importlib.util.spec_from_file_location(name, filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_script(module):
+    """最適化前のスクリプト (tests/original/<module>.py、無ければ None)"""
+    filename = ORIGINAL_DIR / f'{module}.py'
+    if not filename.exists():
+        return None
+    return _load_script(str(filename), f'legacy_{module}')
+
+
+def legacy_function(legacy, transform):
+    """変換関数と同じ名前の、最適化前のスクリプトの関数 (partial の引数も同じにする、無ければ None)"""
+    func = getattr(transform, 'func', transform)
+    legacy_func = getattr(legacy, func.__name__, None) if legacy is not None else None
+    if legacy_func is None:
+        return None
+    if isinstance(transform, partial):
+        return partial(legacy_func, *transform.args, **transform.keywords)
+    return legacy_func
+
+
+def build_cases():
+    """関数ごと・パイプラインごとの測定対象"""
+    cases = []
+    seen = set()
+    for name in DEFAULT_ORDER:
+        stage = STAGES[name]
+        tasks = stage.tasks()
+        legacy = legacy_script(stage.module)
+        for filepath, transform in tasks:
+            # 同じ関数を複数のページに使う場合 (partial) は最初のページだけで測る
+            func = getattr(transform, 'func', transform)
+            key = (stage.module, func.__qualname__)
+            if key not in seen:
+                seen.add(key)
+                cases.append(Case(transform_name(func), [(filepath, transform)]))
+                legacy_transform = legacy_function(legacy, transform)
+                if legacy_transform is not None:
+                    cases.append(Case(ORIGINAL + transform_name(func), [(filepath, legacy_transform)]))
+        cases.append(Case(f'pipeline:{name}', tasks))
+        cases.extend(rule_set_cases(stage.load()))
+    cases.append(Case('pipeline:' + '+'.join(DEFAULT_ORDER), build_tasks([STAGES[n] for n in DEFAULT_ORDER])))
+    for filename, files in ASYNC_SCRIPTS.items():
+        if os.path.exists(filename):
+            fix_content = _load_script(filename).fix_content
+            cases.append(Case(f'{filename}:fix_content', [(filepath, fix_content) for filepath in files]))
+    return cases
+
+
+def _numbers():
+    """1, 2, 5, 10, 20, 50, … (timeit.Timer.autorange と同じ回数の増やし方)"""
+    i = 1
+    while True:
+        yield from (i, 2 * i, 5 * i)
+        i *= 10
+
+
+def _sample(case, inputs, number):
+    """case を number 回続けて実行した秒数"""
+    start = time.perf_counter()
+    for _ in range(number):
+        # 同じ内容の索引はキャッシュされるので、毎回作り直させる
+        tsx.clear_cache()
+        case.run(inputs)
+    return time.perf_counter() - start
+
+
+def measure(cases, size, min_time=0.2, min_runs=3, max_runs=20):
+    """cases のそれぞれの (1回あたりの秒数の最小値, 実際の入力バイト数) のリスト
+
+    ケースごとに1回の測定が MIN_SAMPLE_TIME 以上になる回数を決め、その回数ずつ min_runs 回以上
+    (合計が min_time に満たなければ max_runs 回まで) 測った最小値を回数で割る。
+    比べる対象 (legacy: / original:) は交互に測るので、測定中のマシンの負荷の変化が両方に同じように効く。
+    """
+    inputs = [case.inputs(size) for case in cases]
+    numbers = []
+    best = []
+    spent = 0.0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for case, case_inputs in zip(cases, inputs):
+            for number in _numbers():
+                elapsed = _sample(case, case_inputs, number)
+                if elapsed >= MIN_SAMPLE_TIME:
+                    break
+            numbers.append(number)
+            best.append(elapsed)
+            spent += elapsed
+        runs = 1
+        while runs < min_runs or (runs < max_runs and spent < min_time * len(cases)):
+            for k, case in enumerate(cases):
+                elapsed = _sample(case, inputs[k], numbers[k])
+                best[k] = min(best[k], elapsed)
+                spent += elapsed
+            runs += 1
+    return [(seconds / number, sum(len(content.encode('utf-8')) for _, content in case_inputs))
+            for seconds, number, case_inputs in zip(best, numbers, inputs)]
+
+
+def measure_groups(cases):
+    """一緒に測るケースのまとまり (ケースとその legacy: / original: を1つにする)"""
+    names = {case.name for case in cases}
+    by_name = {case.name: case for case in cases}
+    groups = []
+    for case in cases:
+        base = case.name.removeprefix(LEGACY).removeprefix(ORIGINAL)
+        if base != case.name and base in names:
+            continue
+        groups.append([case] + [by_name[prefix + case.name] for prefix in (LEGACY, ORIGINAL)
+                                if prefix + case.name in names])
+    return groups
+
+
+_CALIBRATION_TAG = re.compile(r'<(/?)([A-Za-z][\w.]*)')
+
+
+def calibrate(runs=7):
+    """マシンの速さの目安 (MB/s)
+
+    索引の走査に近い「正規表現で探して Python で数える」処理を固定入力で測る。
+    ベースラインとの比較はこの値で割った相対値で行うので、マシンや負荷の違いが消える。
+    """
+    content = synthetic_page(page_sources('app/page.tsx') or ['<div>x</div>\n'], 1 * MB)
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        depth = 0
+        for m in _CALIBRATION_TAG.finditer(content):
+            depth += -1 if m.group(1) else 1
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(content.encode('utf-8')) / MB / best
+
+
+def _scale_label(size):
+    return f'{size // MB}MB' if size >= MB else f'{size // KB}KB'
+
+
+def compare(results, calibration, baseline, tolerance):
+    """ベースラインより tolerance を超えて遅いものの一覧
+
+    どちらも calibrate() の値で割った相対値で比べる。
+    返す値は (名前, サイズ, ベースラインの MB/s をこのマシンに換算した値, 今回の MB/s)。
+    """
+    scale_factor = calibration / baseline['calibration']
+    regressions = []
+    for name, scales in results.items():
+        for scale, mbps in scales.items():
+            base = baseline['results'].get(name, {}).get(scale)
+            if base and mbps < base * scale_factor * (1 - tolerance):
+                regressions.append((name, scale, base * scale_factor, mbps))
+    return regressions
+
+
+def compare_original(results):
+    """最適化前のスクリプト (original:<名前>) との速さの比 {名前: {サイズ: 比}} (1 より大きければ速い)"""
+    ratios = {}
+    for name, scales in results.items():
+        original = results.get(ORIGINAL + name)
+        if original is None:
+            continue
+        ratios[name] = {scale: mbps / original[scale] for scale, mbps in scales.items() if original.get(scale)}
+    return ratios
+
+
+def compare_slower(results, prefix, tolerance):
+    """比べる対象 (prefix + <名前>) より tolerance を超えて遅いものの一覧 (名前, サイズ, 対象の MB/s, 今回の MB/s)
+
+    prefix は LEGACY (以前の実装) か ORIGINAL (最適化前のスクリプト)。
+    """
+    slower = []
+    for name, scales in results.items():
+        other = results.get(prefix + name)
+        if other is None:
+            continue
+        for scale, mbps in scales.items():
+            base = other.get(scale)
+            if base and mbps < base * (1 - tolerance):
+                slower.append((name, scale, base, mbps))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="変換関数とパイプラインのスケーリングベンチマーク")
+    parser.add_argument('--max-mb', type=float, default=4, help='最大入力サイズ (MB、1〜50)')
+    parser.add_argument('--only', help='名前にこの文字列を含む対象だけ測る')
+    parser.add_argument('--baseline', default=str(BASELINE_PATH), help='ベースラインのパス')
+    parser.add_argument('--save-baseline', action='store_true', help='測定結果をベースラインとして保存')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='回帰とみなす遅くなりの割合 (既定 0.3 = 30%%)')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists('app/page.tsx'):
+        print("❌ エラー: app/page.tsx が見つかりません")
+        print("   プロジェクトのルートディレクトリで実行してください")
+        return 1
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+
+    scales = [size for size in SCALES if size <= args.max_mb * MB]
+    cases = [case for case in build_cases() if not args.only or args.only in case.name]
+
+    calibration = calibrate()
+    print(f"🧭 マシンの目安: {calibration:.1f}MB/s")
+
+    results = {}
+    for group in measure_groups(cases):
+        lines = {case.name: [] for case in group}
+        for size in scales:
+            for case, (seconds, actual) in zip(group, measure(group, size)):
+                mbps = actual / MB / seconds if seconds > 0 else float('inf')
+                results.setdefault(case.name, {})[_scale_label(size)] = round(mbps, 3)
+                lines[case.name].append(
+                    f"{_scale_label(size):>8} {actual / KB:>10.1f}KB {seconds * 1000:10.2f}ms {mbps:9.2f}MB/s")
+        for case in group:
+            print(f"\n📏 {case.name}")
+            print('\n'.join(lines[case.name]))
+
+    ratios = compare_original(results)
+    if ratios:
+        print("\n📊 最適化前のスクリプトとの速さの比:")
+        for name, values in ratios.items():
+            print(f"   {name}: " + ', '.join(f"{scale} ×{ratio:.2f}" for scale, ratio in values.items()))
+
+    slower = []
+    for prefix, label in ((LEGACY, '以前の実装'), (ORIGINAL, '最適化前のスクリプト')):
+        found = compare_slower(results, prefix, args.tolerance)
+        if found:
+            print(f"\n❌ {label}より {args.tolerance:.0%} 以上遅くなっています:")
+            for name, scale, base, mbps in found:
+                print(f"   {name} [{scale}]: {prefix}{base:.2f}MB/s → {mbps:.2f}MB/s")
+        slower.extend(found)
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        if slower:
+            print("\n❌ 比べる対象より遅いものがあるので、ベースラインは保存しません")
+            return 1
+        baseline = {'calibration': round(calibration, 3), 'results': results}
+        if baseline_path.exists():
+            # 今回測っていない対象・サイズは、前回の値をこのマシンの目安に合わせて残す
+            old = json.loads(baseline_path.read_text(encoding='utf-8'))
+            factor = calibration / old['calibration']
+            for name, values in old['results'].items():
+                for scale, mbps in values.items():
+                    baseline['results'].setdefault(name, {}).setdefault(scale, round(mbps * factor, 3))
+        baseline_path.write_text(json.dumps(baseline, ensure_ascii=False, indent=2, sort_keys=True) + '\n',
+                                 encoding='utf-8')
+        print(f"\n💾 ベースラインを保存しました: {baseline_path}")
+        return 0
+
+    if not baseline_path.exists():
+        print(f"\nℹ️  ベースラインがありません ({baseline_path})。--save-baseline で作成してください")
+        return 1 if slower else 0
+    baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+    regressions = compare(results, calibration, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ ベースラインより {args.tolerance:.0%} 以上遅くなっています:")
+        for name, scale, base, mbps in regressions:
+            print(f"   {name} [{scale}]: {base:.2f}MB/s → {mbps:.2f}MB/s")
+        return 1
+    if slower:
+        return 1
+    print("\n✅ ベースラインからの回帰はありません")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+構造マッチャ (structure.py) と旧 DOTALL パターンのベンチマーク
+実行方法: python3 -m shimane_pipeline.bench_structure [--max-kb 8192] [--budget 2.0]
+
+入力サイズを倍々に増やし、敵対的入力 (マーカーはあるが閉じ側が無い) と
+実ページを繰り返した巨大入力で、1回あたりの時間と MB/s を表示する。
+旧パターンは次のサイズ (4倍) の予想時間が --budget 秒を超えたら測定をやめる。
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from shimane_pipeline import structure
+
+# 置き換え前のパターン (比較用。structure の各関数も、線形で済むと確かめられた入力ではこれを使う)
+LEGACY_RANKING_V2 = structure.RANKING_BOX_PATTERN
+LEGACY_RANKING_V3 = structure.RANKING_FRAGMENT_PATTERN
+LEGACY_COLOR_SIZE = structure.card_value_pattern('カラー判断', 'text-blue-600')
+
+REPLACEMENT = '<div>ranking</div>'
+
+PAGE = Path('backup_before_shimane/app_page.tsx')
+
+
+def _adversarial_ranking(size):
+    """マーカーとボックスが並ぶが、閉じタグもフラグメント終端も無い入力"""
+    unit = f'{structure.RANKING_MARKER}\n{structure.RANKING_BOX}\n  <p>🏆</p>\n'
+    return unit * max(1, size // len(unit.encode('utf-8')))
+
+
+def _adversarial_card(size):
+    """カード・タイトル・ラベルはあるが、対象の <p> が無い入力"""
+    unit = (
+        f'{structure.RESULT_CARD}<h4>カラー判断</h4>'
+        f'{structure.AVERAGE_LABEL}<p className="text-xl">-</p>\n'
+    )
+    return unit * max(1, size // len(unit.encode('utf-8')))
+
+
+def _oversized_page(size):
+    """実ページ (マーカーを HTML コメントにしたもの) を繰り返した入力"""
+    if PAGE.exists():
+        page = PAGE.read_text(encoding='utf-8').replace('{/* ランキングエリア */}', structure.RANKING_MARKER)
+    else:
+        page = f'<>\n{structure.RANKING_MARKER}\n{structure.RANKING_BOX}<div></div>\n</div>\n</>\n'
+    return page * max(1, size // len(page.encode('utf-8')))
+
+
+CASES = [
+    ('ranking v2 (敵対的)', _adversarial_ranking,
+     lambda s: LEGACY_RANKING_V2.sub(REPLACEMENT, s),
+     lambda s: structure.replace_ranking_box(s, REPLACEMENT)),
+    ('ranking v3 (敵対的)', _adversarial_ranking,
+     lambda s: LEGACY_RANKING_V3.sub(REPLACEMENT, s),
+     lambda s: structure.replace_ranking_to_fragment_end(s, REPLACEMENT)),
+    ('color size (敵対的)', _adversarial_card,
+     lambda s: LEGACY_COLOR_SIZE.sub(r'\1text-xl\3', s),
+     lambda s: structure.resize_card_value(s, 'カラー判断', 'text-blue-600')),
+    ('ranking v2 (巨大ページ)', _oversized_page,
+     lambda s: LEGACY_RANKING_V2.sub(REPLACEMENT, s),
+     lambda s: structure.replace_ranking_box(s, REPLACEMENT)),
+    ('ranking v3 (巨大ページ)', _oversized_page,
+     lambda s: LEGACY_RANKING_V3.sub(REPLACEMENT, s),
+     lambda s: structure.replace_ranking_to_fragment_end(s, REPLACEMENT)),
+]
+
+
+def _time(func, content):
+    start = time.perf_counter()
+    func(content)
+    return time.perf_counter() - start
+
+
+def _fmt(seconds, size):
+    if seconds is None:
+        return f"{'(省略)':>22}"
+    mbps = size / (1024 * 1024) / seconds if seconds > 0 else float('inf')
+    return f'{seconds * 1000:10.1f}ms {mbps:8.1f}MB/s'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="構造マッチャと旧 DOTALL パターンの比較")
+    parser.add_argument('--max-kb', type=int, default=8192, help='最大入力サイズ (KB)')
+    parser.add_argument('--budget', type=float, default=2.0, help='旧パターン1回あたりの時間の上限 (秒)')
+    args = parser.parse_args(argv)
+
+    for name, make, legacy, anchored in CASES:
+        print(f"\n📏 {name}")
+        print(f"{'サイズ':>10} {'旧パターン':>22} {'構造マッチャ':>22}")
+        legacy_alive = True
+        size = 1024
+        while size <= args.max_kb * 1024:
+            content = make(size)
+            actual = len(content.encode('utf-8'))
+            legacy_time = _time(legacy, content) if legacy_alive else None
+            # 旧パターンは二乗で遅くなるので、4倍のサイズでは16倍かかる前提で打ち切る
+            if legacy_time is not None and legacy_time * 16 > args.budget:
+                legacy_alive = False
+            anchored_time = _time(anchored, content)
+            print(f"{actual / 1024:>8.1f}KB {_fmt(legacy_time, actual)} {_fmt(anchored_time, actual)}")
+            size *= 4
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+大きな入力向けのバイト列処理 (--mmap)
+ファイルを mmap し、UTF-8 のバイト列のまま置換ルールを走らせる。
+出力は「変わらない範囲 (マップしたバッファのスライス)」と「置換後のバイト列」を順に
+一時ファイルへ書き出して作るので、全体のデコード・エンコードやコピーをしない。
+ファイルが大きくても (まとめたページ・連結したスナップショットなど) メモリ使用量は増えない。
+
+バイト列版を持つ変換関数だけが対象で、それ以外はこれまでどおり str で変換する:
+
+    @bytepath.variant(fix_training_page_units)
+    def fix_training_page_units_bytes(filepath, buffer):
+        return TRAINING_UNIT_RULES.byte_edits(buffer)
+"""
+
+import contextlib
+import hashlib
+import mmap
+import os
+import shutil
+from functools import partial
+from pathlib import Path
+
+
+def variant(transform):
+    """transform のバイト列版を登録するデコレータ
+
+    バイト列版は transform と同じ引数 (content の代わりに mmap したバッファ) を受け取り、
+    編集のリスト [(開始, 終了, 置換後のバイト列)] (位置の順、重ならない) を返す。
+    None を返したときは通常の str の変換にまかせる (その前に何も出力しないこと)。
+    """
+    def decorator(func):
+        transform.byte_edits = func
+        return func
+    return decorator
+
+
+def edits_function(transform):
+    """変換関数のバイト列版 (partial なら同じ引数を付けたもの、無ければ None)"""
+    if isinstance(transform, partial):
+        func = getattr(transform.func, 'byte_edits', None)
+        return partial(func, *transform.args, **transform.keywords) if func else None
+    return getattr(transform, 'byte_edits', None)
+
+
+@contextlib.contextmanager
+def mapped(filepath):
+    """ファイルを読み取り専用で mmap する (空のファイルは mmap できないので b'')
+
+    mmap の in は1バイトしか調べないので、部分列の検索には find を使うこと。
+    """
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+
+
+def write_edits(path, buffer, edits):
+    """buffer に edits を適用した内容を path に書き出し、その SHA-256 を返す"""
+    h = hashlib.sha256()
+    with open(path, 'wb') as f, memoryview(buffer) as view:
+        last = 0
+        for start, end, chunk in edits:
+            # スライスは memoryview なのでコピーしない (mmap を閉じる前に解放する)
+            with view[last:start] as piece:
+                h.update(piece)
+                f.write(piece)
+            h.update(chunk)
+            f.write(chunk)
+            last = end
+        with view[last:] as piece:
+            h.update(piece)
+            f.write(piece)
+    return h.hexdigest()
+
+
+def temp_path(filepath):
+    """書き込み用の一時ファイル (fileio.atomic_write と同じ名前)"""
+    path = Path(filepath)
+    return path.with_name(path.name + '.tmp')
+
+
+def replace(filepath, tmp):
+    """一時ファイルで filepath を置き換える (mmap を閉じてから呼ぶこと)"""
+    if os.path.exists(filepath):
+        shutil.copymode(filepath, tmp)
+    os.replace(tmp, filepath)
@@ -0,0 +1,90 @@
+"""
+--dry-run 用の行単位スパンパッチと unified diff
+変換前後の内容を両方持ち続けずに、変わった行の範囲と新しい行だけ (スパンパッチ) を残す。
+diff は元のファイル (dry-run では書き換えない) とスパンパッチから作る。
+"""
+
+import difflib
+
+
+def span_patch(old, new):
+    """行単位のスパンパッチ [(開始行, 終了行, 新しい行のリスト)] (行は改行付き)
+
+    先頭と末尾の共通する行を除いた範囲だけを比較するので、
+    編集が局所的なら比較のコストも変わった範囲の大きさで済む。
+    """
+    if old == new:
+        return []
+    a = old.splitlines(keepends=True)
+    b = new.splitlines(keepends=True)
+    prefix = 0
+    limit = min(len(a), len(b))
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    a_mid = a[prefix:len(a) - suffix]
+    b_mid = b[prefix:len(b) - suffix]
+    matcher = difflib.SequenceMatcher(None, a_mid, b_mid, autojunk=False)
+    return [
+        (prefix + i1, prefix + i2, b_mid[j1:j2])
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != 'equal'
+    ]
+
+
+def stats(patch):
+    """(追加行数, 削除行数)"""
+    return sum(len(lines) for _, _, lines in patch), sum(end - start for start, end, _ in patch)
+
+
+def _range(start, length):
+    # difflib.unified_diff と同じ書き方 (1行なら長さを省き、0行なら直前の行番号)
+    if length == 1:
+        return f'{start + 1}'
+    if not length:
+        return f'{start},0'
+    return f'{start + 1},{length}'
+
+
+def _line(prefix, line):
+    if line.endswith('\n'):
+        return prefix + line
+    return prefix + line + '\n\\ No newline at end of file\n'
+
+
+def unified_diff(filepath, old, patch, context=3):
+    """元の内容とスパンパッチから unified diff の行を順に返す"""
+    if not patch:
+        return
+    a = old.splitlines(keepends=True)
+    yield f'--- a/{filepath}\n'
+    yield f'+++ b/{filepath}\n'
+
+    # 間の変わらない行が context × 2 以下のスパンは1つのハンクにまとめる
+    hunks = [[patch[0]]]
+    for span in patch[1:]:
+        if span[0] - hunks[-1][-1][1] <= context * 2:
+            hunks[-1].append(span)
+        else:
+            hunks.append([span])
+
+    offset = 0      # それまでのスパンで増減した行数
+    for hunk in hunks:
+        a_start = max(0, hunk[0][0] - context)
+        a_end = min(len(a), hunk[-1][1] + context)
+        b_start = a_start + offset
+        before = offset
+        body = []
+        pos = a_start
+        for start, end, lines in hunk:
+            body.extend(_line(' ', line) for line in a[pos:start])
+            body.extend(_line('-', line) for line in a[start:end])
+            body.extend(_line('+', line) for line in lines)
+            offset += len(lines) - (end - start)
+            pos = end
+        body.extend(_line(' ', line) for line in a[pos:a_end])
+        b_length = a_end - a_start + offset - before
+        yield f'@@ -{_range(a_start, a_end - a_start)} +{_range(b_start, b_length)} @@\n'
+        yield from body
@@ -0,0 +1,138 @@
+"""
+対象ファイルの探索とリテラルによる事前フィルタ
+app/**/*.tsx のようなパターンで対象ファイルを探し (os.scandir による1回の走査)、
+変換を実行する前に、その変換が必要とする文字列 (リテラル) が含まれているかを確かめる。
+どのリテラルも含まないファイルは、変換しても内容が変わらないので正規表現を1つも走らせずにスキップする。
+
+    @discover.requires('}ms', '>ms<')
+    def fix_training_page_units(filepath, content):
+        ...
+
+リテラルは「これが無ければ変換は何も変えない」ものだけを挙げること
+(各ルールのアンカーやパターンに必ず含まれる部分文字列)。
+"""
+
+import os
+import re
+from functools import partial
+
+# 探索しないディレクトリ
+SKIP_DIRS = {'node_modules', '.next', '.git', '.shimane_cache', '__pycache__'}
+
+
+def requires(*literals):
+    """変換関数が何かを変えるために必要なリテラルを宣言するデコレータ (どれか1つあればよい)"""
+    def decorator(func):
+        func.required_literals = frozenset(literals)
+        return func
+    return decorator
+
+
+def literals(transform):
+    """変換が何かを変えるために必要なリテラルの集合 (None は判定できない = 必ず変換する)
+
+    変換を合成した partial (pipeline.compose) は、構成要素のリテラルの和になる。
+    どの構成要素のリテラルも無ければ、どの要素も内容を変えないので合成した変換も変えない。
+    partial 自体に required_literals があればそれを使う (rulefile の対象ごとのリテラル)。
+    """
+    if hasattr(transform, 'required_literals'):
+        return transform.required_literals
+    if isinstance(transform, partial):
+        parts = [
+            item
+            for arg in transform.args
+            for item in (arg if isinstance(arg, tuple) else (arg,))
+            if callable(item)
+        ]
+        if parts:
+            found = set()
+            for part in parts:
+                required = literals(part)
+                if required is None:
+                    return None
+                found |= required
+            return frozenset(found)
+        transform = transform.func
+    return getattr(transform, 'required_literals', None)
+
+
+_encoded = {}
+
+
+def may_change(transform, data):
+    """data (bytes・mmap または str) に対して transform が何かを変える可能性があるか"""
+    required = literals(transform)
+    if required is None:
+        return True
+    if isinstance(data, str):
+        return any(literal in data for literal in required)
+    encoded = _encoded.get(required)
+    if encoded is None:
+        encoded = _encoded[required] = [literal.encode('utf-8') for literal in required]
+    # mmap の in は1バイトしか調べないので find を使う
+    return any(data.find(literal) >= 0 for literal in encoded)
+
+
+def _compile(pattern):
+    """パターン (** は0個以上のディレクトリ) を正規表現にする"""
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            out.append('(?:[^/]+/)*')
+            i += 3
+        elif pattern.startswith('**', i):
+            out.append('.*')
+            i += 2
+        elif pattern[i] == '*':
+            out.append('[^/]*')
+            i += 1
+        elif pattern[i] == '?':
+            out.append('[^/]')
+            i += 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile(''.join(out) + r'\Z')
+
+
+def walk(root):
+    """root 以下のファイルのパス (/ 区切り、root を含む) を返す (SKIP_DIRS と . で始まるものは除く)"""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith('.') or entry.name in SKIP_DIRS:
+                continue
+            path = f'{directory}/{entry.name}'
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(path)
+            elif entry.is_file():
+                yield path
+
+
+def find(pattern, exclude=(), first=()):
+    """パターンに一致するファイルをパスの順に返す (例: 'app/**/page.tsx')
+
+    first に挙げたパスは (一致すれば) その順に先頭に並べる。
+    """
+    # ワイルドカードを含まない先頭のディレクトリから探す
+    parts = pattern.split('/')
+    fixed = []
+    for part in parts[:-1]:
+        if any(c in part for c in '*?'):
+            break
+        fixed.append(part)
+    if len(fixed) == len(parts) - 1 and not any(c in parts[-1] for c in '*?'):
+        return [pattern] if os.path.isfile(pattern) and pattern not in exclude else []
+    root = '/'.join(fixed) or '.'
+    regex = _compile(pattern if fixed else './' + pattern)
+    found = sorted(path for path in walk(root) if regex.match(path) and path not in exclude)
+    if not first:
+        return found
+    head = [path for path in first if path in found]
+    return head + [path for path in found if path not in head]
@@ -0,0 +1,26 @@
+"""
+ファイルの書き込みと内容のハッシュ (パイプラインと shimane_records の共通部分)
+"""
+
+import hashlib
+import os
+import shutil
+from pathlib import Path
+
+
+def content_hash(data):
+    """バイト列の SHA-256 を返す"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def atomic_write(path, data):
+    """途中で止まっても壊れないように一時ファイル経由で書き込む
+
+    既存ファイルは置き換えになるので、ハードリンクで共有していた内容は書き換わらない。
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_bytes(data)
+    if path.exists():
+        shutil.copymode(path, tmp)
+    os.replace(tmp, path)
@@ -0,0 +1,280 @@
+"""
+ルールごとの計測 (--profile)
+ファイル × 変換 × ルールごとに、呼び出し回数・時間・走査したバイト数・マッチ数・変更したバイト数を記録し、
+JSON のレポートと時間順のサマリー (一度もマッチしなかったルールの一覧付き) を出す。
+計測していないときのコストは enabled() の確認1回分だけ。
+
+記録される主なルール名:
+    rules.sub などのレジストリ経由の置換     パターン名 (unit.time など)
+    RuleSet / LiteralSet                     ruleset:<名前> (走査時間) と各ルール (マッチ数)
+    @rule / @patch_rule を付けた関数         structure.* / tsx.* / jsblocks.*
+    索引作成 (走査のみ)                       tsx.parse / jsblocks.index
+    各スクリプトの変換関数                    transform:<スクリプト>:<関数>
+"""
+
+import contextlib
+import functools
+import json
+import time
+from pathlib import Path
+
+REPORT_PATH = Path('.shimane_cache') / 'profile.json'
+
+_enabled = False
+_file = None
+_transform = None
+# (ファイル, 変換名, ルール名) → [呼び出し回数, 秒, 走査バイト数, マッチ数, 変更バイト数]
+_records = {}
+# 実行中の @rule 関数に replace_spans などが報告した [マッチ数, 変更バイト数] (関数の外では None)
+_pending = None
+# 計測対象として定義されたルール名 (一度も呼ばれなかったものを報告するため)
+KNOWN = set()
+# 置換ではなく索引作成などの走査 (マッチしなくても不要なルールとは報告しない)
+SCANS = set()
+
+FIELDS = ('calls', 'seconds', 'bytes_scanned', 'matches', 'bytes_changed')
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+
+def enabled():
+    return _enabled
+
+
+@contextlib.contextmanager
+def current_file(filepath):
+    """この中で記録したものを filepath の分として扱う"""
+    global _file
+    previous, _file = _file, filepath
+    try:
+        yield
+    finally:
+        _file = previous
+
+
+def call(name, transform, content):
+    """変換関数を実行し、transform:<name> として記録する
+
+    変換の中で記録したルールは name の分になる (同じルールを別の変換が使っていても区別できる)。
+    name はファイルごとに引数が違う partial でもまとまるように、関数の名前だけにする。
+    """
+    global _transform
+    outer, _transform = _transform, name
+    start = time.perf_counter()
+    try:
+        output = transform(content)
+    finally:
+        elapsed = time.perf_counter() - start
+        _transform = outer
+    record(f'transform:{name}', elapsed, nbytes(content), int(output != content), changed_bytes(content, output))
+    return output
+
+
+def call_edits(name, func, buffer):
+    """バイト列版の変換 (--mmap) を実行し、call と同じく transform:<name> として記録する"""
+    global _transform
+    outer, _transform = _transform, name
+    start = time.perf_counter()
+    try:
+        edits = func(buffer)
+    finally:
+        elapsed = time.perf_counter() - start
+        _transform = outer
+    if edits is not None:
+        changed = sum(end - begin + len(chunk) for begin, end, chunk in edits)
+        record(f'transform:{name}', elapsed, len(buffer), int(bool(edits)), changed)
+    return edits
+
+
+def nbytes(text):
+    return len(text.encode('utf-8'))
+
+
+def changed_bytes(before, after):
+    """先頭と末尾の共通部分を除いた、変わった範囲のバイト数 (前後の合計)"""
+    if before == after:
+        return 0
+    limit = min(len(before), len(after))
+    prefix = 0
+    while prefix < limit and before[prefix] == after[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and before[-1 - suffix] == after[-1 - suffix]:
+        suffix += 1
+    return nbytes(before[prefix:len(before) - suffix]) + nbytes(after[prefix:len(after) - suffix])
+
+
+def record(rule, seconds, scanned=0, matches=0, changed=0):
+    """1回分の計測結果を加える"""
+    key = (_file or '-', _transform or '-', rule)
+    values = _records.get(key)
+    if values is None:
+        values = _records[key] = [0, 0.0, 0, 0, 0]
+    values[0] += 1
+    values[1] += seconds
+    values[2] += scanned
+    values[3] += matches
+    values[4] += changed
+
+
+def note_edits(content, edits):
+    """スパン編集 (開始, 終了, 置換文字列) を、実行中のルールのマッチとして報告する"""
+    if _pending is None:
+        return
+    for start, end, text in edits:
+        _pending[0] += 1
+        _pending[1] += nbytes(content[start:end]) + nbytes(text)
+
+
+def rule(name, scan=False):
+    """content を受け取る関数を計測するデコレータ
+
+    マッチ数・変更バイト数は、関数の中で note_edits() に報告されたスパン編集から数える。
+    scan=True は索引作成などの走査で、マッチが 0 でも不要なルールとは報告しない。
+    """
+    KNOWN.add(name)
+    if scan:
+        SCANS.add(name)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(content, *args, **kwargs):
+            global _pending
+            if not _enabled:
+                return func(content, *args, **kwargs)
+            outer, _pending = _pending, [0, 0]
+            start = time.perf_counter()
+            try:
+                return func(content, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                record(name, elapsed, nbytes(content), *_pending)
+                _pending = outer
+        return wrapper
+    return decorator
+
+
+def patch_rule(name):
+    """tsx.Patch に編集を追加する関数を計測するデコレータ (索引を引くだけなので走査バイト数は 0)"""
+    KNOWN.add(name)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(patch, *args, **kwargs):
+            if not _enabled:
+                return func(patch, *args, **kwargs)
+            before = len(patch.edits)
+            start = time.perf_counter()
+            try:
+                return func(patch, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                added = patch.edits[before:]
+                changed = sum(nbytes(patch.content[s:e]) + nbytes(text) for s, e, text in added)
+                record(name, elapsed, 0, len(added), changed)
+        return wrapper
+    return decorator
+
+
+def sub(name, regex, repl, content, count=0):
+    """regex.sub と同じ置換を、マッチ数と変更バイト数を数えながら行う"""
+    stats = [0, 0]
+
+    def replace(m):
+        text = repl(m) if callable(repl) else m.expand(repl)
+        stats[0] += 1
+        if text != m.group():
+            stats[1] += nbytes(m.group()) + nbytes(text)
+        return text
+
+    start = time.perf_counter()
+    result = regex.sub(replace, content, count)
+    record(name, time.perf_counter() - start, nbytes(content), *stats)
+    return result
+
+
+def drain():
+    """記録した結果を行のリストで取り出して消す (ワーカープロセスから親へ返す用)"""
+    rows = [list(key) + values for key, values in _records.items()]
+    _records.clear()
+    return rows
+
+
+def merge(rows):
+    """drain() の結果を取り込む"""
+    for filepath, transform, name, *values in rows:
+        key = (filepath, transform, name)
+        current = _records.setdefault(key, [0, 0.0, 0, 0, 0])
+        for i, value in enumerate(values):
+            current[i] += value
+
+
+def _add(totals, key, values):
+    current = totals.setdefault(key, [0, 0.0, 0, 0, 0])
+    for i, value in enumerate(values):
+        current[i] += value
+
+
+def report(known=()):
+    """レポート (JSON にそのまま書ける辞書) を作る
+
+    rules はルールごとの合計、matrix はファイル → 変換 → ルールごとの値。
+    dead は呼ばれたのにどのファイルでもマッチしなかった (変換, ルール)、
+    unused は一度も呼ばれなかったルール (known にはレジストリのパターン名などを渡す)。
+    """
+    per_rule = {}
+    per_use = {}
+    matrix = {}
+    total = 0.0
+    for (filepath, transform, name), values in _records.items():
+        _add(per_rule, name, values)
+        _add(per_use, (transform, name), values)
+        matrix.setdefault(filepath, {}).setdefault(transform, {})[name] = dict(zip(FIELDS, values))
+        if transform == '-' and name.startswith('transform:'):
+            total += values[1]
+
+    dead = [
+        {'rule': name, 'transform': transform}
+        for (transform, name), values in sorted(per_use.items())
+        if values[3] == 0 and name not in SCANS and not name.startswith(('transform:', 'ruleset:'))
+    ]
+    return {
+        'rules': {name: dict(zip(FIELDS, values)) for name, values in per_rule.items()},
+        'matrix': matrix,
+        'dead': dead,
+        'unused': sorted((set(known) | KNOWN) - set(per_rule)),
+        'total_seconds': total,
+    }
+
+
+def write_report(path=REPORT_PATH, known=()):
+    """JSON のレポートを書き出し、時間順のサマリーを表示する"""
+    data = report(known)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2, sort_keys=True) + '\n', encoding='utf-8')
+
+    print("\n" + "=" * 60)
+    print("⏱️  ルールごとの計測結果 (時間の長い順)")
+    print("=" * 60)
+    width = max([len(name) for name in data['rules']] + [24])
+    print(f"{'ルール':<{width}} {'回数':>5} {'時間(ms)':>9} {'走査(KB)':>9} {'マッチ':>6} {'変更(B)':>8}")
+    for name, values in sorted(data['rules'].items(), key=lambda item: -item[1]['seconds']):
+        print(
+            f"{name:<{width}} {values['calls']:>5} {values['seconds'] * 1000:>9.2f} "
+            f"{values['bytes_scanned'] / 1024:>9.1f} {values['matches']:>6} {values['bytes_changed']:>8}"
+        )
+    print(f"\n変換全体: {data['total_seconds'] * 1000:.2f}ms")
+    if data['dead']:
+        print(f"\n💀 一度もマッチしなかったルール ({len(data['dead'])}):")
+        for item in data['dead']:
+            print(f"   {item['rule']}  ({item['transform']})")
+    if data['unused']:
+        print(f"\n💤 一度も呼ばれなかったルール ({len(data['unused'])}):")
+        for name in data['unused']:
+            print(f"   {name}")
+    print(f"\n📄 レポート: {path}")
+    return data
@@ -0,0 +1,176 @@
+"""
+関数本体 {…} の索引と async/await 化 (fix-all-async.py / fix-async-pages.py)
+
+tsx.py の走査 (文字列・テンプレートリテラル・コメント・JSX を読み分ける) で記録した
+中括弧の対応と await の位置から、
+
+    useEffect(() => { … }, [deps]);
+    const handleXxx = () => { … };
+
+の本体を正確なスパンで索引にする。[^}]* のように最初の '}' で止まることはなく、
+ページ全体の走査は1回 (O(ファイルサイズ)) で済む。
+"""
+
+import re
+
+from shimane_pipeline import instrument, tsx
+
+# 中括弧の直前 (この範囲だけを見るので、1つの中括弧あたりの手間は一定)
+_HEADER_WINDOW = 200
+_EFFECT_HEADER = re.compile(r'useEffect\(\s*(async\s*)?\(\)\s*=>\s*$')
+_HANDLER_HEADER = re.compile(r'const\s+(handle\w+)\s*=\s*(async\s*)?\(\)\s*=>\s*$')
+_FUNCTION_HEADER = re.compile(r'\bfunction\b[\w\s]*\([^()]*\)\s*$')
+_EFFECT_DEPS = re.compile(r'\s*,\s*\[([^\]]*)\]\s*\)\s*;?')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class Block:
+    """useEffect / handle 関数の本体1つ分"""
+
+    __slots__ = ('kind', 'name', 'start', 'open', 'close', 'is_async', 'has_await', 'deps', 'end', 'content')
+
+    def __init__(self, kind, name, start, open_, close, is_async, content):
+        self.kind = kind            # 'effect' / 'handler'
+        self.name = name            # handler の関数名 (effect は None)
+        self.start = start          # 'useEffect' / 'const' の位置
+        self.open = open_           # 本体の '{' の位置
+        self.close = close          # 本体の '}' の位置
+        self.is_async = is_async
+        self.has_await = False      # 本体に (入れ子の関数の外で) await があるか
+        self.deps = None            # effect の依存配列の中身 (書かれていなければ None)
+        self.end = close + 1        # effect は '}, [deps]);' の後ろまで
+        self.content = content
+
+    def __repr__(self):
+        return f'Block({self.kind!r}, {self.name!r}, {self.start}, {self.end})'
+
+    @property
+    def body(self):
+        return self.content[self.open + 1:self.close]
+
+    def statements(self):
+        """本体の空白をまとめた文字列"""
+        return _WHITESPACE.sub(' ', self.body).strip()
+
+
+@instrument.rule('jsblocks.index', scan=True)
+def index(content):
+    """content の useEffect / handle 関数の一覧 (出現順)"""
+    tree = tsx.parse(content)
+    blocks = []
+    # 中括弧を開き順に見ながら、開いている関数本体のスタックで await の持ち主を決める
+    functions = []      # (閉じ位置, Block または None)
+    awaits = tree.awaits
+    next_await = 0
+
+    def assign_awaits(upto):
+        nonlocal next_await
+        while next_await < len(awaits) and awaits[next_await] < upto:
+            pos = awaits[next_await]
+            while functions and functions[-1][0] < pos:
+                functions.pop()
+            if functions:
+                block = functions[-1][1]
+                if block is not None:
+                    block.has_await = True
+            next_await += 1
+
+    for open_, close in tree.braces:
+        assign_awaits(open_)
+        if close is None:
+            continue
+        header = content[max(0, open_ - _HEADER_WINDOW):open_]
+        tail = header.rstrip()[-2:]
+        if tail[-1:] != ')' and tail != '=>':
+            # if / オブジェクトリテラルなど、関数本体ではない中括弧
+            continue
+        block = None
+        effect = _EFFECT_HEADER.search(header) if tail == '=>' else None
+        if effect:
+            block = Block('effect', None, open_ - len(header) + effect.start(), open_, close,
+                          bool(effect.group(1)), content)
+            deps = _EFFECT_DEPS.match(content, close + 1)
+            if deps:
+                block.deps = deps.group(1).strip()
+                block.end = deps.end()
+        elif tail == '=>':
+            handler = _HANDLER_HEADER.search(header)
+            if handler:
+                block = Block('handler', handler.group(1), open_ - len(header) + handler.start(), open_, close,
+                              bool(handler.group(2)), content)
+        if block is not None:
+            blocks.append(block)
+            functions.append((close, block))
+            continue
+        if tail == '=>' or ('function' in header and _FUNCTION_HEADER.search(header)):
+            # 入れ子の関数: その中の await は外側の本体のものではない
+            functions.append((close, None))
+    assign_awaits(len(content))
+    return blocks
+
+
+# ---------------------------------------------------------------
+# async/await 化
+# ---------------------------------------------------------------
+LOAD_DATA_EFFECT = '''useEffect(() => {
+    const loadData = async () => {
+      const user = await getUser();
+      setCurrentUser(user);
+      
+      const sessionData = await getCurrentSession();
+      setSession(sessionData);
+    };
+    loadData();
+  }, []);'''
+
+_HOME_EFFECT_BODY = (
+    'const user = getUser(); setCurrentUser(user); '
+    'const sessionData = getCurrentSession(); setSession(sessionData);'
+)
+_LOAD_USER_FIRST = re.compile(r'\s*const currentUser = getUser\(\);')
+_LOAD_USER_LAST = re.compile(r'setUser\(currentUser\);(\s*)$')
+_GUARD = re.compile(r'\s*if \(!currentUser\) \{')
+
+
+@instrument.patch_rule('jsblocks.convert_home_effect')
+def convert_home_effect(patch, blocks):
+    """app/page.tsx: getUser / getCurrentSession を読む useEffect を loadData() にする"""
+    for block in blocks:
+        if block.kind == 'effect' and block.deps == '' and block.statements() == _HOME_EFFECT_BODY:
+            patch.replace(block.start, block.end, LOAD_DATA_EFFECT)
+
+
+@instrument.patch_rule('jsblocks.convert_load_user')
+def convert_load_user(patch, blocks, deps=None, guarded=False):
+    """getUser() → setUser() の useEffect を loadUser() にする
+
+    deps を渡した場合は依存配列がそれと一致する effect だけ、
+    guarded なら先頭の getUser() の直後に if (!currentUser) {…} がある effect だけを変換する。
+    """
+    content = patch.content
+    for block in blocks:
+        if block.kind != 'effect' or block.is_async or block.deps is None:
+            continue
+        if deps is not None and block.deps != deps:
+            continue
+        first = _LOAD_USER_FIRST.match(content, block.open + 1)
+        last = _LOAD_USER_LAST.search(block.body)
+        if first is None or last is None:
+            continue
+        if guarded and not _GUARD.match(content, first.end()):
+            continue
+        body_start = first.end() - len('const currentUser = getUser();')
+        patch.replace(body_start, first.end(),
+                      'const loadUser = async () => {\n      const currentUser = await getUser();')
+        last_end = block.open + 1 + last.start(1)
+        patch.insert(last_end, '\n    };\n    loadUser();')
+
+
+@instrument.patch_rule('jsblocks.convert_handlers')
+def convert_handlers(patch, blocks):
+    """本体で await を使っている同期の handle 関数を async にする"""
+    content = patch.content
+    for block in blocks:
+        if block.kind == 'handler' and not block.is_async and block.has_await:
+            arrow = content.index('()', block.start, block.open)
+            patch.insert(arrow, 'async ')
@@ -0,0 +1,109 @@
+"""
+JS / TSX の字句の共通部分
+tsx.py の索引と validate.py の構文チェックは、同じ規則で文字列・コメント・正規表現リテラル・
+テンプレートリテラルを読み飛ばし、同じ条件で '<' を JSX の始まりとみなす。
+括弧や要素の崩れをどう扱うか (読み進めるか、エラーにするか) はそれぞれの側で決める。
+"""
+
+import re
+
+# JS のコードで特別な意味を持つ字句 (tsx.py は await の位置も記録する)
+JS_SPECIAL = re.compile(r'//|/\*|/|[{}()\[\]<"\'`]')
+JS_SPECIAL_AWAIT = re.compile(r'//|/\*|/|\bawait\b|[{}()\[\]<"\'`]')
+
+STRINGS = {
+    '"': re.compile(r'"(?:[^"\\\n]|\\.)*"', re.DOTALL),
+    "'": re.compile(r"'(?:[^'\\\n]|\\.)*'", re.DOTALL),
+}
+TEMPLATE_TEXT = re.compile(r'(?:[^`\\$]|\\.|\$(?!\{))*', re.DOTALL)
+REGEX_LITERAL = re.compile(r'/(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[a-z]*')
+COMMENT_END = re.compile(r'\*/')
+LINE_END = re.compile(r'\n')
+
+NAME = re.compile(r'[A-Za-z][\w.:-]*')
+ATTR_NAME = re.compile(r'[A-Za-z_$][\w:$-]*')
+SPACE = re.compile(r'\s*')
+
+# この直後の '<' は比較演算子ではなく JSX の開始とみなす
+JSX_PRECEDERS = set('(,=?:&|{}[!;>')
+JSX_KEYWORDS = ('return', 'default', 'yield')
+# この直後の '/' は割り算ではなく正規表現リテラルの始まり
+REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+REGEX_KEYWORDS = ('return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'void', 'yield', 'await', 'delete',
+                  'throw', 'new')
+
+# Scanner.skip で読み飛ばす字句の始まり
+SKIPPED = ('"', "'", '//', '/*', '/')
+
+
+def after(content, i, chars, keywords):
+    """i の前の空白でない文字が chars のいずれか (または先頭)、またはキーワードの直後か"""
+    j = i - 1
+    while j >= 0 and content[j].isspace():
+        j -= 1
+    if j < 0 or content[j] in chars:
+        return True
+    if not content.endswith(keywords, 0, j + 1):
+        return False
+    # キーワードの前が識別子の文字なら別の単語 (returned など)
+    k = j + 1 - next(len(word) for word in keywords if content.endswith(word, 0, j + 1))
+    return k == 0 or not (content[k - 1].isalnum() or content[k - 1] in '_$')
+
+
+def jsx_start(content, i):
+    """i の '<' が JSX の要素 (またはフラグメント) の始まりか"""
+    nxt = content[i + 1:i + 2]
+    return (nxt.isalpha() or nxt == '>') and after(content, i, JSX_PRECEDERS, JSX_KEYWORDS)
+
+
+def attr_string_end(content, pos):
+    """pos の引用符から始まる JSX の属性の文字列の後ろの位置 (閉じていなければ -1)
+
+    JSX の属性ではバックスラッシュはエスケープではない。
+    """
+    end = content.find(content[pos], pos + 1)
+    return end + 1 if end >= 0 else -1
+
+
+class Scanner:
+    """JS のコードを読む側の共通部分 (サブクラスが js(pos, stop, ...) を持つ)"""
+
+    def __init__(self, content):
+        self.content = content
+
+    def unclosed(self, pos, message):
+        """pos から始まる文字列・コメント・テンプレートリテラルが閉じていない (既定は末尾まで読んだことにする)"""
+        return len(self.content)
+
+    def skip(self, i, c):
+        """i から始まる文字列・コメント・正規表現リテラル (c は SKIPPED のいずれか) の後ろの位置
+
+        c が '/' で割り算なら i + 1。
+        """
+        content = self.content
+        if c in STRINGS:
+            string = STRINGS[c].match(content, i)
+            return string.end() if string else self.unclosed(i, "文字列が閉じていません")
+        if c == '//':
+            line = LINE_END.search(content, i)
+            return line.end() if line else len(content)
+        if c == '/*':
+            end = COMMENT_END.search(content, i + 2)
+            return end.end() if end else self.unclosed(i, "コメントが閉じていません")
+        if after(content, i, REGEX_PRECEDERS, REGEX_KEYWORDS):
+            literal = REGEX_LITERAL.match(content, i)
+            if literal:
+                return literal.end()
+        return i + 1
+
+    def template(self, i, *args):
+        """i の '`' から始まるテンプレートリテラルの後ろの位置 (${…} の中は js(…, '}', *args) で読む)"""
+        content = self.content
+        pos = i + 1
+        while True:
+            pos = TEMPLATE_TEXT.match(content, pos).end()
+            if pos >= len(content):
+                return self.unclosed(i, "テンプレートリテラルが閉じていません")
+            if content[pos] == '`':
+                return pos + 1
+            pos = self.js(pos + 2, '}', *args) + 1
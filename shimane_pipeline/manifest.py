@@ -0,0 +1,176 @@
+"""
+インクリメンタル実行用のマニフェスト
+(ルールセットのハッシュ, 入力内容のハッシュ) → 出力内容のハッシュ を記録し、
+一度変換した入力は再変換せずにスキップ (またはキャッシュから反映) する。
+出力にもう一度変換しても変わらないと確かめた出力は 出力ハッシュ → 出力ハッシュ も記録し、
+書き換えた後のファイルも次回は変換せずにスキップする。
+"""
+
+import hashlib
+import inspect
+import json
+import os
+from functools import partial
+from pathlib import Path
+
+from shimane_pipeline.fileio import atomic_write, content_hash
+
+CACHE_DIR = Path('.shimane_cache')
+MANIFEST_PATH = CACHE_DIR / 'manifest.json'
+OBJECTS_DIR = CACHE_DIR / 'objects'
+
+MANIFEST_VERSION = 1
+
+# 1つの変換関数について覚えておく入力の数 (古いものから捨てる)
+MAX_ENTRIES = 64
+
+# ルールセットのハッシュに含める共通モジュール
+_PACKAGE_DIR = Path(__file__).resolve().parent
+
+_source_hashes = {}
+
+
+def _source_hash(path):
+    """ソースファイルのハッシュ (1実行につき1回だけ読む)"""
+    if path not in _source_hashes:
+        _source_hashes[path] = content_hash(Path(path).read_bytes())
+    return _source_hashes[path]
+
+
+def _describe(arg):
+    """partial の引数の表示 (変換関数は名前で、タプルは要素ごとに)"""
+    if callable(arg):
+        return transform_name(arg)
+    if isinstance(arg, tuple):
+        return '(' + ', '.join(_describe(item) for item in arg) + ')'
+    return repr(arg)
+
+
+def _functions(transform):
+    """変換関数と、partial の引数に含まれる変換関数をすべて返す"""
+    func, args = transform, ()
+    if isinstance(transform, partial):
+        func, args = transform.func, transform.args
+    functions = [func]
+    for arg in args:
+        for item in (arg if isinstance(arg, tuple) else (arg,)):
+            if callable(item):
+                functions.extend(_functions(item))
+    return functions
+
+
+def transform_name(transform):
+    """変換関数の表示名 (スクリプト名:関数名, partial の場合は引数付き)"""
+    func, args = transform, ()
+    if isinstance(transform, partial):
+        func, args = transform.func, transform.args
+    name = f'{os.path.basename(inspect.getsourcefile(func))}:{func.__qualname__}'
+    if args:
+        name += '(' + ', '.join(_describe(arg) for arg in args) + ')'
+    return name
+
+
+def ruleset_hash(transform):
+    """変換関数のルールセットハッシュ
+
+    変換関数 (合成した変換ではその構成要素すべて) を定義しているスクリプトと
+    shimane_pipeline のソース、partial の引数から計算する。
+    どれかが変わればキャッシュは無効になる。
+    """
+    h = hashlib.sha256()
+    h.update(transform_name(transform).encode('utf-8'))
+    sources = sorted({inspect.getsourcefile(func) for func in _functions(transform)})
+    for source in sources:
+        h.update(_source_hash(source).encode('ascii'))
+    for path in sorted(_PACKAGE_DIR.glob('*.py')):
+        h.update(_source_hash(path).encode('ascii'))
+    return h.hexdigest()
+
+
+def read_object(objects_dir, output_hash):
+    """キャッシュ済みの出力を読み込む (無い・壊れている場合は None)"""
+    try:
+        data = (Path(objects_dir) / output_hash).read_bytes()
+    except OSError:
+        return None
+    if content_hash(data) != output_hash:
+        return None
+    return data
+
+
+class Manifest:
+    """変換結果のマニフェスト (.shimane_cache/manifest.json)"""
+
+    def __init__(self, path=MANIFEST_PATH, objects_dir=OBJECTS_DIR):
+        self.path = Path(path)
+        self.objects_dir = Path(objects_dir)
+        # ルールセットハッシュ → {'name': 変換名, 'entries': {入力ハッシュ: 出力ハッシュ}}
+        self.rulesets = {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path=MANIFEST_PATH, objects_dir=OBJECTS_DIR):
+        """マニフェストを読み込む (無い・壊れている場合は空から始める)"""
+        manifest = cls(path, objects_dir)
+        try:
+            data = json.loads(manifest.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return manifest
+        if data.get('version') == MANIFEST_VERSION:
+            manifest.rulesets = data.get('rulesets', {})
+        return manifest
+
+    def entries(self, ruleset):
+        """ルールセットの {入力ハッシュ: 出力ハッシュ} を返す"""
+        return self.rulesets.get(ruleset, {}).get('entries', {})
+
+    def load_object(self, output_hash):
+        """キャッシュ済みの出力を読み込む (無ければ None)"""
+        return read_object(self.objects_dir, output_hash)
+
+    def record(self, name, ruleset, input_hash, output_hash, output=None, idempotent=False):
+        """変換結果を記録する (出力が入力と異なる場合は出力本体も保存する)
+
+        idempotent が真なら、出力をもう一度変換しても変わらないものとして 出力 → 出力 も記録する。
+        """
+        if ruleset not in self.rulesets:
+            # 同じ変換関数の古いルールセットは二度と使われないので捨てる
+            for old in [key for key, value in self.rulesets.items() if value['name'] == name]:
+                del self.rulesets[old]
+            self.rulesets[ruleset] = {'name': name, 'entries': {}}
+        entries = self.rulesets[ruleset]['entries']
+        pairs = [(input_hash, output_hash)]
+        if idempotent and output_hash != input_hash:
+            pairs.append((output_hash, output_hash))
+        for key, value in pairs:
+            if entries.get(key) != value:
+                entries.pop(key, None)
+                entries[key] = value
+                self.dirty = True
+        while len(entries) > MAX_ENTRIES:
+            del entries[next(iter(entries))]
+        if output is not None and output_hash != input_hash:
+            path = self.objects_dir / output_hash
+            if not path.exists():
+                self.objects_dir.mkdir(parents=True, exist_ok=True)
+                atomic_write(path, output)
+
+    def save(self):
+        """マニフェストを書き出し、参照されなくなった出力を削除する"""
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {'version': MANIFEST_VERSION, 'rulesets': self.rulesets}
+        atomic_write(self.path, json.dumps(data, ensure_ascii=False, indent=2, sort_keys=True).encode('utf-8'))
+        self.dirty = False
+
+        if self.objects_dir.exists():
+            referenced = {
+                output_hash
+                for value in self.rulesets.values()
+                for output_hash in value['entries'].values()
+            }
+            for path in self.objects_dir.iterdir():
+                if path.name not in referenced:
+                    path.unlink()
+
@@ -0,0 +1,187 @@
+"""
+カスタマイズ (customization → v2 → v3) を1回で適用する合成パイプライン
+実行方法: python3 -m shimane_pipeline [--stages customization,v2,v3] [--skip v2] [--rules rules/x.toml] [-j N] [--incremental] [--profile] [--dry-run] [--mmap] [--no-validate]
+
+3つのスクリプトを順番に実行すると、ファイルごとに読み込み・バックアップ・書き込みが
+スクリプトの数だけ繰り返される。ここでは各ファイルを1回だけ読み込み、
+有効なステージの変換をメモリ上で順番に合成して、バックアップと書き込みも1回で済ませる。
+--rules で渡したルールファイル (shimane_pipeline.rulefile) は、スクリプトのステージの後に順番に続く。
+"""
+
+import importlib
+import os
+import sys
+from functools import partial
+
+from shimane_pipeline import discover, instrument
+from shimane_pipeline.backups import BackupStore
+from shimane_pipeline.manifest import transform_name
+from shimane_pipeline.runner import build_parser, preview_transforms, run_transforms
+
+
+class Stage:
+    """パイプラインの1段 (既存スクリプトの変換をそのまま使う)"""
+
+    def __init__(self, name, module, description, finalize=None, removes=()):
+        self.name = name
+        self.module = module            # stage_tasks() を持つスクリプトのモジュール名
+        self.description = description
+        self.finalize = finalize        # 書き込み後に呼ぶモジュール内の関数名
+        self.removes = removes          # finalize が作業ツリーから消すパス (tenants は出力に含めない)
+
+    def load(self):
+        return importlib.import_module(self.module)
+
+    def tasks(self):
+        """(ファイルパス, 変換関数) のリスト"""
+        return self.load().stage_tasks()
+
+    def run_finalize(self):
+        if self.finalize:
+            getattr(self.load(), self.finalize)()
+
+
+STAGES = {
+    'customization': Stage(
+        'customization', 'apply_shimane_customization', '11項目修正',
+        finalize='remove_sprint_mode', removes=('app/sprint',),
+    ),
+    'v2': Stage('v2', 'apply_shimane_fixes_v2', '追加修正 v2'),
+    'v3': Stage('v3', 'apply_shimane_fixes_v3', '追加修正 v3 (完全版)'),
+}
+DEFAULT_ORDER = ('customization', 'v2', 'v3')
+
+
+def compose(transforms, content):
+    """変換関数を順番に適用する (partial(compose, (...)) で1つの変換関数として扱う)
+
+    その時点の内容に必要な文字列を含まない変換は飛ばす (実行しても内容は変わらない)。
+    """
+    for transform in transforms:
+        if not discover.may_change(transform, content):
+            continue
+        if instrument.enabled():
+            name = transform_name(getattr(transform, 'func', transform))
+            content = instrument.call(name, transform, content)
+        else:
+            content = transform(content)
+    return content
+
+
+def select_stages(order=DEFAULT_ORDER, skip=()):
+    """実行するステージを順番どおりに返す (未知の名前は ValueError)"""
+    for name in list(order) + list(skip):
+        if name not in STAGES:
+            raise ValueError(f"未知のステージです: {name} (選べるのは {', '.join(STAGES)})")
+    return [STAGES[name] for name in order if name not in skip]
+
+
+def build_chains(stages):
+    """ファイルパス → 変換関数のリスト (ファイルは最初に現れた順、1ファイル内の変換はステージの順)"""
+    chains = {}
+    for stage in stages:
+        for filepath, transform in stage.tasks():
+            chains.setdefault(filepath, []).append(transform)
+    return chains
+
+
+def build_tasks(stages):
+    """ステージごとのタスクを、ファイルごとの合成変換にまとめる"""
+    return [
+        (filepath, transforms[0] if len(transforms) == 1 else partial(compose, tuple(transforms)))
+        for filepath, transforms in build_chains(stages).items()
+    ]
+
+
+def add_stage_arguments(parser):
+    """--stages / --skip / --rules を追加する (watch からも使う)"""
+    parser.add_argument(
+        '--stages',
+        default=','.join(DEFAULT_ORDER),
+        help=f"実行するステージと順番 (カンマ区切り、既定は {','.join(DEFAULT_ORDER)})",
+    )
+    parser.add_argument(
+        '--skip',
+        action='append',
+        default=[],
+        help='実行しないステージ (複数指定可)',
+    )
+    parser.add_argument(
+        '--rules',
+        action='append',
+        default=[],
+        help='スクリプトのステージの後に適用するルールファイル (.toml / .json、複数指定可)',
+    )
+
+
+def stages_from_args(args):
+    """--stages / --skip で選ばれたステージと --rules のルールファイル (未知の名前・読めないファイルは ValueError)"""
+    stages = select_stages([name.strip() for name in args.stages.split(',') if name.strip()], args.skip)
+    if args.rules:
+        # ルールファイルを使うときだけ読み込む (TOML の読み込みに Python 3.11 の tomllib を使う)
+        from shimane_pipeline.rulefile import RuleFileStage
+    for path in args.rules:
+        try:
+            stages.append(RuleFileStage(path))
+        except OSError as e:
+            raise ValueError(f"ルールファイル {path} を読み込めません: {e}") from e
+    return stages
+
+
+def main(argv=None):
+    parser = build_parser("島根県大田市カスタマイズ - 合成パイプライン")
+    add_stage_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        stages = stages_from_args(args)
+    except ValueError as e:
+        print(f"❌ エラー: {e}")
+        return 1
+    if not stages:
+        print("ℹ️  実行するステージがありません")
+        return 0
+
+    # カレントディレクトリの確認
+    if not os.path.exists('app/page.tsx'):
+        print("❌ エラー: app/page.tsx が見つかりません")
+        print("   プロジェクトのルートディレクトリで実行してください")
+        return 1
+
+    # スクリプトはリポジトリ直下にあるので、そこから import できるようにする
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+
+    tasks = build_tasks(stages)
+    if args.dry_run:
+        # 書き込まずに diff だけを標準出力へ (バックアップ・finalize も行わない)
+        preview_transforms(tasks, jobs=args.jobs, profile=args.profile)
+        return 0
+
+    print("=" * 60)
+    print("🎯 島根県大田市カスタマイズ - 合成パイプライン")
+    print("=" * 60)
+    print()
+    print("🧩 ステージ: " + " → ".join(f"{stage.name} ({stage.description})" for stage in stages))
+
+    # バックアップ作成 (全ステージ分を1回だけ)
+    print("💾 バックアップを作成中...")
+    snapshot_id = BackupStore().snapshot([filepath for filepath, _ in tasks], 'pipeline')
+    print(f"✅ バックアップ完了 ({snapshot_id})\n")
+
+    # 修正実行 (各ファイルを1回読み込み、全ステージをメモリ上で適用して1回書き込む)
+    print("🔧 修正を適用中...\n")
+    if not run_transforms(tasks, jobs=args.jobs, incremental=args.incremental, profile=args.profile,
+                          mapped=args.mmap, validate_output=not args.no_validate):
+        return 1
+
+    for stage in stages:
+        stage.run_finalize()
+
+    print("\n" + "=" * 60)
+    print("✨ 修正完了！")
+    print("=" * 60)
+    print(f"\n💾 バックアップ: スナップショット {snapshot_id}")
+    print(f"   元に戻す: python3 -m shimane_pipeline.backups restore {snapshot_id}")
+    print()
+    return 0
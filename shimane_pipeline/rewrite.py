@@ -0,0 +1,671 @@
+"""
+単一パス・マルチルール置換エンジン
+複数の正規表現ルールを1本の合成パターンにまとめ、
+マッチしたルールをディスパッチテーブルで引いて置換する (RuleSet)。
+固定文字列どうしの置換は、1パスで置き換えたのと同じ結果になる組み合わせだけを受け付けてまとめる (LiteralSet)。
+どちらも byte_edits() で、デコードせずにバイト列 (mmap したファイル) 上の編集として適用できる (--mmap)。
+RuleSet.converge() は内容が変わらなくなる (不動点) まで適用し直す。2回目以降は前の回に
+書き換えた範囲の周りだけを走査するので、コストはファイルサイズではなく編集の数に比例する。
+
+ファイルを1回だけ走査するので、コストは O(ルール数 × ファイルサイズ) ではなく
+O(ファイルサイズ) になる。途中の文字列を作り直さず、出力は最後に1回だけ連結する。
+合成パターンは (?:r1)()|(?:r2)()|… の形にし、ルールの目印の空グループを末尾に置く。
+(r1)|(r2)|… のように先頭をグループにすると、re が各ルールの先頭の文字で位置を読み飛ばせなくなり、
+1文字ずつすべてのルールを試すので、ルールごとの re.sub より何十倍も遅くなる)
+"""
+
+import re
+import time
+
+from shimane_pipeline import instrument
+
+# マッチの最大の長さを求める公開の API は無いので、re の内部のパーサーがあれば使う
+# (無ければすべてのルールを長さに上限の無いものとして扱う)
+try:
+    from re import _parser as _sre_parse      # Python 3.11 以降
+except ImportError:
+    try:
+        import sre_parse as _sre_parse        # Python 3.10 まで
+    except ImportError:
+        _sre_parse = None
+
+# 合成パターン内ではルールごとにフラグを (?s:...) の形で局所化する
+_INLINE_FLAGS = {
+    re.IGNORECASE: 'i',
+    re.MULTILINE: 'm',
+    re.DOTALL: 's',
+    re.VERBOSE: 'x',
+}
+
+# converge() で適用し直す回数の上限 (これを超えたら収束しないと報告する)
+MAX_ITERATIONS = 16
+# \b や ^ などが見る前後の文字の分だけ、書き換えた範囲の周りを広めに走査する
+_SLACK = 8
+# 先読み・後読みは長さで範囲を決められないので、長さに上限の無いルールとして扱う
+_LOOKAROUND = re.compile(r'\(\?(?:=|!|<=|<!)')
+
+# 合成すると番号がずれる後方参照は使えない
+_BACKREF = re.compile(r'\\[1-9]|\(\?P=')
+
+# str のパターンの \s にマッチする文字 (str.isspace() と同じ29文字)
+_ASCII_SPACES = '\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f '
+_UNICODE_SPACES = '\x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000'
+# バイト列のパターンで書かなくてもそのまま使えるエスケープ
+_BYTE_ESCAPES = set('nrtfvAZ')
+# バイト列のパターンでも同じ意味になる (?...) の書き方
+_BYTE_GROUPS = ('(?:', '(?=', '(?!', '(?<=', '(?<!')
+
+
+def _utf8(text):
+    """文字列の UTF-8 バイト列を \\xNN の並びで書いたパターン"""
+    return ''.join(f'\\x{b:02x}' for b in text.encode('utf-8'))
+
+
+_BYTE_SPACE = '(?:[' + ''.join(f'\\x{ord(c):02x}' for c in _ASCII_SPACES) + ']|' + '|'.join(
+    _utf8(c) for c in _UNICODE_SPACES) + ')'
+
+
+def _class_end(pattern, i):
+    """pattern[i] の [ に対応する ] の次の位置"""
+    j = i + 1
+    if pattern.startswith('^', j):
+        j += 1
+    if pattern.startswith(']', j):
+        j += 1
+    while j < len(pattern) and pattern[j] != ']':
+        j += 2 if pattern[j] == '\\' else 1
+    return j + 1
+
+
+def byte_pattern(pattern, flags=0):
+    """str のパターンを、UTF-8 のバイト列上で同じ範囲にマッチするパターンに直す (直せなければ None)
+
+    str と bytes で意味が変わるもの (\\b \\w \\d . 大文字小文字の無視など) を含むパターンは直さない。
+    ASCII 以外の文字は (?:\\xNN...) に、\\s は Unicode の空白文字の UTF-8 列の選択に置き換える。
+    否定の文字クラス ([^>] など) は1バイトずつ見ることになるので、* か + で繰り返す形だけを許す
+    (UTF-8 の文字の途中のバイトは ASCII と重ならないので、繰り返しの切れ目は必ず文字の境界になる)。
+    """
+    if flags & (re.IGNORECASE | re.VERBOSE | re.ASCII):
+        return None
+    out = []
+    i = 0
+    n = len(pattern)
+    negated = False     # 直前が繰り返しの付いた否定の文字クラス
+    while i < n:
+        c = pattern[i]
+        after_negated, negated = negated, False
+        if c == '\\':
+            e = pattern[i + 1:i + 2]
+            if e == 's':
+                out.append(_BYTE_SPACE)
+            elif e in _BYTE_ESCAPES or (e.isascii() and e and not e.isalnum()):
+                out.append(pattern[i:i + 2])
+            else:
+                return None
+            i += 2
+        elif c == '[':
+            end = _class_end(pattern, i)
+            body = pattern[i:end]
+            if end > n or not body.isascii() or any(
+                    e.isalnum() for e in re.findall(r'\\(.)', body)):
+                return None
+            if body.startswith('[^'):
+                if after_negated or pattern[end:end + 1] not in ('*', '+'):
+                    return None
+                negated = True
+            out.append(body)
+            i = end
+        elif c == '(':
+            if pattern.startswith('(?', i):
+                prefix = next((g for g in _BYTE_GROUPS if pattern.startswith(g, i)), None)
+                if prefix is None:
+                    return None
+                out.append(prefix)
+                i += len(prefix)
+            else:
+                out.append(c)
+                i += 1
+        elif c == '.':
+            return None
+        elif c in '*+?' or c == '{':
+            # 繰り返しは直前の要素 (文字クラスの判定は上で済ませた) にかかる
+            if c == '{':
+                end = pattern.find('}', i)
+                if end < 0:
+                    return None
+                out.append(pattern[i:end + 1])
+                i = end + 1
+            else:
+                out.append(c)
+                i += 1
+            negated = after_negated
+        elif c.isascii():
+            out.append(c)
+            i += 1
+        else:
+            out.append(f'(?:{_utf8(c)})')
+            i += 1
+    return ''.join(out)
+
+
+class ConvergenceError(ValueError):
+    """converge() が上限の回数までに不動点に達しない (ルール同士が書き換え合う)"""
+
+    def __init__(self, message, rules, cycle=None):
+        super().__init__(message)
+        self.rules = rules      # 最後の回に書き換えたルールの名前
+        self.cycle = cycle      # 同じ内容に戻るまでの回数 (振動しているとき)
+
+
+def _width(rule):
+    """ルールのマッチの最大の長さ (上限が無い・先読みを含む・求められないときは None)"""
+    if _sre_parse is None or _LOOKAROUND.search(rule.pattern):
+        return None
+    try:
+        width = _sre_parse.parse(rule.pattern, rule.flags).getwidth()[1]
+        limit = _sre_parse.MAXREPEAT
+    except Exception:
+        # 内部のパーサーの形が変わっていたら、長さに上限の無いルールとして全体を探す
+        return None
+    return width if width < limit else None
+
+
+def _windows(spans, width, length):
+    """書き換えた範囲 (変更後の位置) から、マッチが始まり得る範囲 [開始, 終了) のリストを作る"""
+    windows = []
+    for start, end in spans:
+        window_start = max(0, start - width - _SLACK)
+        window_end = min(length, end + _SLACK)
+        if windows and window_start <= windows[-1][1]:
+            windows[-1][1] = max(windows[-1][1], window_end)
+        else:
+            windows.append([window_start, window_end])
+    return windows
+
+
+class Rule:
+    """置換ルール (名前・パターン・置換文字列)"""
+
+    def __init__(self, name, pattern, repl, flags=0, unless=None):
+        self.name = name
+        self.repl = repl
+        if isinstance(pattern, re.Pattern):
+            # コンパイル済みパターン (rules.py のレジストリ) はそのまま使う
+            self.regex = pattern
+            self.pattern = pattern.pattern
+            self.flags = pattern.flags & ~re.UNICODE
+        else:
+            self.regex = re.compile(pattern, flags)
+            self.pattern = pattern
+            self.flags = flags
+        # unless の文字列が入力に含まれていればこのルールは適用しない
+        self.unless = unless
+        # 後方参照を含まない置換文字列はそのまま返せる
+        self.literal = isinstance(repl, str) and '\\' not in repl
+        # バイト列 (UTF-8) 上で同じ置換をするためのパターンと置換 (直せないルールは None)
+        self.byte_pattern = byte_pattern(self.pattern, self.flags) if isinstance(repl, str) else None
+        if self.byte_pattern is not None:
+            self.byte_regex = re.compile(self.byte_pattern.encode('ascii'), self.flags)
+            self.byte_repl = repl.encode('utf-8')
+            self.byte_unless = unless.encode('utf-8') if unless is not None else None
+        # converge() で書き換えた範囲の周りだけを走査するための最大の長さ (上限が無ければ None)
+        self.width = _width(self)
+
+    def inline(self, pattern=None):
+        """合成パターン用にフラグを埋め込んだパターン文字列を返す"""
+        if pattern is None:
+            pattern = self.pattern
+        letters = ''
+        rest = self.flags
+        for flag, letter in _INLINE_FLAGS.items():
+            if rest & flag:
+                letters += letter
+                rest &= ~flag
+        if rest:
+            raise ValueError(f"ルール {self.name}: 合成できないフラグです ({rest})")
+        if letters:
+            return f'(?{letters}:{pattern})'
+        return pattern
+
+    def expand(self, string, pos):
+        """pos から始まるマッチに対する置換結果を返す"""
+        if self.literal:
+            return self.repl
+        m = self.regex.match(string, pos)
+        if callable(self.repl):
+            return self.repl(m)
+        return m.expand(self.repl)
+
+    def expand_bytes(self, buffer, pos):
+        """expand のバイト列版"""
+        if self.literal:
+            return self.byte_repl
+        return self.byte_regex.match(buffer, pos).expand(self.byte_repl)
+
+    def __repr__(self):
+        return f'Rule({self.name!r})'
+
+
+class RuleSet:
+    """ルールを1本の合成パターンにまとめて1パスで適用する
+
+    ルール同士は独立している必要がある (あるルールの出力を別のルールが
+    再び書き換える前提の並びは合成できない)。
+    同じ位置で複数のルールがマッチし得る場合はリストの先にあるものが優先される。
+    """
+
+    def __init__(self, rules, name='ruleset'):
+        self.name = name        # --profile での表示名 (ruleset:<name>)
+        self.rules = list(rules)
+        names = [rule.name for rule in self.rules]
+        if len(set(names)) != len(names):
+            raise ValueError("ルール名が重複しています")
+        for rule in self.rules:
+            if rule.regex.groupindex:
+                raise ValueError(f"ルール {rule.name}: 名前付きグループは合成できません")
+            if _BACKREF.search(rule.pattern):
+                raise ValueError(f"ルール {rule.name}: 後方参照は合成できません")
+        # 有効なルールの組み合わせごとに合成パターンをキャッシュする
+        self._compiled = {}
+        self._compile(tuple(range(len(self.rules))))
+        # すべてのルールをバイト列のパターンに直せれば byte_edits() が使える
+        self.byte_safe = all(rule.byte_pattern is not None for rule in self.rules)
+        self._compiled_bytes = {}
+        # 同じ位置でマッチしたときの優先順位 (converge の走査で使う)
+        self._order = {name: index for index, name in enumerate(names)}
+
+    def _compile(self, active, use_bytes=False):
+        """有効なルールの合成パターンとディスパッチテーブルを作る"""
+        cache = self._compiled_bytes if use_bytes else self._compiled
+        if active in cache:
+            return cache[active]
+
+        parts = []
+        dispatch = {}
+        group = 0
+        for index in active:
+            rule = self.rules[index]
+            parts.append(f'(?:{rule.inline(rule.byte_pattern if use_bytes else None)})()')
+            # 目印のグループ番号 → ルール
+            group += rule.regex.groups + 1
+            dispatch[group] = rule
+
+        combined = None
+        if parts:
+            source = '|'.join(parts)
+            combined = re.compile(source.encode('ascii') if use_bytes else source)
+        cache[active] = (combined, dispatch)
+        return combined, dispatch
+
+    def active_rules(self, content):
+        """unless 条件を評価して有効なルールの番号を返す"""
+        return tuple(
+            index for index, rule in enumerate(self.rules)
+            if rule.unless is None or rule.unless not in content
+        )
+
+    def _matches(self, string, active, use_bytes=False):
+        """合成パターンで1回だけ走査し、マッチを (マッチ, ルール) の順に返す
+
+        同じ位置で複数のルールがマッチし得るときは、re の選択と同じくリストの先のルールを採る。
+        """
+        combined, dispatch = self._compile(active, use_bytes)
+        if combined is None:
+            return ()
+        # 目印の空グループはルールの中のどのグループよりも後に閉じるので lastindex で引ける
+        return ((m, dispatch[m.lastindex]) for m in combined.finditer(string))
+
+    def subn(self, content):
+        """全ルールを1パスで適用し、(結果, 置換回数) を返す
+
+        --profile のときはルールごとのマッチ数・変更バイト数も数える。走査は1回なので、
+        時間と走査バイト数は ruleset:<name> にまとめて記録する。
+        """
+        profiled = instrument.enabled()
+        start = time.perf_counter()
+        stats = {rule.name: [0, 0] for rule in self.rules} if profiled else None
+        scanned = instrument.nbytes(content) if profiled else 0
+        pieces = []
+        last = 0
+        total = 0
+        for m, rule in self._matches(content, self.active_rules(content)):
+            text = rule.expand(content, m.start())
+            if profiled:
+                counts = stats[rule.name]
+                counts[0] += 1
+                if text != m.group():
+                    counts[1] += instrument.nbytes(m.group()) + instrument.nbytes(text)
+            pieces.append(content[last:m.start()])
+            pieces.append(text)
+            last = m.end()
+            total += 1
+        if total:
+            pieces.append(content[last:])
+            content = ''.join(pieces)
+        if profiled:
+            instrument.record(f'ruleset:{self.name}', time.perf_counter() - start, scanned)
+            for name, (matches, changed) in stats.items():
+                instrument.record(name, 0.0, 0, matches, changed)
+        return content, total
+
+    def apply(self, content):
+        """全ルールを1パスで適用した結果を返す"""
+        return self.subn(content)[0]
+
+    def byte_edits(self, buffer):
+        """subn と同じ置換を、UTF-8 のバイト列 (mmap など) 上の編集として返す
+
+        編集は [(開始, 終了, 置換後のバイト列)] (位置の順、重ならない)。内容が変わらない置換は含めない。
+        バイト列のパターンに直せないルールがあれば (byte_safe が False) None を返す。
+        """
+        if not self.byte_safe:
+            return None
+        profiled = instrument.enabled()
+        start = time.perf_counter()
+        active = tuple(
+            index for index, rule in enumerate(self.rules)
+            if rule.byte_unless is None or buffer.find(rule.byte_unless) < 0
+        )
+        stats = {rule.name: [0, 0] for rule in self.rules} if profiled else None
+        edits = []
+        for m, rule in self._matches(buffer, active, use_bytes=True):
+            text = rule.expand_bytes(buffer, m.start())
+            old = m.group()
+            if profiled:
+                counts = stats[rule.name]
+                counts[0] += 1
+                if text != old:
+                    counts[1] += len(old) + len(text)
+            if text != old:
+                edits.append((m.start(), m.end(), text))
+        if profiled:
+            instrument.record(f'ruleset:{self.name}', time.perf_counter() - start, len(buffer))
+            for name, (matches, changed) in stats.items():
+                instrument.record(name, 0.0, 0, matches, changed)
+        return edits
+
+
+    def converge(self, content, max_iterations=MAX_ITERATIONS):
+        """内容が変わらなくなる (不動点) まで適用し、(結果, 走査した回数) を返す
+
+        1回目は subn と同じく全体を走査する。2回目以降は、長さに上限のあるルールは
+        前の回に書き換えた範囲の周りだけで探し、上限の無いルールは個別のパターンで全体を探す
+        (先頭が固定文字列なら C の検索で読み飛ばすので、合成パターンで全体を見るより十分速い)。
+        有効なルール (unless) が変わった回と、内容の変わらない置換があったときの最後の確認は全体を走査する。
+        全体を走査した回の書き換えが打ち消し合って内容が変わらなければ、それも不動点とみなす。
+        max_iterations 回で収束しない・前の内容に戻るときは ConvergenceError。
+        """
+        profiled = instrument.enabled()
+        stats = {rule.name: [0, 0] for rule in self.rules} if profiled else None
+        seen = {hash(content): 0}
+        spans = None        # 前の回に書き換えた範囲 (None なら全体を走査する)
+        previous = None     # 前の回の有効なルール
+        noop = False        # 内容の変わらない置換があった (走査の区切りがずれ得る)
+        iterations = 0
+        try:
+            while True:
+                start = time.perf_counter()
+                active = self.active_rules(content)
+                if active != previous:
+                    spans = None
+                full = spans is None
+                if full:
+                    edits, fired, skipped, scanned = self._scan(content, active, stats)
+                else:
+                    edits, fired, skipped, scanned = self._scan_near(content, active, spans, stats)
+                noop = noop or skipped
+                iterations += 1
+                if profiled:
+                    instrument.record(f'ruleset:{self.name}', time.perf_counter() - start, scanned)
+                if not edits:
+                    if spans is not None and noop:
+                        spans = None
+                        continue
+                    return content, iterations
+                previous = active
+                before = content
+                content, spans = _splice(content, edits)
+                if content == before:
+                    # 書き換えが打ち消し合って内容が変わらない: 全体を走査した回なら不動点
+                    if full:
+                        return content, iterations
+                    spans = None
+                    continue
+                fired = sorted(fired)
+                key = hash(content)
+                if key in seen:
+                    cycle = iterations - seen[key]
+                    raise ConvergenceError(
+                        f"{self.name}: {cycle} 回ごとに同じ内容に戻ります (振動しているルール: {', '.join(fired)})",
+                        fired, cycle,
+                    )
+                seen[key] = iterations
+                if iterations >= max_iterations:
+                    raise ConvergenceError(
+                        f"{self.name}: {max_iterations} 回適用しても収束しません (書き換え続けるルール: {', '.join(fired)})",
+                        fired,
+                    )
+        finally:
+            if profiled:
+                for name, (matches, changed) in stats.items():
+                    instrument.record(name, 0.0, 0, matches, changed)
+
+    def fixpoint(self, content, max_iterations=MAX_ITERATIONS):
+        """converge した結果を返す"""
+        return self.converge(content, max_iterations)[0]
+
+    @staticmethod
+    def _take(rule, m, edits, fired, stats):
+        """マッチの置換を edits に加える (内容が変わらない置換なら True)"""
+        text = rule.expand(m.string, m.start())
+        old = m.group()
+        if stats is not None:
+            counts = stats[rule.name]
+            counts[0] += 1
+            if text != old:
+                counts[1] += instrument.nbytes(old) + instrument.nbytes(text)
+        if text == old:
+            return True
+        edits.append((m.start(), m.end(), text))
+        fired.add(rule.name)
+        return False
+
+    def _scan(self, content, active, stats):
+        """全体を走査し、(編集, 書き換えたルール, 変わらない置換の有無, 走査バイト数) を返す"""
+        edits = []
+        fired = set()
+        noop = False
+        for m, rule in self._matches(content, active):
+            noop = self._take(rule, m, edits, fired, stats) or noop
+        scanned = instrument.nbytes(content) if stats is not None else 0
+        return edits, fired, noop, scanned
+
+    def _scan_near(self, content, active, spans, stats):
+        """_scan と同じ編集を、書き換えた範囲 spans の周りと上限の無いルールの走査だけで求める
+
+        変わっていない部分にあるマッチは前の回に置換済みなので、探すのは spans に
+        重なる・接するマッチだけでよい。合成パターンと同じく、いちばん左で始まるマッチ
+        (同じ位置ならリストの先のルール) から順に採り、重なるものは捨てる。
+        """
+        length = len(content)
+        bounded = tuple(index for index in active if self.rules[index].width is not None)
+        unbounded = [self.rules[index] for index in active if self.rules[index].width is None]
+        combined, dispatch = self._compile(bounded)
+        width = max((self.rules[index].width for index in bounded), default=0)
+        windows = _windows(spans, width, length) if combined is not None else []
+        current = 0
+
+        def near(pos):
+            # pos 以降で、いずれかの範囲の中で始まる最初のマッチ
+            nonlocal current
+            while current < len(windows):
+                window_start, window_end = windows[current]
+                m = None
+                if max(pos, window_start) < window_end:
+                    m = combined.search(content, max(pos, window_start), min(length, window_end + width + _SLACK))
+                if m is not None and m.start() < window_end:
+                    return m, dispatch[m.lastindex]
+                current += 1
+            return None
+
+        def anywhere(rule, pos):
+            m = rule.regex.search(content, pos)
+            return (m, rule) if m is not None else None
+
+        searches = [near] + [lambda pos, rule=rule: anywhere(rule, pos) for rule in unbounded]
+        pending = [search(0) for search in searches]
+        edits = []
+        fired = set()
+        noop = False
+        while True:
+            best = None
+            for i, item in enumerate(pending):
+                if item is None:
+                    continue
+                key = (item[0].start(), self._order[item[1].name])
+                if best is None or key < best[0]:
+                    best = (key, i)
+            if best is None:
+                break
+            m, rule = pending[best[1]]
+            noop = self._take(rule, m, edits, fired, stats) or noop
+            pos = m.end() if m.end() > m.start() else m.end() + 1
+            for i, item in enumerate(pending):
+                if item is not None and item[0].start() < pos:
+                    pending[i] = searches[i](pos)
+
+        scanned = 0
+        if stats is not None:
+            scanned = sum(
+                instrument.nbytes(content[start:min(length, end + width + _SLACK)]) for start, end in windows
+            ) + len(unbounded) * instrument.nbytes(content)
+        return edits, fired, noop, scanned
+
+
+def _splice(content, edits):
+    """編集を適用した内容と、置換後の文字列の範囲 (変更後の位置) のリストを返す"""
+    pieces = []
+    spans = []
+    last = 0
+    offset = 0
+    for start, end, text in edits:
+        pieces.append(content[last:start])
+        pieces.append(text)
+        spans.append((start + offset, start + offset + len(text)))
+        offset += len(text) - (end - start)
+        last = end
+    pieces.append(content[last:])
+    return ''.join(pieces), spans
+
+
+def _overlaps(left, right):
+    """left の末尾 (真部分) と right の先頭 (真部分) が重なり得るか"""
+    return any(left.endswith(right[:k]) for k in range(1, min(len(left), len(right))))
+
+
+class LiteralSet:
+    """固定文字列の置換をまとめて適用する
+
+    rules は (名前, 置換前, 置換後) のリスト。作成時に、リストの順に str.replace を繰り返した結果が
+    左から1パスで置き換えた結果と同じになることを確かめる (そうならない組み合わせ、
+    つまり置換前の文字列どうしが重なり得る場合や、置換後の文字列が後のルールの置換前の文字列を
+    作り得る場合は ValueError)。そのため適用は C の高速検索の str.replace をルールの順に呼ぶだけでよい。
+    (Python で1文字ずつ状態をたどる Aho-Corasick オートマトンは、スクリプトのルールセットでは
+    str.replace の連続より15〜35倍遅かった)
+    """
+
+    def __init__(self, rules, name='literals'):
+        self.name = name        # --profile での表示名 (ruleset:<name>)
+        self.rules = list(rules)
+        names = [rule_name for rule_name, _, _ in self.rules]
+        if len(set(names)) != len(names):
+            raise ValueError("ルール名が重複しています")
+        self._check()
+
+    def _check(self):
+        """1パスの結果が str.replace の繰り返しと同じになることを確かめる"""
+        for i, (name, old, new) in enumerate(self.rules):
+            if not old:
+                raise ValueError(f"ルール {name}: 置換前の文字列が空です")
+            for j, (other, other_old, _) in enumerate(self.rules):
+                if i == j:
+                    continue
+                if old in other_old or _overlaps(old, other_old):
+                    raise ValueError(f"ルール {name} と {other}: 置換前の文字列が重なり得ます")
+                if j > i and (other_old in new or new in other_old
+                              or _overlaps(new, other_old) or _overlaps(other_old, new)):
+                    raise ValueError(f"ルール {name} の置換後の文字列が {other} にマッチし得ます")
+
+    def literals(self):
+        """置換前の文字列 (discover.requires に渡す事前フィルタ用)"""
+        return [old for _, old, _ in self.rules]
+
+    def _replace_each(self, content, counts):
+        """ルールの順に str.replace し、counts にルールごとの置換回数を数える"""
+        total = 0
+        for index, (_, old, new) in enumerate(self.rules):
+            matches = content.count(old)
+            if matches:
+                content = content.replace(old, new)
+                total += matches
+                counts[index] += matches
+        return content, total
+
+    def subn(self, content):
+        """全ルールを適用し、(結果, 置換回数) を返す"""
+        profiled = instrument.enabled()
+        start = time.perf_counter()
+        counts = [0] * len(self.rules)
+        result = self._replace_each(content, counts)
+        if profiled:
+            instrument.record(f'ruleset:{self.name}', time.perf_counter() - start, instrument.nbytes(content))
+            for (name, old, new), matches in zip(self.rules, counts):
+                changed = matches * (instrument.nbytes(old) + instrument.nbytes(new)) if old != new else 0
+                instrument.record(name, 0.0, 0, matches, changed)
+        return result
+
+    def apply(self, content):
+        """全ルールを適用した結果を返す"""
+        if instrument.enabled():
+            return self.subn(content)[0]
+        # 置換回数がいらなければ str.count の走査も省ける
+        for _, old, new in self.rules:
+            content = content.replace(old, new)
+        return content
+
+    def byte_edits(self, buffer):
+        """subn と同じ置換を、UTF-8 のバイト列 (mmap など) 上の編集として返す (RuleSet.byte_edits と同じ形)
+
+        置換前の文字列どうしは重ならない (_check) ので、各ルールの次の出現位置を find で探し、
+        最も前にあるものから順に置き換えれば1パスの結果と同じになる。
+        """
+        profiled = instrument.enabled()
+        start = time.perf_counter()
+        encoded = [(old.encode('utf-8'), new.encode('utf-8')) for _, old, new in self.rules]
+        counts = [0] * len(self.rules)
+        n = len(buffer)
+        nexts = [-1] * len(encoded)
+        edits = []
+        i = 0
+        while True:
+            pos = n
+            index = -1
+            for k, (old, _) in enumerate(encoded):
+                at = nexts[k]
+                if at < i:
+                    at = buffer.find(old, i)
+                    at = nexts[k] = n if at < 0 else at
+                if at < pos:
+                    pos, index = at, k
+            if index < 0:
+                break
+            old, new = encoded[index]
+            counts[index] += 1
+            if new != old:
+                edits.append((pos, pos + len(old), new))
+            i = pos + len(old)
+        if profiled:
+            instrument.record(f'ruleset:{self.name}', time.perf_counter() - start, n)
+            for (name, _, _), (old, new), matches in zip(self.rules, encoded, counts):
+                instrument.record(name, 0.0, 0, matches, matches * (len(old) + len(new)) if old != new else 0)
+        return edits
@@ -0,0 +1,447 @@
+"""
+宣言的なルールファイル (TOML / JSON) とコンパイル済みの成果物のキャッシュ
+実行方法: python3 -m shimane_pipeline.rulefile compile rules/shimane_v3.toml
+          python3 -m shimane_pipeline --stages= --rules rules/shimane_v3.toml
+
+自治体ごとのカスタマイズをスクリプトのコピーではなくルールファイルで書けるようにする。
+ファイルには対象 (glob) ごとに、上から順に適用するステップを並べる:
+
+    name = "shimane-v3"
+    description = "追加修正 v3 (ルールファイル版)"
+    remove = ["app/sprint"]             # 適用後に消すファイル・ディレクトリ (省略可)
+
+    [[target]]
+    files = ["app/**/page.tsx"]
+    exclude = ["app/page.tsx", "app/ranking/page.tsx"]
+    requires = ["}ms", ">ms<"]          # どれも含まないファイルは変換しない (省略可)
+
+    [[target.step]]
+    type = "regex"                      # RuleSet (書き換えが止まるまで適用する)
+    rules = [{ name = "unit.time", pattern = '\\{time\\}ms', replace = "{(time/1000).toFixed(3)}s" }]
+
+    [[target.step]]
+    type = "literal"                    # LiteralSet
+    rules = [{ name = "grid", find = "md:grid-cols-5", replace = "md:grid-cols-4" }]
+
+    [[target.step]]
+    type = "structural"                 # tsx の編集 (1つの Patch にまとめて適用する)
+    edits = [{ op = "remove_elements", name = "button", attrs = { onClick = "() => setModeFilter('sprint')" } }]
+
+1つのステップの中のルールは互いに独立している必要がある (RuleSet・LiteralSet と同じ)。
+順番に依存する書き換えはステップを分けること。
+
+コンパイル (パターンの検証・合成パターン・固定文字列の組み合わせの検査) の結果は
+.shimane_cache/rules/ に pickle で保存し、ルールファイルの内容・コンパイラのソース・
+Python のバージョンのハッシュで引く。正規表現は pickle の標準どおり (パターン, フラグ) で保存し、
+読み込み時に re.compile し直す (re の内部のコード形式には依存しない)。
+
+TOML のルールファイルは Python 3.11 以降 (tomllib) が必要。3.10 では JSON だけ読める。
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import re
+import shutil
+import sys
+import time
+from functools import partial
+from pathlib import Path
+
+try:
+    import tomllib
+except ImportError:         # Python 3.10 まで
+    tomllib = None
+
+from shimane_pipeline import discover, tsx
+from shimane_pipeline.fileio import atomic_write, content_hash
+from shimane_pipeline.manifest import CACHE_DIR
+from shimane_pipeline.rewrite import ConvergenceError, LiteralSet, Rule, RuleSet
+
+RULES_CACHE_DIR = CACHE_DIR / 'rules'
+
+_TOML_ERRORS = (tomllib.TOMLDecodeError,) if tomllib else ()
+
+# 成果物の形式を変えたら上げる
+ARTIFACT_VERSION = 2
+
+# structural ステップで使える tsx の編集
+OPERATIONS = {
+    'rename_heading': tsx.rename_heading,
+    'add_badge': tsx.add_badge,
+    'remove_elements': tsx.remove_elements,
+    'convert_ms_children': tsx.convert_ms_children,
+}
+
+# regex のルールの flags に書けるフラグ
+FLAGS = {
+    'IGNORECASE': re.IGNORECASE,
+    'MULTILINE': re.MULTILINE,
+    'DOTALL': re.DOTALL,
+    'VERBOSE': re.VERBOSE,
+}
+
+# 成果物のキャッシュキーに含めるソース (コンパイル結果のクラスを定義しているもの)
+_COMPILER_SOURCES = ('rulefile.py', 'rewrite.py', 'tsx.py')
+
+# 読み込んだ成果物 (パス → RuleFile)。ワーカープロセスでも1回だけ読む
+_loaded = {}
+
+
+class RegexStep:
+    """regex ステップ (RuleSet を書き換えが止まるまで適用する)"""
+
+    def __init__(self, rules):
+        self.rules = rules
+
+    def apply(self, content):
+        try:
+            return self.rules.fixpoint(content)
+        except ConvergenceError as e:
+            print(f"⚠️  {e} (このステップは適用しません)")
+            return content
+
+
+class StructuralStep:
+    """structural ステップ (tsx の編集を1つの Patch にまとめて1回で適用する)"""
+
+    def __init__(self, edits):
+        self.edits = edits      # [(編集関数, キーワード引数)]
+
+    def apply(self, content):
+        patch = tsx.edit(content)
+        for func, kwargs in self.edits:
+            func(patch, **kwargs)
+        return patch.apply()
+
+
+class Target:
+    """ルールファイルの1つの対象 (glob とステップの並び)"""
+
+    def __init__(self, source, index, files, exclude, requires, steps):
+        self.source = source
+        self.index = index
+        self.files = files
+        self.exclude = exclude
+        self.requires = requires    # 必要なリテラルの集合 (None は判定しない)
+        self.steps = steps
+        self.digest = None          # ルールファイルの内容のハッシュ (読み込み時に付ける)
+        self.artifact = None        # 保存した成果物のパス
+
+    def paths(self):
+        """対象ファイルをパスの順に返す"""
+        found = set()
+        for pattern in self.files:
+            found.update(discover.find(pattern, exclude=self.exclude))
+        return sorted(found)
+
+    def __repr__(self):
+        # 変換名 (manifest.transform_name) に入るので、ルールファイルが変われば別の変換になる
+        return f'Target({self.source}#{self.index}@{(self.digest or "-")[:12]})'
+
+    def __reduce__(self):
+        # ワーカープロセスへは成果物のパスだけを渡し、向こうで読み込む
+        if self.artifact is not None:
+            return _load_target, (str(self.artifact), self.index)
+        return _rebuild_target, (self.__dict__,)
+
+
+def _load_target(artifact, index):
+    return _read(Path(artifact)).targets[index]
+
+
+def _rebuild_target(state):
+    target = Target.__new__(Target)
+    target.__dict__.update(state)
+    return target
+
+
+class RuleFile:
+    """コンパイルしたルールファイル"""
+
+    def __init__(self, name, description, source, targets, removes=()):
+        self.name = name
+        self.description = description
+        self.source = source
+        self.targets = targets
+        self.removes = removes
+
+    def tasks(self):
+        """(ファイルパス, 変換関数) のリスト (対象の順、1つの対象の中はパスの順)"""
+        tasks = []
+        for target in self.targets:
+            for filepath in target.paths():
+                transform = partial(apply_target, target, filepath)
+                if target.requires is not None:
+                    transform.required_literals = target.requires
+                tasks.append((filepath, transform))
+        return tasks
+
+
+def apply_target(target, filepath, content):
+    """対象のステップを順番に適用する"""
+    print(f"📝 {filepath} にルールファイル {target.source} を適用中...")
+    for step in target.steps:
+        content = step.apply(content)
+    print(f"✅ {filepath} の適用完了")
+    return content
+
+
+class RuleFileStage:
+    """ルールファイルをパイプラインの1段として扱う (pipeline.Stage と同じ使い方)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.rule_file = load(path)
+        self.name = self.rule_file.name
+        self.description = self.rule_file.description or f'ルールファイル {path}'
+        self.removes = self.rule_file.removes
+
+    def tasks(self):
+        return self.rule_file.tasks()
+
+    def run_finalize(self):
+        for path in self.removes:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+            else:
+                continue
+            print(f"✅ {path} を削除しました")
+
+
+# ---------------------------------------------------------------
+# コンパイル
+# ---------------------------------------------------------------
+def parse(path, data):
+    """ルールファイルの内容 (bytes) を辞書にする (拡張子で TOML / JSON を選ぶ)"""
+    suffix = Path(path).suffix
+    if suffix == '.toml' and tomllib is None:
+        raise ValueError(f"{path}: TOML のルールファイルを読むには Python 3.11 以降が必要です (.json なら読めます)")
+    try:
+        if suffix == '.toml':
+            return tomllib.loads(data.decode('utf-8'))
+        if suffix == '.json':
+            return json.loads(data.decode('utf-8'))
+    except (*_TOML_ERRORS, json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise ValueError(f"{path}: 読み込めません ({e})") from e
+    raise ValueError(f"{path}: ルールファイルは .toml か .json にしてください")
+
+
+def _strings(where, value, key):
+    """文字列のリスト (1つの文字列でもよい) を取り出す"""
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"{where}: {key} は文字列のリストにしてください")
+    return value
+
+
+def _table(where, value):
+    if not isinstance(value, dict):
+        raise ValueError(f"{where}: テーブル (辞書) にしてください")
+    return value
+
+
+def _tables(where, spec, key):
+    """テーブルのリスト (無ければ空) を取り出す"""
+    value = spec.get(key, [])
+    if not isinstance(value, list):
+        raise ValueError(f"{where}: {key} はテーブルのリストにしてください")
+    return [_table(f'{where}.{key}[{i}]', item) for i, item in enumerate(value)]
+
+
+def _string(where, spec, key, required=True):
+    value = spec.get(key)
+    if value is None and not required:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"{where}: {key} (文字列) がありません")
+    return value
+
+
+def _regex_step(where, spec, name):
+    rules = []
+    for i, rule in enumerate(_tables(where, spec, 'rules')):
+        rule_where = f'{where}.rules[{i}]'
+        flags = 0
+        for flag in _strings(rule_where, rule.get('flags', []), 'flags'):
+            if flag not in FLAGS:
+                raise ValueError(f"{rule_where}: 未知のフラグです: {flag} (使えるのは {', '.join(FLAGS)})")
+            flags |= FLAGS[flag]
+        try:
+            rules.append(Rule(
+                _string(rule_where, rule, 'name'),
+                _string(rule_where, rule, 'pattern'),
+                _string(rule_where, rule, 'replace'),
+                flags=flags,
+                unless=_string(rule_where, rule, 'unless', required=False),
+            ))
+        except re.error as e:
+            raise ValueError(f"{rule_where}: パターンをコンパイルできません: {e}") from e
+    try:
+        return RegexStep(RuleSet(rules, name=name))
+    except ValueError as e:
+        raise ValueError(f"{where}: {e}") from e
+
+
+def _literal_step(where, spec, name):
+    rules = []
+    for i, rule in enumerate(_tables(where, spec, 'rules')):
+        rule_where = f'{where}.rules[{i}]'
+        rules.append((
+            _string(rule_where, rule, 'name'),
+            _string(rule_where, rule, 'find'),
+            _string(rule_where, rule, 'replace'),
+        ))
+    try:
+        return LiteralSet(rules, name=name)
+    except ValueError as e:
+        raise ValueError(f"{where}: {e}") from e
+
+
+def _structural_step(where, spec):
+    edits = []
+    for i, edit in enumerate(_tables(where, spec, 'edits')):
+        edit_where = f'{where}.edits[{i}]'
+        kwargs = dict(edit)
+        op = kwargs.pop('op', None)
+        if op not in OPERATIONS:
+            raise ValueError(f"{edit_where}: op は {', '.join(OPERATIONS)} のどれかにしてください")
+        # remove_elements の属性は attrs にまとめて書く
+        kwargs.update(_table(edit_where, kwargs.pop('attrs', {})))
+        # TOML / JSON の配列はタプルに (add_badge の titles など)
+        kwargs = {key: tuple(value) if isinstance(value, list) else value for key, value in kwargs.items()}
+        try:
+            inspect.signature(OPERATIONS[op]).bind(None, **kwargs)
+        except TypeError as e:
+            raise ValueError(f"{edit_where}: {op} の引数が合いません ({e})") from e
+        edits.append((OPERATIONS[op], kwargs))
+    return StructuralStep(edits)
+
+
+def compile_rules(path, data):
+    """ルールファイルの内容をコンパイルする (間違いは場所付きの ValueError)"""
+    spec = _table(str(path), parse(path, data))
+    name = spec.get('name', Path(path).stem)
+    targets = []
+    for index, target in enumerate(_tables(f'{path}:', spec, 'target')):
+        where = f'{path}: target[{index}]'
+        files = _strings(where, target.get('files'), 'files')
+        exclude = tuple(_strings(where, target.get('exclude', []), 'exclude'))
+        requires = target.get('requires')
+        if requires is not None:
+            requires = frozenset(_strings(where, requires, 'requires'))
+        steps = []
+        for i, step in enumerate(_tables(where, target, 'step')):
+            step_where = f'{where}.step[{i}]'
+            kind = step.get('type')
+            step_name = f'{name}.{index}.{i}'
+            if kind == 'regex':
+                steps.append(_regex_step(step_where, step, step_name))
+            elif kind == 'literal':
+                steps.append(_literal_step(step_where, step, step_name))
+            elif kind == 'structural':
+                steps.append(_structural_step(step_where, step))
+            else:
+                raise ValueError(f"{step_where}: type は regex / literal / structural のどれかにしてください")
+        targets.append(Target(str(path), index, files, exclude, requires, steps))
+    if not targets:
+        raise ValueError(f"{path}: target がありません")
+    removes = tuple(_strings(str(path), spec.get('remove', []), 'remove'))
+    return RuleFile(name, spec.get('description', ''), str(path), targets, removes)
+
+
+# ---------------------------------------------------------------
+# 成果物の保存と読み込み
+# ---------------------------------------------------------------
+def cache_key(data):
+    """ルールファイルの内容・コンパイラのソース・Python のバージョンから成果物のキーを作る"""
+    h = hashlib.sha256()
+    h.update(f'{ARTIFACT_VERSION}:{sys.version}\n'.encode('utf-8'))
+    package = Path(__file__).resolve().parent
+    for source in _COMPILER_SOURCES:
+        h.update((package / source).read_bytes())
+    h.update(data)
+    return h.hexdigest()
+
+
+def artifact_path(path, key, cache_dir=RULES_CACHE_DIR):
+    return Path(cache_dir) / f'{Path(path).stem}-{key[:32]}.pickle'
+
+
+def _read(artifact):
+    """保存した成果物を読み込む (1プロセスにつき1回)"""
+    key = str(artifact)
+    if key not in _loaded:
+        with open(artifact, 'rb') as f:
+            _loaded[key] = pickle.load(f)
+    return _loaded[key]
+
+
+def _write(artifact, rule_file):
+    data = pickle.dumps(rule_file, protocol=pickle.HIGHEST_PROTOCOL)
+    artifact.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(artifact, data)
+    # 同じルールファイルの古い成果物は消す
+    for old in artifact.parent.glob(f'{artifact.name.rsplit("-", 1)[0]}-*.pickle'):
+        if old != artifact:
+            old.unlink(missing_ok=True)
+
+
+def load(path, cache_dir=RULES_CACHE_DIR):
+    """ルールファイルを読み込む (コンパイル済みの成果物があればそれを使い、無ければ作って保存する)"""
+    data = Path(path).read_bytes()
+    key = cache_key(data)
+    artifact = artifact_path(path, key, cache_dir)
+    try:
+        rule_file = _read(artifact)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, re.error):
+        rule_file = compile_rules(path, data)
+        for target in rule_file.targets:
+            target.digest = content_hash(data)
+        try:
+            _write(artifact, rule_file)
+        except OSError as e:
+            print(f"⚠️  コンパイル結果を保存できません: {e}")
+        else:
+            _loaded[str(artifact)] = rule_file
+    if artifact.exists():
+        for target in rule_file.targets:
+            target.artifact = artifact
+    return rule_file
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ルールファイルのコンパイルと確認")
+    parser.add_argument('command', choices=('compile', 'check'),
+                        help='compile: コンパイルして成果物を保存する / check: コンパイルできるかだけを確かめる')
+    parser.add_argument('paths', nargs='+', help='ルールファイル (.toml / .json)')
+    args = parser.parse_args(argv)
+
+    status = 0
+    for path in args.paths:
+        start = time.perf_counter()
+        try:
+            if args.command == 'check':
+                rule_file = compile_rules(path, Path(path).read_bytes())
+            else:
+                rule_file = load(path)
+        except (OSError, ValueError) as e:
+            print(f"❌ {e}")
+            status = 1
+            continue
+        elapsed = (time.perf_counter() - start) * 1000
+        steps = sum(len(target.steps) for target in rule_file.targets)
+        print(f"✅ {path}: {rule_file.name} ({len(rule_file.targets)} 対象, {steps} ステップ, {elapsed:.1f}ms)")
+        if args.command == 'compile':
+            print(f"   成果物: {artifact_path(path, cache_key(Path(path).read_bytes()))}")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+カスタマイズスクリプト共通のパターンレジストリ
+すべての正規表現を import 時に1回だけコンパイル・検証し、名前で参照できるようにする。
+重いパターンの調整はこのファイルだけで済む。
+"""
+
+import re
+
+from shimane_pipeline import instrument
+from shimane_pipeline.rewrite import Rule
+
+PATTERNS = {}
+
+
+def register(name, pattern, flags=0):
+    """パターンを登録する (名前の重複・コンパイルエラーは import 時に検出)"""
+    if name in PATTERNS:
+        raise ValueError(f"パターン名が重複しています: {name}")
+    try:
+        PATTERNS[name] = re.compile(pattern, flags)
+    except re.error as e:
+        raise ValueError(f"パターン {name} をコンパイルできません: {e}") from e
+    return PATTERNS[name]
+
+
+def get(name):
+    """登録済みのコンパイル済みパターンを返す"""
+    try:
+        return PATTERNS[name]
+    except KeyError:
+        raise KeyError(f"未登録のパターンです: {name}") from None
+
+
+def sub(name, repl, content, count=0):
+    """登録済みパターンで置換する"""
+    if instrument.enabled():
+        return instrument.sub(name, get(name), repl, content, count)
+    return get(name).sub(repl, content, count)
+
+
+def search(name, content):
+    """登録済みパターンで検索する"""
+    return get(name).search(content)
+
+
+def rule(name, repl, unless=None):
+    """登録済みパターンから RuleSet 用の Rule を作る"""
+    return Rule(name, get(name), repl, unless=unless)
+
+
+# ---------------------------------------------------------------
+# ⑪ 表示単位 ms → s (customization / v2 / v3 のトレーニングページ)
+# ---------------------------------------------------------------
+register('unit.time', r'\{time\}ms')
+register('unit.reaction', r'\{reaction\}ms')
+register('unit.r_time', r'\{r\.time\}ms')
+register('unit.r_reaction', r'\{r\.reaction\}ms')
+register('unit.stats_average', r'\{stats\.average\}ms')
+register('unit.stats_stddev', r'\{stats\.stdDev\}ms')
+
+# v2 は単語境界付きで変換していた
+register('unit.time_b', r'\{time\}ms\b')
+register('unit.reaction_b', r'\{reaction\}ms\b')
+register('unit.r_time_b', r'\{r\.time\}ms\b')
+register('unit.r_reaction_b', r'\{r\.reaction\}ms\b')
+register('unit.stats_average_b', r'\{stats\.average\}ms\b')
+register('unit.stats_stddev_b', r'\{stats\.stdDev\}ms\b')
+register('unit.result_time_b', r'\{result\.time\}ms\b')
+register('unit.result_avg_time_b', r'\{result\.avgTime\}ms\b')
+
+# 既に変換されているが単位が ms のままのパターン
+register('unit.time_fixup', r'\(time/1000\)\.toFixed\(3\)\}ms')
+register('unit.reaction_fixup', r'\(reaction/1000\)\.toFixed\(3\)\}ms')
+register('unit.stats_average_fixup', r'\(stats\.average/1000\)\.toFixed\(3\)\}ms')
+register('unit.stats_stddev_fixup', r'\(stats\.stdDev/1000\)\.toFixed\(3\)\}ms')
+
+# 単位が <span> に分かれているパターン (改行を含む)
+register('unit.time_span', r'\{time\}\s*<span[^>]*>ms</span>')
+register('unit.reaction_span', r'\{reaction\}\s*<span[^>]*>ms</span>')
+
+# ---------------------------------------------------------------
+# app/page.tsx (③④⑤)
+# ---------------------------------------------------------------
+# ③④ 元のページそのままの見出し・バッジは固定文字列とこのパターンで置き換え、
+#    一致しなかったものは tsx.py (ノード単位) で探す
+# ⑤ ランキングエリアの置き換えは structure.py (アンカー方式) で行う
+register('page.judge_badge',
+         r'<span className="bg-red-100 text-red-700 px-2 py-1 rounded text-xs">認知</span>\s*'
+         r'<span className="bg-green-100 text-green-700 px-2 py-1 rounded text-xs">行動</span>')
+
+# ---------------------------------------------------------------
+# app/color/page.tsx (⑩)
+# ---------------------------------------------------------------
+register('color.signal_size', r'(className="w-\[)150(px\] h-\[)150(px\])')
+
+# ---------------------------------------------------------------
+# app/ranking/page.tsx (⑨⑩⑪)
+# ---------------------------------------------------------------
+# ⑨ スプリントボタンの削除 (一致しなかったものは tsx.py (ノード単位) で探す)
+register('ranking.sprint_button',
+         r'<button[^>]*onClick=\{\(\) => setMode\(\'sprint\'\)\}[^>]*>.*?スプリント.*?</button>', re.DOTALL)
+register('ranking.sprint_filter_button',
+         r'<button\s+onClick=\{\(\) => setModeFilter\(\'sprint\'\)\}[^>]*>.*?🏃 スプリント.*?</button>', re.DOTALL)
+# ⑩ 結果カードの文字サイズは structure.py (アンカー方式) で行う
+register('ranking.avg_time_ms', r'\{record\.avgTime\}ms')
+register('ranking.avg_time', r'\{record\.avgTime\}')
+register('ranking.avg_time_fixup', r'\(record\.avgTime/1000\)\.toFixed\(3\)\}ms')
+register('ranking.best_record',
+         r'<p className="text-4xl font-bold">\s*\{userBestRecord\.reactionTime\}\s*'
+         r'<span className="text-xl">ms</span>')
+register('ranking.record_time',
+         r'<p className="text-2xl font-bold text-gray-800">\s*\{record\.reactionTime\}\s*'
+         r'<span className="text-sm text-gray-500 ml-1">ms</span>')
+register('ranking.average',
+         r'<p className="text-2xl font-bold">\s*\{Math\.round\(\s*'
+         r'filteredRecords\.reduce\(\(sum, r\) => sum \+ r\.reactionTime, 0\) /\s*'
+         r'filteredRecords\.length\s*\)\}\s*<span className="text-sm">ms</span>')
+register('ranking.fastest',
+         r'<p className="text-2xl font-bold">\s*\{filteredRecords\[0\]\.reactionTime \|\| 0\}\s*'
+         r'<span className="text-sm">ms</span>')
+register('ranking.participants',
+         r'<p className="text-2xl font-bold">\s*\{new Set\(filteredRecords\.map\(r => r\.userId\)\)\.size\}人')
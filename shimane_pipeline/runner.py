@@ -0,0 +1,411 @@
+"""
+カスタマイズスクリプト共通のファイル変換ランナー
+ファイルごとの「読み込み → 変換 → 書き込み」を順番に、または --jobs N で並列に実行する。
+並列時も各ファイルの出力はまとめて、指定した順番どおりに表示する。
+--dry-run では書き込まずに、ファイルごとの unified diff を標準出力へ流す。
+--mmap ではバイト列版を持つ変換をデコードせずに mmap したファイル上で行う (bytepath.py)。
+書き込みは一時ファイル (<name>.staged) に行い、書き換えたファイルすべての構文チェック (validate.py) が
+通ってから置き換える。1つでも崩れていればどのファイルも書き換えない (--no-validate で無効)。
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from shimane_pipeline import bytepath, diff, discover, instrument, validate
+from shimane_pipeline.fileio import atomic_write, content_hash
+from shimane_pipeline.manifest import Manifest, read_object, ruleset_hash, transform_name
+from shimane_pipeline.rules import PATTERNS
+
+
+def decode(data):
+    """open(..., 'r') と同じ規則 (UTF-8・改行の統一) でバイト列を文字列にする"""
+    return io.TextIOWrapper(io.BytesIO(data), encoding='utf-8').read()
+
+
+def build_parser(description):
+    """スクリプト共通のコマンドライン引数を定義する"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help='並列に変換するファイル数 (0 で CPU 数、既定は 1 = 逐次)',
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='前回と同じ入力・同じルールのファイルは変換をスキップする (.shimane_cache/)',
+    )
+    parser.add_argument(
+        '--profile',
+        nargs='?',
+        const=str(instrument.REPORT_PATH),
+        metavar='PATH',
+        help=f'ルールごとの時間・マッチ数を計測してレポートを書き出す (既定は {instrument.REPORT_PATH})',
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='ファイルを書き換えずに、変更内容を unified diff で表示する (バックアップも作らない)',
+    )
+    parser.add_argument(
+        '--mmap',
+        action='store_true',
+        help='バイト列版のある変換は、ファイルを mmap してデコードせずに行う (大きなファイル向け)',
+    )
+    parser.add_argument(
+        '--no-validate',
+        action='store_true',
+        help='書き換えたファイルの構文チェック (括弧・JSX タグの対応) をせずにそのまま書き込む',
+    )
+    return parser
+
+
+def staged_path(filepath):
+    """構文チェックが通るまで変換結果を置いておく一時ファイル"""
+    path = Path(filepath)
+    return path.with_name(path.name + '.staged')
+
+
+def _write(filepath, data, staged):
+    atomic_write(staged_path(filepath) if staged else filepath, data)
+
+
+def _apply(filepath, transform, content):
+    """変換関数を1回適用する (--profile のときは計測しながら)"""
+    if not instrument.enabled():
+        return transform(content)
+    with instrument.current_file(filepath):
+        return instrument.call(transform_name(getattr(transform, 'func', transform)), transform, content)
+
+
+def _apply_edits(filepath, transform, edits_function, buffer):
+    """バイト列版の変換を1回適用する (--profile のときは計測しながら)"""
+    if not instrument.enabled():
+        return edits_function(buffer)
+    with instrument.current_file(filepath):
+        return instrument.call_edits(transform_name(getattr(transform, 'func', transform)), edits_function, buffer)
+
+
+def _reuse(filepath, transform, data, input_hash, known, cached, staged=False):
+    """変換せずに済む場合の結果 (済まなければ None)"""
+    # 変換に必要な文字列を1つも含まないファイルは、正規表現を走らせずにスキップ
+    if not discover.may_change(transform, data):
+        print(f"⏭️  {filepath} は対象の文字列を含まない (スキップ)")
+        return input_hash, input_hash, None, False
+
+    if known is not None and input_hash in known:
+        output_hash = known[input_hash]
+        if output_hash == input_hash:
+            print(f"⏭️  {filepath} は変更なし (スキップ)")
+            return input_hash, output_hash, None, False
+        output = cached(output_hash) if cached else None
+        if output is not None:
+            print(f"♻️  {filepath} に前回の変換結果を反映")
+            _write(filepath, output, staged)
+            return input_hash, output_hash, None, False
+    return None
+
+
+def _idempotent(check):
+    """check() で出力にもう一度変換を適用し、変わらないかを確かめる (進捗メッセージ・計測には含めない)"""
+    profiled = instrument.enabled()
+    instrument.enable(False)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return check()
+    finally:
+        instrument.enable(profiled)
+
+
+def transform_file(filepath, transform, known=None, cached=None, mapped=False, staged=False):
+    """1ファイルを変換し、内容が変わった場合だけ書き戻す
+
+    known は同じルールセットで変換済みの {入力ハッシュ: 出力ハッシュ}。
+    cached は出力ハッシュから出力本体を引く関数。
+    mapped が真で変換にバイト列版があれば、ファイルを mmap してバイト列のまま変換する。
+    staged が真なら filepath ではなく staged_path(filepath) に書き込む (置き換えは commit_staged)。
+    (入力ハッシュ, 出力ハッシュ, 新しく保存すべき出力 or None, 出力を変換しても変わらないか) を返す。
+    最後の値は known があるとき (--incremental) だけ確かめる。真ならマニフェストに
+    出力ハッシュ → 出力ハッシュ も記録し、次回は書き換えた後のファイルも変換せずにスキップする。
+    """
+    edits_function = bytepath.edits_function(transform) if mapped else None
+    if edits_function is not None:
+        result = _transform_mapped(filepath, transform, edits_function, known, cached, staged)
+        if result is not None:
+            return result
+
+    data = Path(filepath).read_bytes()
+    input_hash = content_hash(data)
+    result = _reuse(filepath, transform, data, input_hash, known, cached, staged)
+    if result is not None:
+        return result
+
+    text = _apply(filepath, transform, decode(data))
+    output = text.encode('utf-8')
+    # 内容が同じなら書き込まない (mtime が変わると Next.js が再ビルドする)
+    if output == data:
+        return input_hash, input_hash, None, False
+    _write(filepath, output, staged)
+    idempotent = known is not None and _idempotent(lambda: transform(text) == text)
+    return input_hash, content_hash(output), output, idempotent
+
+
+def _transform_mapped(filepath, transform, edits_function, known, cached, staged=False):
+    """transform_file の mmap 版 (バイト列のままでは変換できなければ None)
+
+    出力は一時ファイルへ直接書き出すので、キャッシュ用の出力本体は返さない。
+    """
+    tmp = bytepath.temp_path(filepath)
+    with bytepath.mapped(filepath) as buffer:
+        # \r を含むファイルは改行の統一 (decode) が必要なので str で変換する
+        if buffer.find(b'\r') >= 0:
+            return None
+        input_hash = content_hash(buffer)
+        result = _reuse(filepath, transform, buffer, input_hash, known, cached, staged)
+        if result is not None:
+            return result
+        edits = _apply_edits(filepath, transform, edits_function, buffer)
+        if edits is None:
+            return None
+        if not edits:
+            return input_hash, input_hash, None, False
+        output_hash = bytepath.write_edits(tmp, buffer, edits)
+    if output_hash == input_hash:
+        tmp.unlink()
+        return input_hash, input_hash, None, False
+    idempotent = known is not None and _idempotent(partial(_no_edits, edits_function, tmp))
+    if staged:
+        os.replace(tmp, staged_path(filepath))
+    else:
+        bytepath.replace(filepath, tmp)
+    return input_hash, output_hash, None, idempotent
+
+
+def _no_edits(edits_function, filepath):
+    """filepath にバイト列版の変換を適用しても編集が無いか"""
+    with bytepath.mapped(filepath) as buffer:
+        edits = edits_function(buffer)
+        return edits is not None and not edits
+
+
+def _transform_captured(filepath, transform, known, cached, profile=False, mapped=False, staged=False):
+    """ワーカープロセス用: 変換中の出力と計測結果を一緒に返す"""
+    instrument.enable(profile)
+    buf = io.StringIO()
+    with contextlib.redirect_stdout(buf):
+        result = transform_file(filepath, transform, known, cached, mapped, staged)
+    return buf.getvalue(), result, instrument.drain()
+
+
+def commit_staged(filepaths, jobs=None):
+    """書き換えたファイルの一時ファイルを構文チェックし、すべて通れば置き換える
+
+    1つでも崩れていれば (変換前から崩れていたファイルは除く) すべての一時ファイルを消し、
+    どのファイルも書き換えずに False を返す。
+    """
+    start = time.perf_counter()
+    checked = [filepath for filepath in filepaths if validate.checkable(filepath)]
+    # 一時ファイル (.staged) の拡張子ではなく元のパスで JSX を含むかを決める
+    results = validate.check_files([staged_path(filepath) for filepath in checked], jobs=jobs,
+                                   jsx=[validate.is_jsx(filepath) for filepath in checked])
+    failures = []
+    for filepath, (_, problem) in zip(checked, results):
+        if problem is None:
+            continue
+        if validate.check_file(filepath) is not None:
+            print(f"⚠️  {filepath} は変換前から構文が崩れています ({problem[2]})")
+            continue
+        failures.append((filepath, problem))
+    elapsed = (time.perf_counter() - start) * 1000
+
+    if failures:
+        for filepath in filepaths:
+            staged_path(filepath).unlink(missing_ok=True)
+        print(f"\n❌ 構文チェックに失敗したので、すべての変更を取り消しました ({elapsed:.1f}ms)")
+        for filepath, problem in failures:
+            print(f"   {validate.format_problem(filepath, problem)}")
+        return False
+    for filepath in filepaths:
+        bytepath.replace(filepath, staged_path(filepath))
+    if checked:
+        print(f"\n🔎 構文チェック: {len(checked)} ファイル OK ({elapsed:.1f}ms)")
+    return True
+
+
+def run_transforms(tasks, jobs=1, incremental=False, profile=None, mapped=False, validate_output=True):
+    """(ファイルパス, 変換関数) のリストを順番に、または並列に適用する
+
+    変換関数はプロセス間で受け渡すため、モジュールのトップレベル関数
+    (またはその functools.partial) である必要がある。
+    存在しないファイルはスキップする。
+    profile にパスを渡すとルールごとに計測し、終わったらレポートを書き出す。
+    mapped が真ならバイト列版のある変換を mmap で行う (--mmap)。
+    validate_output が真なら書き換えたファイルを構文チェックしてから置き換える (commit_staged)。
+    チェックに失敗してどのファイルも書き換えなかったときは False を返す。
+    """
+    if profile:
+        instrument.enable()
+    tasks = [(filepath, transform) for filepath, transform in tasks if os.path.exists(filepath)]
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    manifest = Manifest.load() if incremental else None
+    rulesets = [ruleset_hash(transform) if manifest else None for _, transform in tasks]
+    knowns = [manifest.entries(ruleset) if manifest else None for ruleset in rulesets]
+    cached = partial(read_object, manifest.objects_dir) if manifest else None
+
+    if jobs <= 1 or len(tasks) <= 1:
+        results = [
+            transform_file(filepath, transform, known, cached, mapped, validate_output)
+            for (filepath, transform), known in zip(tasks, knowns)
+        ]
+    else:
+        results = []
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as executor:
+            # map は投入順に結果を返すので、出力の順番は逐次実行と同じになる
+            for output, result, rows in executor.map(
+                _transform_captured,
+                [filepath for filepath, _ in tasks],
+                [transform for _, transform in tasks],
+                knowns,
+                [cached] * len(tasks),
+                [bool(profile)] * len(tasks),
+                [mapped] * len(tasks),
+                [validate_output] * len(tasks),
+            ):
+                print(output, end='')
+                results.append(result)
+                instrument.merge(rows)
+
+    committed = True
+    if validate_output:
+        changed = [filepath for (filepath, _), result in zip(tasks, results) if result[1] != result[0]]
+        committed = commit_staged(changed, jobs=jobs if jobs > 1 else None)
+
+    # 取り消した変換は、次回も変換し直すようにマニフェストに記録しない
+    if manifest and committed:
+        for (_, transform), ruleset, result in zip(tasks, rulesets, results):
+            manifest.record(transform_name(transform), ruleset, *result)
+        manifest.save()
+
+    if profile:
+        instrument.write_report(profile, known=PATTERNS)
+        instrument.enable(False)
+    return committed
+
+
+# ---------------------------------------------------------------
+# --dry-run
+# ---------------------------------------------------------------
+def preview_file(filepath, transform):
+    """1ファイルを書き込まずに変換し、(変換中の出力, 行単位のスパンパッチ) を返す
+
+    変換後の内容は持ち続けず、変わった行の範囲と新しい行だけを返す。
+    """
+    data = Path(filepath).read_bytes()
+    if not discover.may_change(transform, data):
+        return '', []
+    buf = io.StringIO()
+    with contextlib.redirect_stdout(buf):
+        content = decode(data)
+        patch = diff.span_patch(content, _apply(filepath, transform, content))
+    return buf.getvalue(), patch
+
+
+def _preview_captured(filepath, transform, profile=False):
+    """ワーカープロセス用: preview_file の結果と計測結果を一緒に返す"""
+    instrument.enable(profile)
+    return preview_file(filepath, transform) + (instrument.drain(),)
+
+
+class DiffWriter:
+    """スパンパッチを受け取り、別スレッドで unified diff に直して書き出す
+
+    diff の整形と書き込みは変換とは別のスレッドで行うので、出力先が遅くても
+    変換は止まらない。元の内容は書き出すときにファイルから読み直す。
+    変換中の出力 (進捗メッセージ) は diff と混ざらないように標準エラーへ出す。
+    """
+
+    def __init__(self, out=None, log=None):
+        self.out = out or sys.stdout
+        self.log = log or sys.stderr
+        self.changed = 0
+        self.added = 0
+        self.removed = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def put(self, filepath, output, patch):
+        self._queue.put((filepath, output, patch))
+
+    def close(self):
+        """残りを書き出して終わるまで待つ"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            filepath, output, patch = item
+            self.log.write(output)
+            if not patch:
+                continue
+            content = decode(Path(filepath).read_bytes())
+            for line in diff.unified_diff(filepath, content, patch):
+                self.out.write(line)
+            self.out.flush()
+            added, removed = diff.stats(patch)
+            self.changed += 1
+            self.added += added
+            self.removed += removed
+
+
+def preview_transforms(tasks, jobs=1, profile=None):
+    """run_transforms と同じ変換を、書き込まずに diff として表示する
+
+    ファイルごとに変換が終わったものから順番どおりに diff を流す。
+    --incremental のマニフェストは読みも書きもしない。
+    """
+    tasks = [(filepath, transform) for filepath, transform in tasks if os.path.exists(filepath)]
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    if profile:
+        instrument.enable()
+
+    writer = DiffWriter()
+    try:
+        if jobs <= 1 or len(tasks) <= 1:
+            for filepath, transform in tasks:
+                writer.put(filepath, *preview_file(filepath, transform))
+        else:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as executor:
+                for (filepath, _), (output, patch, rows) in zip(tasks, executor.map(
+                    _preview_captured,
+                    [filepath for filepath, _ in tasks],
+                    [transform for _, transform in tasks],
+                    [bool(profile)] * len(tasks),
+                )):
+                    writer.put(filepath, output, patch)
+                    instrument.merge(rows)
+    finally:
+        writer.close()
+
+    print(f"\n🔍 dry-run: {writer.changed} ファイルに変更あり (+{writer.added} -{writer.removed} 行)、"
+          f"書き込みは行っていません", file=sys.stderr)
+    if profile:
+        with contextlib.redirect_stdout(sys.stderr):
+            instrument.write_report(profile, known=PATTERNS)
+        instrument.enable(False)
@@ -0,0 +1,426 @@
+"""
+アンカー方式の構造マッチャ
+「開始マーカーを探す → 対応する閉じタグを求める → 範囲内を編集する」を線形時間で行う。
+
+'<!-- ランキングエリア -->.*?...</div>\\s*</div>' のような DOTALL の .*? を重ねた
+パターンは、マッチしないときにバックトラックで二乗以上の時間がかかる。
+ここではタグの対応を1回の走査で求め、リテラル検索は位置が戻らないカーソルで行うので、
+1ファイルあたりのコストは O(ファイルサイズ) に収まる。
+
+ただし Python で1文字ずつタグを読むマッチャは、旧パターンが線形で済む普通のページでは
+20倍ほど遅い。そこで各関数は、最後のマーカーの後ろにパターンの残りが順に現れるか
+(= どのマーカーからも最初の候補で一致し、バックトラックしない) を先に確かめ、
+そうなら旧パターンをそのまま使う。マッチャはその確認に落ちた入力でだけ使う。
+"""
+
+import re
+from bisect import bisect_right
+
+from shimane_pipeline import instrument
+
+_TAG_START = re.compile(r'<(/?)([A-Za-z][\w.:-]*)?')
+
+
+_TAG_SPECIAL = re.compile(r'[>{}"\'`]')
+_STRINGS = {
+    '"': re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL),
+    "'": re.compile(r"'(?:[^'\\]|\\.)*'", re.DOTALL),
+    '`': re.compile(r'`(?:[^`\\]|\\.)*`', re.DOTALL),
+}
+
+
+def _tag_end(content, i):
+    """i にある '<' から始まるタグの '>' の直後の位置を返す (閉じていなければ -1)
+
+    属性値の文字列と {…} 式 (onClick={() => …} の '>' など) は読み飛ばす。
+    """
+    depth = 0
+    pos = i + 1
+    while True:
+        m = _TAG_SPECIAL.search(content, pos)
+        if m is None:
+            return -1
+        c = m.group()
+        if c in _STRINGS:
+            string = _STRINGS[c].match(content, m.start())
+            if string is None:
+                return -1
+            pos = string.end()
+            continue
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+        elif depth <= 0:
+            return m.end()
+        pos = m.end()
+
+
+class Element:
+    """要素1つ分のスパン"""
+
+    __slots__ = ('name', 'start', 'open_end', 'close_start', 'end', 'parent')
+
+    def __init__(self, name, start, open_end, parent):
+        self.name = name
+        self.start = start          # '<' の位置
+        self.open_end = open_end    # 開始タグの '>' の直後
+        self.close_start = None     # 閉じタグの '<' の位置
+        self.end = None             # 閉じタグの '>' の直後 (閉じていなければ None)
+        self.parent = parent
+
+    def __repr__(self):
+        return f'Element({self.name!r}, {self.start}, {self.end})'
+
+
+class Document:
+    """1ファイル分の要素スパン索引 (構築は1回の線形走査)
+
+    marks に渡した位置については、それを囲む要素も同じ走査の中で記録する。
+    """
+
+    def __init__(self, content, marks=()):
+        self.content = content
+        self.elements = []
+        self._by_start = {}
+        self._marks = {}
+        self._scan(sorted(marks))
+        self._starts = [element.start for element in self.elements]
+        self._closed = {}
+
+    def _scan(self, marks):
+        content = self.content
+        stack = []
+        # 名前ごとの開いている要素数 (対応しない閉じタグでスタックを探さないため)
+        open_counts = {}
+        next_mark = 0
+        pos = 0
+        while True:
+            i = content.find('<', pos)
+            if i < 0:
+                i = len(content)
+            # タグの位置ちょうどにある印は、そのタグを処理する前 (親の中) として記録する
+            while next_mark < len(marks) and marks[next_mark] <= i:
+                self._marks[marks[next_mark]] = stack[-1] if stack else None
+                next_mark += 1
+            if i == len(content):
+                break
+
+            m = _TAG_START.match(content, i)
+            closing, name = m.group(1), m.group(2)
+            if name is None:
+                if not content.startswith('>', m.end()):
+                    # '< ' や '<!--' などはタグではない
+                    pos = i + 1
+                    continue
+                name = ''  # フラグメント <> </>
+
+            end = _tag_end(content, i)
+            if end < 0:
+                break
+
+            if closing:
+                if open_counts.get(name):
+                    # 対応する開始タグまでスタックを戻す (閉じ忘れの要素は閉じないまま捨てる)
+                    while True:
+                        element = stack.pop()
+                        open_counts[element.name] -= 1
+                        if element.name == name:
+                            element.close_start = i
+                            element.end = end
+                            break
+            else:
+                parent = stack[-1] if stack else None
+                element = Element(name, i, end, parent)
+                self.elements.append(element)
+                self._by_start[i] = element
+                if not content.startswith('/>', end - 2):
+                    stack.append(element)
+                    open_counts[name] = open_counts.get(name, 0) + 1
+            pos = end
+
+        for mark in marks[next_mark:]:
+            self._marks[mark] = None
+
+    def element_at(self, start):
+        """start から始まる要素 (無ければ None)"""
+        return self._by_start.get(start)
+
+    def _closed_ancestor(self, element):
+        """element 自身か、その祖先のうち閉じている最も近い要素"""
+        path = []
+        while element is not None and element.end is None:
+            if element.start in self._closed:
+                element = self._closed[element.start]
+                break
+            path.append(element)
+            element = element.parent
+        # 経路圧縮: 次に同じ祖先をたどるときは1回で済む
+        for skipped in path:
+            self._closed[skipped.start] = element
+        return element
+
+    def enclosing(self, pos):
+        """pos を内側に含む最も内側の閉じた要素 (無ければ None)
+
+        marks に渡した位置は走査時の記録から引く。それ以外は親をたどって探す。
+        """
+        if pos in self._marks:
+            return self._closed_ancestor(self._marks[pos])
+        index = bisect_right(self._starts, pos) - 1
+        element = self.elements[index] if index >= 0 else None
+        while element is not None and not (
+            element.end is not None and element.open_end <= pos < element.close_start
+        ):
+            element = element.parent
+        return element
+
+
+def find_all(content, needle):
+    """needle の出現位置をすべて返す"""
+    positions = []
+    i = content.find(needle)
+    while i >= 0:
+        positions.append(i)
+        i = content.find(needle, i + len(needle))
+    return positions
+
+
+class Cursor:
+    """前にしか進まない検索カーソル
+
+    検索開始位置が単調に増える限り、同じ範囲を二度走査しない。
+    """
+
+    def __init__(self, content, needle):
+        self.content = content
+        if isinstance(needle, str):
+            self._search = lambda pos: content.find(needle, pos)
+        else:
+            self._search = lambda pos: _regex_find(needle, content, pos)
+        self._pos = len(content) + 1
+        self._found = -1
+
+    def find(self, pos, end=None):
+        """pos 以降で最初に現れる位置 (end 以降なら -1)"""
+        # 前回より後ろから探す場合、前回の結果が pos 以降ならそのまま使える
+        if not (self._pos <= pos and (self._found == -2 or self._found >= pos)):
+            found = self._search(pos)
+            self._pos, self._found = pos, (found if found >= 0 else -2)
+        found = self._found
+        if found < 0 or (end is not None and found >= end):
+            return -1
+        return found
+
+
+def _regex_find(regex, content, pos):
+    m = regex.search(content, pos)
+    return m.start() if m else -1
+
+
+def replace_spans(content, edits):
+    """(開始, 終了, 置換文字列) のリストを適用する (重ならない・昇順であること)"""
+    if not edits:
+        return content
+    instrument.note_edits(content, edits)
+    out = []
+    last = 0
+    for start, end, text in edits:
+        out.append(content[last:start])
+        out.append(text)
+        last = end
+    out.append(content[last:])
+    return ''.join(out)
+
+
+def follows_last(content, marker, needles):
+    """最後の marker の後ろに needles (文字列か正規表現) がこの順に現れるか
+
+    「marker.*?needle1.*?needle2…」という旧パターンは、これが成り立てばどの marker からも
+    各 .*? が最も近い候補で止まって一致するので、バックトラックせず線形時間で終わる。
+    """
+    pos = content.rfind(marker)
+    if pos < 0:
+        return False
+    pos += len(marker)
+    for needle in needles:
+        if isinstance(needle, str):
+            i = content.find(needle, pos)
+            if i < 0:
+                return False
+            pos = i + len(needle)
+        else:
+            m = needle.search(content, pos)
+            if m is None:
+                return False
+            pos = m.end()
+    return True
+
+
+def sub_spans(regex, content, group=0, text=''):
+    """regex の各マッチの group の範囲を text に置き換える (replace_spans 経由で報告する)"""
+    edits = [(m.start(group), m.end(group), text) for m in regex.finditer(content)]
+    return replace_spans(content, edits)
+
+
+# ---------------------------------------------------------------
+# app/page.tsx: ランキングエリア (⑤)
+# ---------------------------------------------------------------
+RANKING_MARKER = '<!-- ランキングエリア -->'
+RANKING_BOX = '<div className="bg-gradient-to-r from-yellow-400 to-yellow-500 rounded-2xl shadow-xl p-8 mb-8">'
+_TWO_CLOSES = re.compile(r'</div>\s*</div>')
+_FRAGMENT_TAIL = re.compile(r'</div>\s*</div>\s*(?=</>)')
+# 旧パターン (follows_last が成り立つときに使う)
+RANKING_BOX_PATTERN = re.compile(
+    re.escape(RANKING_MARKER) + '.*?' + re.escape(RANKING_BOX) + '.*?' + _TWO_CLOSES.pattern, re.DOTALL)
+RANKING_FRAGMENT_PATTERN = re.compile(re.escape(RANKING_MARKER) + '.*?' + _FRAGMENT_TAIL.pattern, re.DOTALL)
+
+
+@instrument.rule('structure.replace_ranking_box')
+def replace_ranking_box(content, replacement):
+    """マーカーから黄色いランキングボックスの閉じタグまでを置き換える (v2)"""
+    if RANKING_MARKER not in content:
+        return content
+    if follows_last(content, RANKING_MARKER, (RANKING_BOX, _TWO_CLOSES)):
+        return sub_spans(RANKING_BOX_PATTERN, content, text=replacement)
+    doc = Document(content)
+    boxes = Cursor(content, RANKING_BOX)
+    edits = []
+    pos = 0
+    while True:
+        start = content.find(RANKING_MARKER, pos)
+        if start < 0:
+            break
+        box = doc.element_at(boxes.find(start + len(RANKING_MARKER)))
+        if box is None or box.end is None:
+            break
+        edits.append((start, box.end, replacement))
+        pos = box.end
+    return replace_spans(content, edits)
+
+
+@instrument.rule('structure.replace_ranking_to_fragment_end')
+def replace_ranking_to_fragment_end(content, replacement):
+    """マーカーから、それを囲むフラグメント <>…</> の閉じタグ直前までを置き換える (v3)
+
+    閉じタグの直前は </div> が2つ続いている必要がある (旧パターンと同じ条件)。
+    </> 自体は置き換えない。
+    """
+    markers = find_all(content, RANKING_MARKER)
+    if not markers:
+        return content
+    if follows_last(content, RANKING_MARKER, (_FRAGMENT_TAIL,)):
+        return sub_spans(RANKING_FRAGMENT_PATTERN, content, text=replacement)
+    doc = Document(content, marks=markers)
+    edits = []
+    pos = 0
+    for start in markers:
+        if start < pos:
+            continue
+        fragment = doc.enclosing(start)
+        if fragment is None or fragment.name != '':
+            continue
+        body = content[start:fragment.close_start].rstrip()
+        if not body.endswith('</div>') or not body[:-len('</div>')].rstrip().endswith('</div>'):
+            continue
+        edits.append((start, fragment.close_start, replacement))
+        pos = fragment.close_start
+    return replace_spans(content, edits)
+
+
+# ---------------------------------------------------------------
+# app/ranking/page.tsx: 結果カードの文字サイズ (⑩)
+# ---------------------------------------------------------------
+RESULT_CARD = '<div className="bg-white rounded-lg p-4">'
+AVERAGE_LABEL = '<p className="text-xs text-gray-500 mb-2">平均反応時間</p>'
+ACCURACY_LABEL = '<p className="text-xs text-gray-500 mb-2">正確率</p>'
+_SIZED_P = re.compile(r'<p className="(text-3xl|text-2xl)')
+
+
+def card_value_pattern(title, color):
+    """旧パターン: タイトルを含むカードの平均反応時間の数値 (グループ2 がサイズ)"""
+    return re.compile(
+        f'({re.escape(RESULT_CARD)}.*?{re.escape(title)}.*?{re.escape(AVERAGE_LABEL)}.*?<p className=")'
+        f'(text-3xl|text-2xl)(.*?font-bold {re.escape(color)}">)',
+        re.DOTALL,
+    )
+
+
+def accuracy_value_pattern(color):
+    """旧パターン: 正確率ラベルに続く数値 (グループ2 がサイズ)"""
+    return re.compile(
+        f'({re.escape(ACCURACY_LABEL)}.*?<p className=")(text-3xl|text-2xl)(.*?font-bold {re.escape(color)}">)',
+        re.DOTALL,
+    )
+
+
+def _resize_value(content, doc, sized, label_end, limit, color, edits):
+    """label_end 以降 limit 未満の最初の text-3xl/2xl の <p> を text-xl にする
+
+    クラス属性が 'font-bold {color}' で終わる場合だけ編集し、その <p> の
+    開始タグの終わりを返す (編集しなければ -1)。
+    """
+    p = sized.find(label_end, limit)
+    if p < 0:
+        return -1
+    element = doc.element_at(p)
+    if element is None or not content.endswith(f'font-bold {color}">', p, element.open_end):
+        return -1
+    size = _SIZED_P.match(content, p)
+    edits.append((size.start(1), size.end(1), 'text-xl'))
+    return element.open_end
+
+
+@instrument.rule('structure.resize_card_value')
+def resize_card_value(content, title, color):
+    """タイトルを含む結果カードで、平均反応時間の数値を text-xl にする (v2)"""
+    if RESULT_CARD not in content:
+        return content
+    if follows_last(content, RESULT_CARD, (title, AVERAGE_LABEL, _SIZED_P, f'font-bold {color}">')):
+        return sub_spans(card_value_pattern(title, color), content, group=2, text='text-xl')
+    doc = Document(content)
+    titles = Cursor(content, title)
+    labels = Cursor(content, AVERAGE_LABEL)
+    sized = Cursor(content, _SIZED_P)
+    edits = []
+    pos = 0
+    while True:
+        start = content.find(RESULT_CARD, pos)
+        if start < 0:
+            break
+        card = doc.element_at(start)
+        pos = start + len(RESULT_CARD)
+        if card is None or card.end is None:
+            continue
+        t = titles.find(pos, card.end)
+        label = labels.find(t + len(title), card.end) if t >= 0 else -1
+        if label < 0:
+            continue
+        done = _resize_value(content, doc, sized, label + len(AVERAGE_LABEL), card.end, color, edits)
+        if done >= 0:
+            pos = done
+    return replace_spans(content, edits)
+
+
+@instrument.rule('structure.resize_accuracy_value')
+def resize_accuracy_value(content, color):
+    """正確率ラベルに続く数値を text-xl にする (v2)"""
+    labels = find_all(content, ACCURACY_LABEL)
+    if not labels:
+        return content
+    if follows_last(content, ACCURACY_LABEL, (_SIZED_P, f'font-bold {color}">')):
+        return sub_spans(accuracy_value_pattern(color), content, group=2, text='text-xl')
+    doc = Document(content, marks=labels)
+    sized = Cursor(content, _SIZED_P)
+    edits = []
+    pos = 0
+    for label in labels:
+        if label < pos:
+            continue
+        pos = label + len(ACCURACY_LABEL)
+        parent = doc.enclosing(label)
+        limit = parent.close_start if parent is not None else len(content)
+        done = _resize_value(content, doc, sized, pos, limit, color, edits)
+        if done >= 0:
+            pos = done
+    return replace_spans(content, edits)
@@ -0,0 +1,321 @@
+"""
+複数の地域版 (テナント) の出力ツリーを1回でビルドする
+実行方法: python3 -m shimane_pipeline.tenants tenants/*.toml [--out build/tenants]
+
+テナントごとにリポジトリを複製してスクリプトを実行する代わりに、共有のソースを1回だけ
+読み込み・解析し、各テナントのステージ・ルールファイルをメモリ上で適用して
+<出力先>/<テナント名>/ にツリーを作る。
+
+    name = "oda"                          # 出力ディレクトリ名
+    description = "島根県大田市限定版"
+    stages = ["customization", "v2", "v3"]
+    rules = ["rules/shimane_v3.toml"]     # スクリプトのステージの後に適用する (省略可)
+
+ツリーのファイルは次のどちらか:
+    変わらないファイル       ソースへのハードリンク
+    変換で変わったファイル   <出力先>/.objects/<SHA-256> へのハードリンク (同じ内容はテナント間で1つ)
+変わったファイルは構文チェック (validate.py) が通らなければ、そのテナントのツリーを変えない。
+書き込むのは変わったファイルだけなので、ビルド時間とディスク使用量はテナント数 × ツリーの大きさではなく
+違いの量で増える。2回目以降は、既に同じ inode を指しているエントリには触らない。
+ビルダーは常に新しいファイルを作って置き換える (書き込み先を共有しない) が、出力ツリーのファイルを
+その場で書き換えるとソースや他のテナントにも反映されるので、編集は元のリポジトリで行うこと。
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import time
+import tomllib
+from pathlib import Path
+
+from shimane_pipeline import discover, validate
+from shimane_pipeline.fileio import atomic_write, content_hash
+from shimane_pipeline.manifest import transform_name
+from shimane_pipeline.pipeline import build_chains, select_stages
+from shimane_pipeline.rulefile import RuleFileStage
+from shimane_pipeline.runner import decode
+
+DEFAULT_OUT = Path('build') / 'tenants'
+
+# ソースとして扱わないディレクトリ (discover.SKIP_DIRS に加えて)
+SKIP_DIRS = discover.SKIP_DIRS | {'.shimane_backups'}
+
+
+class Tenant:
+    """テナントのプロファイル (ステージとルールファイル)"""
+
+    def __init__(self, name, description, stages, rules, source):
+        self.name = name
+        self.description = description
+        self.stage_names = stages
+        self.rule_paths = rules
+        self.source = source
+
+    def stages(self):
+        """このテナントのステージ (未知の名前・読めないルールファイルは ValueError)"""
+        stages = select_stages(self.stage_names)
+        for path in self.rule_paths:
+            try:
+                stages.append(RuleFileStage(path))
+            except OSError as e:
+                raise ValueError(f"{self.source}: ルールファイル {path} を読み込めません: {e}") from e
+        return stages
+
+
+def load_tenant(path):
+    """テナントのプロファイル (.toml / .json) を読み込む"""
+    data = Path(path).read_bytes()
+    try:
+        if Path(path).suffix == '.json':
+            spec = json.loads(data.decode('utf-8'))
+        else:
+            spec = tomllib.loads(data.decode('utf-8'))
+    except (tomllib.TOMLDecodeError, json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise ValueError(f"{path}: 読み込めません ({e})") from e
+    name = spec.get('name', Path(path).stem)
+    if not isinstance(name, str) or not name or '/' in name or name.startswith('.'):
+        raise ValueError(f"{path}: name はディレクトリ名に使える文字列にしてください")
+    stages = spec.get('stages', [])
+    rules = spec.get('rules', [])
+    for key, value in (('stages', stages), ('rules', rules)):
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise ValueError(f"{path}: {key} は文字列のリストにしてください")
+    return Tenant(name, spec.get('description', ''), stages, rules, str(path))
+
+
+def source_files(root='.', skip=()):
+    """ソースツリーのファイル (root からの相対パス、/ 区切り) をパスの順に返す
+
+    discover.walk と違い、. で始まるファイル (.env など) も含める。skip のディレクトリは探索しない。
+    """
+    skip = {os.path.normpath(path) for path in skip}
+    found = []
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            path = os.path.normpath(os.path.join(directory, entry.name))
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in SKIP_DIRS and path not in skip:
+                    stack.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                found.append(os.path.relpath(path, root).replace(os.sep, '/'))
+    return sorted(found)
+
+
+def _removed(filepath, removes):
+    return any(filepath == path or filepath.startswith(path.rstrip('/') + '/') for path in removes)
+
+
+class Builder:
+    """テナントの出力ツリーを作る (同じ入力・同じ変換の結果はテナント間で使い回す)"""
+
+    def __init__(self, out=DEFAULT_OUT):
+        self.out = Path(out)
+        self.objects_dir = self.out / '.objects'
+        self._sources = {}      # ファイルパス → 内容 (str)
+        self._results = {}      # (変換名, 入力) → 出力
+        self._names = {}        # id(変換関数) → 変換名
+        self._copy = False      # ハードリンクが使えない (別のファイルシステム) ときはコピーする
+
+    def _source(self, filepath):
+        """ソースの内容 (1回だけ読み込んでデコードする)"""
+        if filepath not in self._sources:
+            self._sources[filepath] = decode(Path(filepath).read_bytes())
+        return self._sources[filepath]
+
+    def _name(self, transform):
+        key = id(transform)
+        if key not in self._names:
+            self._names[key] = (transform_name(transform), transform)
+        return self._names[key][0]
+
+    def transform(self, filepath, transforms):
+        """ソースに変換を順番に適用した内容 (ソースから変わらなければ None)"""
+        source = content = self._source(filepath)
+        for transform in transforms:
+            if not discover.may_change(transform, content):
+                continue
+            key = (self._name(transform), content)
+            output = self._results.get(key)
+            if output is None:
+                # 変換中の進捗メッセージは出さない
+                with contextlib.redirect_stdout(io.StringIO()):
+                    output = transform(content)
+                self._results[key] = output
+            content = output
+        return None if content == source else content
+
+    def plan(self, tenant, files):
+        """出力ツリーのパス → リンク元のパス (変わったファイルは .objects に保存してそのパス)
+
+        戻り値は (計画, 変換で変わったファイルの数, 新しく保存したオブジェクトの数)。
+        """
+        stages = tenant.stages()
+        chains = build_chains(stages)
+        removes = [path for stage in stages for path in getattr(stage, 'removes', ())]
+        plan = {}
+        changed = written = 0
+        for filepath in files:
+            if _removed(filepath, removes):
+                continue
+            plan[filepath] = filepath
+            transforms = chains.get(filepath)
+            if not transforms:
+                continue
+            output = self.transform(filepath, transforms)
+            if output is None:
+                continue
+            if validate.checkable(filepath):
+                jsx = validate.is_jsx(filepath)
+                problem = validate.check(output, jsx)
+                if problem is not None and validate.check(self._source(filepath), jsx) is None:
+                    raise ValueError(f"構文が崩れます: {validate.format_problem(filepath, problem)}")
+            data = output.encode('utf-8')
+            digest = content_hash(data)
+            obj = self.objects_dir / digest
+            if not obj.exists():
+                self.objects_dir.mkdir(parents=True, exist_ok=True)
+                atomic_write(obj, data)
+                written += 1
+            plan[filepath] = str(obj)
+            changed += 1
+        return plan, changed, written
+
+    def _link(self, source, target):
+        """target を source へのハードリンクにする (一時ファイルを作ってから置き換える)"""
+        tmp = target.with_name(target.name + '.tmp')
+        tmp.unlink(missing_ok=True)
+        if not self._copy:
+            try:
+                os.link(source, tmp)
+            except OSError:
+                print("⚠️  ハードリンクを作れないので、コピーで出力します")
+                self._copy = True
+        if self._copy:
+            shutil.copy2(source, tmp)
+        os.replace(tmp, target)
+
+    def materialize(self, tenant, plan):
+        """計画どおりにツリーを作り、(リンクし直した数, 削除した数) を返す
+
+        既に同じファイル (同じ inode・コピーなら同じ内容) を指しているエントリはそのまま。
+        計画に無いファイルは消す。
+        """
+        root = self.out / tenant.name
+        linked = 0
+        for filepath, source in plan.items():
+            target = root / filepath
+            try:
+                if os.path.samefile(source, target) or (self._copy and _same_content(source, target)):
+                    continue
+            except OSError:
+                target.parent.mkdir(parents=True, exist_ok=True)
+            self._link(source, target)
+            linked += 1
+        removed = 0
+        if root.exists():
+            for filepath in source_files(root):
+                if filepath not in plan:
+                    (root / filepath).unlink()
+                    removed += 1
+            _remove_empty_dirs(root)
+        return linked, removed
+
+    def collect_garbage(self):
+        """どのツリーからも参照されなくなったオブジェクト (リンク数 1) を消す"""
+        if not self.objects_dir.exists():
+            return 0
+        removed = 0
+        for obj in self.objects_dir.iterdir():
+            if obj.is_file() and obj.stat().st_nlink == 1 and not self._copy:
+                obj.unlink()
+                removed += 1
+        return removed
+
+
+def _same_content(a, b):
+    a, b = Path(a), Path(b)
+    return a.stat().st_size == b.stat().st_size and a.read_bytes() == b.read_bytes()
+
+
+def _remove_empty_dirs(root):
+    for directory, dirnames, filenames in os.walk(root, topdown=False):
+        if directory != str(root) and not dirnames and not filenames:
+            with contextlib.suppress(OSError):
+                os.rmdir(directory)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="島根県大田市カスタマイズ - 地域版の一括ビルド")
+    parser.add_argument('profiles', nargs='+', help='テナントのプロファイル (.toml / .json)')
+    parser.add_argument(
+        '--out',
+        default=str(DEFAULT_OUT),
+        help=f'出力先 (<出力先>/<テナント名>/ にツリーを作る、既定は {DEFAULT_OUT})',
+    )
+    args = parser.parse_args(argv)
+
+    # カレントディレクトリの確認
+    if not os.path.exists('app/page.tsx'):
+        print("❌ エラー: app/page.tsx が見つかりません")
+        print("   プロジェクトのルートディレクトリで実行してください")
+        return 1
+
+    # スクリプトはリポジトリ直下にあるので、そこから import できるようにする
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+
+    try:
+        tenants = [load_tenant(path) for path in args.profiles]
+    except (OSError, ValueError) as e:
+        print(f"❌ エラー: {e}")
+        return 1
+    names = [tenant.name for tenant in tenants]
+    if len(set(names)) != len(names):
+        print("❌ エラー: テナント名が重複しています")
+        return 1
+
+    print("=" * 60)
+    print(f"🏗️  地域版の一括ビルド ({len(tenants)} テナント)")
+    print("=" * 60)
+
+    builder = Builder(args.out)
+    # 出力先がソースツリーの中にあっても、それはソースとして扱わない
+    files = source_files('.', skip=[args.out])
+    print(f"📂 ソース: {len(files)} ファイル → {args.out}/\n")
+
+    status = 0
+    for tenant in tenants:
+        start = time.perf_counter()
+        try:
+            plan, changed, written = builder.plan(tenant, files)
+        except Exception as e:
+            # 1つのテナントの失敗で他のテナントのビルドは止めない (このテナントのツリーは変えない)
+            print(f"❌ {tenant.name}: ビルドできません ({e})")
+            status = 1
+            continue
+        linked, removed = builder.materialize(tenant, plan)
+        elapsed = time.perf_counter() - start
+        label = f"{tenant.name} ({tenant.description})" if tenant.description else tenant.name
+        print(
+            f"✅ {label}: {len(plan)} ファイル (変換 {changed}, 新しいオブジェクト {written}, "
+            f"更新 {linked}, 削除 {removed}) {elapsed:.2f}s"
+        )
+
+    collected = builder.collect_garbage()
+    if collected:
+        print(f"\n🧹 使われなくなったオブジェクトを {collected} 個削除しました")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,780 @@
+"""
+軽量な TSX/JSX トークナイザとスパン索引
+ファイルを1回だけ走査して、要素・属性・{式} の子・テキストノードの位置を索引にする。
+索引は内容ごとにキャッシュするので、同じ内容に対する複数の編集は走査し直さない。
+直前に索引を作った内容から一部だけ変わった内容は、変わった範囲を含む要素の子だけを読み直す (reparse)。
+
+編集はインデントや改行に依存しない「ノードの検索 → スパンの置き換え」で行う:
+
+    patch = tsx.edit(content)
+    for p in patch.tree.find('p', text='みんなの記録を見て、目標を立てよう！'):
+        patch.remove(p)
+    content = patch.apply()
+"""
+
+import re
+from bisect import bisect_left
+from collections import OrderedDict
+from functools import lru_cache
+
+from shimane_pipeline import instrument, jslex
+from shimane_pipeline.jslex import ATTR_NAME, NAME, SPACE
+from shimane_pipeline.structure import replace_spans
+
+_CHILD_SPECIAL = re.compile(r'[<{]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class Node:
+    """索引のノード (start, end は content 上の位置)"""
+
+    __slots__ = ('tree', 'start', 'end', 'parent', 'index')
+
+    def __init__(self, tree, start, parent):
+        self.tree = tree
+        self.start = start
+        self.end = None
+        self.parent = parent
+        self.index = 0          # 親の children 内の位置
+
+    @property
+    def source(self):
+        return self.tree.content[self.start:self.end]
+
+    def next_sibling(self, skip_space=True):
+        """次の兄弟ノード (skip_space なら空白だけのテキストは飛ばす)"""
+        siblings = self.parent.children if self.parent is not None else self.tree.children
+        for node in siblings[self.index + 1:]:
+            if not (skip_space and isinstance(node, Text) and node.is_space):
+                return node
+        return None
+
+
+class Text(Node):
+    """要素の子のテキスト"""
+
+    __slots__ = ()
+
+    @property
+    def text(self):
+        return self.source
+
+    @property
+    def is_space(self):
+        return not self.source.strip()
+
+
+class Expr(Node):
+    """要素の子の {…} 式 (JSX コメント {/* … */} を含む)"""
+
+    __slots__ = ('children',)
+
+    def __init__(self, tree, start, parent):
+        super().__init__(tree, start, parent)
+        self.children = []      # 式の中に書かれた JSX 要素
+
+    @property
+    def code(self):
+        """中括弧の内側の式"""
+        return self.tree.content[self.start + 1:self.end - 1]
+
+    @property
+    def is_comment(self):
+        code = self.code.strip()
+        return code.startswith('/*') and code.endswith('*/')
+
+
+class Attr:
+    """属性1つ分 (値は "…" / '…' / {…} / なし)"""
+
+    __slots__ = ('name', 'start', 'end', 'value_start', 'value_end', 'kind')
+
+    def __init__(self, name, start, end, value_start=None, value_end=None, kind=None):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.value_start = value_start   # 引用符・中括弧の内側
+        self.value_end = value_end
+        self.kind = kind                 # 'string' / 'expr' / None
+
+    def __repr__(self):
+        return f'Attr({self.name!r}, {self.kind!r})'
+
+
+class Element(Node):
+    """JSX 要素 (name は フラグメント <>…</> なら '')"""
+
+    __slots__ = ('name', 'open_end', 'close_start', 'attrs', 'children', '_text')
+
+    def __init__(self, tree, start, parent, name):
+        super().__init__(tree, start, parent)
+        self.name = name
+        self.open_end = None    # 開始タグの '>' の直後
+        self.close_start = None # 閉じタグの '<' の位置 (自己終了タグ・閉じていなければ None)
+        self.attrs = []
+        self.children = []      # Text / Expr / Element
+        self._text = None
+
+    def __repr__(self):
+        return f'Element({self.name!r}, {self.start}, {self.end})'
+
+    def attr(self, name):
+        for attr in self.attrs:
+            if attr.name == name:
+                return attr
+        return None
+
+    def attr_value(self, name):
+        """属性値 (引用符・中括弧の内側)。属性が無ければ None"""
+        attr = self.attr(name)
+        if attr is None or attr.kind is None:
+            return None
+        return self.tree.content[attr.value_start:attr.value_end]
+
+    @property
+    def class_name(self):
+        """文字列で書かれた className (式なら None)"""
+        attr = self.attr('className')
+        if attr is None or attr.kind != 'string':
+            return None
+        return self.tree.content[attr.value_start:attr.value_end]
+
+    @property
+    def text(self):
+        """子孫のテキストを連結し、空白を1つにまとめたもの"""
+        if self._text is None:
+            parts = []
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                if isinstance(node, Text):
+                    parts.append(node.text)
+                elif isinstance(node, Element):
+                    stack.extend(reversed(node.children))
+            self._text = _WHITESPACE.sub(' ', ''.join(parts)).strip()
+        return self._text
+
+    def descendants(self, name=None):
+        """この要素の内側にある要素 (文書順)"""
+        if self.close_start is None:
+            return []
+        return self.tree.elements_between(self.open_end, self.close_start, name)
+
+
+class Tree:
+    """1ファイル分のスパン索引"""
+
+    def __init__(self, content):
+        self.content = content
+        self.children = []      # 最上位の JSX 要素
+        self.elements = []      # すべての要素 (開始位置の順)
+        self.expressions = []   # 要素の子の {…} 式
+        self.texts = []         # 要素の子のテキスト
+        self.braces = []        # コード中の [{ の位置, 対応する } の位置 (閉じていなければ None)] (開き順)
+        self.awaits = []        # コード中の await の位置
+        self._by_name = {}
+        try:
+            _Parser(self).js(0, None, None)
+        except RecursionError:
+            raise ValueError("JSX の入れ子が深すぎて索引を作れません") from None
+        self._starts = [element.start for element in self.elements]
+
+    def find(self, name=None, text=None, class_name=None, **attrs):
+        """条件に合う要素を文書順に返す
+
+        text は子孫テキスト (空白をまとめたもの) との完全一致、
+        attrs は属性値 (空白をまとめたもの) との完全一致。
+        """
+        elements = self.elements if name is None else self._by_name.get(name, [])
+        return [e for e in elements if _matches(e, text, class_name, attrs)]
+
+    def elements_between(self, start, end, name=None):
+        lo = bisect_left(self._starts, start)
+        hi = bisect_left(self._starts, end)
+        elements = self.elements[lo:hi]
+        if name is not None:
+            elements = [e for e in elements if e.name == name]
+        return elements
+
+    def _add_element(self, element):
+        self.elements.append(element)
+        self._by_name.setdefault(element.name, []).append(element)
+
+
+def _normalize(value):
+    return _WHITESPACE.sub(' ', value).strip()
+
+
+def _matches(element, text, class_name, attrs):
+    if element.end is None:
+        return False
+    if text is not None and element.text != text:
+        return False
+    if class_name is not None and element.class_name != class_name:
+        return False
+    for name, value in attrs.items():
+        actual = element.attr_value(name)
+        if actual is None or _normalize(actual) != _normalize(value):
+            return False
+    return True
+
+
+class _ParseError(Exception):
+    """'<' がタグとして解釈できない"""
+
+
+class _Parser(jslex.Scanner):
+    """JS のコードと JSX の子を相互に再帰して走査する (閉じていない文字列などは末尾まで読む)"""
+
+    def __init__(self, tree):
+        super().__init__(tree.content)
+        self.tree = tree
+        self.open_names = {}    # 開いている要素の名前ごとの数
+        self.stop = 0           # 直前に読んだ要素の後ろ (走査を再開する位置)
+
+    def js(self, pos, stop, owner):
+        """JS のコードを読み、対応する stop ('}' など) の位置を返す
+
+        stop が None なら末尾まで読む。途中の JSX 要素は owner の子として記録する。
+        コード中の {…} の対応と await の位置は tree.braces / tree.awaits に記録する。
+        """
+        content = self.content
+        tree = self.tree
+        # 開いている括弧 ('{' は tree.braces の番号、'(' '[' は None)
+        stack = []
+        while True:
+            m = jslex.JS_SPECIAL_AWAIT.search(content, pos)
+            if m is None:
+                return len(content)
+            c = m.group()
+            i = m.start()
+            if c == '`':
+                pos = self.template(i, owner)
+            elif c in jslex.SKIPPED:
+                pos = self.skip(i, c)
+            elif c == 'await':
+                tree.awaits.append(i)
+                pos = m.end()
+            elif c == '{':
+                stack.append(len(tree.braces))
+                tree.braces.append([i, None])
+                pos = i + 1
+            elif c in '([':
+                stack.append(None)
+                pos = i + 1
+            elif c in '})]':
+                if not stack and stop is not None and c == stop:
+                    return i
+                if stack:
+                    brace = stack.pop()
+                    if brace is not None and c == '}':
+                        tree.braces[brace][1] = i
+                pos = i + 1
+            elif jslex.jsx_start(content, i):
+                element = self.try_element(i, owner)
+                if element is None:
+                    pos = i + 1
+                    continue
+                if owner is None:
+                    element.index = len(tree.children)
+                    tree.children.append(element)
+                elif isinstance(owner, Expr):
+                    element.index = len(owner.children)
+                    owner.children.append(element)
+                pos = max(self.stop, i + 1)
+            else:
+                pos = i + 1
+
+    def try_element(self, i, parent):
+        """要素を読む。タグとして読めなければ途中で記録したノードを捨てて None を返す"""
+        tree = self.tree
+        marks = len(tree.elements), len(tree.expressions), len(tree.texts), len(tree.braces), len(tree.awaits)
+        try:
+            return self.element(i, parent)
+        except _ParseError:
+            for element in tree.elements[marks[0]:]:
+                tree._by_name[element.name].remove(element)
+            del tree.elements[marks[0]:]
+            del tree.expressions[marks[1]:]
+            del tree.texts[marks[2]:]
+            del tree.braces[marks[3]:]
+            del tree.awaits[marks[4]:]
+            return None
+
+    def element(self, i, parent):
+        """i の '<' から要素を1つ読む"""
+        content = self.content
+        tree = self.tree
+        if content.startswith('<>', i):
+            name, pos = '', i + 1
+        else:
+            m = NAME.match(content, i + 1)
+            if m is None:
+                raise _ParseError
+            name, pos = m.group(), m.end()
+
+        element = Element(tree, i, parent, name)
+        attrs = []
+        while True:
+            pos = SPACE.match(content, pos).end()
+            if content.startswith('/>', pos):
+                element.open_end = element.end = pos + 2
+                break
+            if content.startswith('>', pos):
+                element.open_end = pos + 1
+                break
+            if content.startswith('{', pos):
+                # {...props}
+                end = self.js(pos + 1, '}', element)
+                if end >= len(content):
+                    raise _ParseError
+                attrs.append(Attr('...', pos, end + 1, pos + 1, end, 'expr'))
+                pos = end + 1
+                continue
+            m = ATTR_NAME.match(content, pos)
+            if m is None:
+                raise _ParseError
+            attr_name, attr_start = m.group(), pos
+            pos = SPACE.match(content, m.end()).end()
+            if not content.startswith('=', pos):
+                attrs.append(Attr(attr_name, attr_start, m.end()))
+                pos = m.end()
+                continue
+            pos = SPACE.match(content, pos + 1).end()
+            quote = content[pos:pos + 1]
+            if quote in ('"', "'"):
+                end = jslex.attr_string_end(content, pos)
+                if end < 0:
+                    raise _ParseError
+                attrs.append(Attr(attr_name, attr_start, end, pos + 1, end - 1, 'string'))
+                pos = end
+            elif quote == '{':
+                end = self.js(pos + 1, '}', element)
+                if end >= len(content):
+                    raise _ParseError
+                attrs.append(Attr(attr_name, attr_start, end + 1, pos + 1, end, 'expr'))
+                pos = end + 1
+            else:
+                raise _ParseError
+
+        element.attrs = attrs
+        tree._add_element(element)
+        if element.end is None:
+            self.children(element)
+        else:
+            self.stop = element.end
+        return element
+
+    def children(self, element):
+        """開始タグの後ろから閉じタグまでの子を読む"""
+        content = self.content
+        tree = self.tree
+        name = element.name
+        self.open_names[name] = self.open_names.get(name, 0) + 1
+        children = element.children
+        pos = element.open_end
+        text_start = pos
+        try:
+            while True:
+                m = _CHILD_SPECIAL.search(content, pos)
+                i = m.start() if m else len(content)
+                if i == len(content):
+                    self._text(element, text_start, i)
+                    self.stop = i
+                    return
+                if content[i] == '{':
+                    self._text(element, text_start, i)
+                    expr = Expr(tree, i, element)
+                    end = self.js(i + 1, '}', expr)
+                    expr.end = min(end + 1, len(content))
+                    expr.index = len(children)
+                    children.append(expr)
+                    tree.expressions.append(expr)
+                    pos = text_start = expr.end
+                    continue
+                if content.startswith('</', i):
+                    m = NAME.match(content, i + 2)
+                    close_name = m.group() if m else ''
+                    close_end = m.end() if m else i + 2
+                    close_end = SPACE.match(content, close_end).end()
+                    if content.startswith('>', close_end) and self.open_names.get(close_name):
+                        self._text(element, text_start, i)
+                        if close_name == name:
+                            element.close_start = i
+                            element.end = self.stop = close_end + 1
+                        else:
+                            # 別の祖先の閉じタグなら、この要素は閉じないまま親へ戻る
+                            self.stop = i
+                        return
+                    pos = i + 2
+                    continue
+                child = self.try_element(i, element)
+                if child is None:
+                    pos = i + 1
+                    continue
+                self._text(element, text_start, i)
+                child.index = len(children)
+                children.append(child)
+                # 子が閉じていなければ、祖先の閉じタグの位置から読み直す
+                pos = text_start = self.stop
+        finally:
+            self.open_names[name] -= 1
+
+    def _text(self, element, start, end):
+        if start < end:
+            text = Text(self.tree, start, element)
+            text.end = end
+            text.index = len(element.children)
+            element.children.append(text)
+            self.tree.texts.append(text)
+
+
+# 内容 → 索引 (最近使った順)
+_trees = OrderedDict()
+_CACHE_SIZE = 32
+# 読み直しの元にする直近の索引の数と、読み直しを試す内容の最小の長さ (短ければ全体を読む方が速い)
+_REPARSE_CANDIDATES = 4
+_REPARSE_MIN = 4096
+
+
+def parse(content):
+    """content のスパン索引 (同じ内容なら前回の索引を返す)"""
+    tree = _trees.get(content)
+    if tree is not None:
+        _trees.move_to_end(content)
+        return tree
+    tree = _index(content)
+    _trees[content] = tree
+    if len(_trees) > _CACHE_SIZE:
+        _trees.popitem(last=False)
+    return tree
+
+
+def clear_cache():
+    """索引のキャッシュを捨てる"""
+    _trees.clear()
+
+
+@instrument.rule('tsx.parse', scan=True)
+def _index(content):
+    # 直近の索引のうち共通部分が最も長いものから作り直せれば、変わった範囲だけを読む
+    best = None
+    for tree in list(_trees.values())[-_REPARSE_CANDIDATES:] if len(content) >= _REPARSE_MIN else ():
+        prefix, suffix = _common_ends(tree.content, content)
+        if best is None or prefix + suffix > best[1] + best[2]:
+            best = (tree, prefix, suffix)
+    # 変わった範囲がどちらの版でも半分以下のときだけ (それ以外は読み直す要素も半分を超える)
+    if best is not None and (max(len(best[0].content), len(content)) - best[1] - best[2]) * 2 <= len(content):
+        tree = reparse(best[0], content, best[1], best[2])
+        if tree is not None:
+            return tree
+    return Tree(content)
+
+
+def _common_ends(a, b):
+    """(共通する先頭の長さ, 残りのうち共通する末尾の長さ)
+
+    比べる範囲を半分ずつ伸ばす二分探索なので、比較は C の startswith / endswith だけで済む。
+    """
+    limit = min(len(a), len(b))
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a.startswith(b[lo:mid], lo):
+            lo = mid
+        else:
+            hi = mid - 1
+    prefix = lo
+    lo, hi = 0, limit - prefix
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a.endswith(b[len(b) - mid:len(b) - lo], 0, len(a) - lo):
+            lo = mid
+        else:
+            hi = mid - 1
+    return prefix, lo
+
+
+def reparse(tree, content, prefix, suffix):
+    """前の版の索引 tree から content の索引を作る (作り直せなければ None)
+
+    prefix / suffix は前の版と共通する先頭・末尾の長さ。変わった範囲を子の中に含む
+    最も内側の要素の子だけを読み直し、それ以外のノードは位置をずらして写す。
+    変わった範囲がタグや JS のコードにかかる場合、読み直した要素の閉じタグの位置が
+    合わない場合、読み直す範囲がファイルの半分を超える場合は None (全体を読む)。
+    """
+    old_end = len(tree.content) - suffix
+    delta = len(content) - len(tree.content)
+    target = None
+    for element in reversed(tree.elements[:bisect_left(tree._starts, prefix)]):
+        if element.close_start is not None and element.open_end <= prefix and old_end <= element.close_start:
+            target = element
+            break
+    if target is None or (target.close_start - target.open_end) * 2 > len(tree.content):
+        return None
+    open_end, close_start = target.open_end, target.close_start
+
+    new = Tree.__new__(Tree)
+    new.content = content
+    new.elements, new.expressions, new.texts, new.braces, new.awaits = [], [], [], [], []
+    new._by_name = {}
+    parser = _Parser(new)
+    # 祖先のうち子を読んでいる途中のもの (属性の式の中からではないもの) は名前が開いている
+    node = target
+    while node.parent is not None:
+        parent = node.parent
+        if isinstance(parent, Element) and node.start >= parent.open_end:
+            parser.open_names[parent.name] = parser.open_names.get(parent.name, 0) + 1
+        node = parent
+    copy = Element(new, target.start, None, target.name)
+    copy.open_end = open_end
+    copy.attrs = target.attrs
+    copy.index = target.index
+    parser.children(copy)
+    if copy.close_start != close_start + delta or copy.end != target.end + delta:
+        return None
+
+    def shift(pos):
+        return pos + delta if pos is not None and pos >= close_start else pos
+
+    # 読み直した範囲の外のノードを写す (target は copy に置き換える)
+    mapping = {target: copy}
+    for node in tree.elements + tree.expressions + tree.texts:
+        if node is target or open_end <= node.start < close_start:
+            continue
+        clone = node.__class__.__new__(node.__class__)
+        clone.tree = new
+        clone.start = shift(node.start)
+        clone.end = shift(node.end)
+        clone.index = node.index
+        if isinstance(node, Element):
+            clone.name = node.name
+            clone.open_end = shift(node.open_end)
+            clone.close_start = shift(node.close_start)
+            clone.attrs = node.attrs if node.start < close_start else [
+                Attr(attr.name, shift(attr.start), shift(attr.end),
+                     shift(attr.value_start), shift(attr.value_end), attr.kind)
+                for attr in node.attrs
+            ]
+            clone._text = None
+        mapping[node] = clone
+    for node, clone in mapping.items():
+        clone.parent = mapping[node.parent] if node.parent is not None else None
+        if node is not target and isinstance(node, (Element, Expr)):
+            clone.children = [mapping[child] for child in node.children]
+    new.children = [mapping[child] for child in tree.children]
+
+    # テキストは後ろに続く子要素を読み終えてから記録される (閉じていない子要素の後ろは判断できない)
+    def text_recorded(text):
+        following = text.next_sibling(skip_space=False)
+        if isinstance(following, Element) and following.start == text.end:
+            if following.end is None:
+                raise _ParseError
+            return following.end
+        return text.end
+
+    # 各リストの読み直した範囲を、読み直した結果で置き換える (target の子を読む前に記録されたものが前)
+    def splice(items, position, before, convert, replacement):
+        kept = [item for item in items if not open_end <= position(item) < close_start]
+        at = sum(1 for item in kept if before(item))
+        return [convert(item) for item in kept[:at]] + replacement + [convert(item) for item in kept[at:]]
+
+    new.elements = splice(tree.elements, lambda e: e.start,
+                          lambda e: e.start < open_end, mapping.get, new.elements)
+    new.expressions = splice(tree.expressions, lambda e: e.start,
+                             lambda e: e.end <= open_end, mapping.get, new.expressions)
+    try:
+        new.texts = splice(tree.texts, lambda t: t.start,
+                           lambda t: text_recorded(t) <= open_end, mapping.get, new.texts)
+    except _ParseError:
+        return None
+    new.braces = splice(tree.braces, lambda b: b[0],
+                        lambda b: b[0] < open_end, lambda b: [shift(b[0]), shift(b[1])], new.braces)
+    new.awaits = splice(tree.awaits, lambda a: a, lambda a: a < open_end, shift, new.awaits)
+    new._by_name = {}
+    for element in new.elements:
+        new._by_name.setdefault(element.name, []).append(element)
+    new._starts = [element.start for element in new.elements]
+    return new
+
+
+class Patch:
+    """content に対する編集をまとめ、最後に1回で適用する
+
+    索引 (tree) は最初に参照したときに作る。下の編集関数は対象の候補が無ければ索引を引かないので、
+    どの編集も当てはまらないファイルでは索引を作らない。
+    """
+
+    def __init__(self, content):
+        self.content = content
+        self.edits = []
+        self._tree = None
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            self._tree = parse(self.content)
+        return self._tree
+
+    def replace(self, start, end, text):
+        self.edits.append((start, end, text))
+
+    def replace_node(self, node, text):
+        self.replace(node.start, node.end, text)
+
+    def remove(self, node):
+        self.replace(node.start, node.end, '')
+
+    def insert(self, pos, text):
+        self.replace(pos, pos, text)
+
+    def apply(self):
+        """編集を適用した内容を返す (重なる編集は ValueError)"""
+        if not self.edits:
+            return self.content
+        edits = sorted(self.edits, key=lambda edit: (edit[0], edit[1]))
+        for (_, prev_end, _), (start, _, _) in zip(edits, edits[1:]):
+            if start < prev_end:
+                raise ValueError(f"編集範囲が重なっています: {start}")
+        return replace_spans(self.content, edits)
+
+
+def edit(content):
+    """content に対する Patch を作る (索引は編集関数が必要としたときに作る)"""
+    return Patch(content)
+
+
+# ---------------------------------------------------------------
+# ノード単位の編集 (Patch に編集を追加するだけで、適用は呼び出し側で1回)
+#
+# 索引の構築は Python でノードを1つずつ作るので 5〜10MB/s しか出ない。各関数は索引を引く前に、
+# 対象になりうる文言・属性値が content にあるかを in と正規表現で確かめ、無ければ何もしない。
+# 文言はテキストノード1つ (タグや {…} で分かれていないもの) として現れるものだけを候補にする。
+# ---------------------------------------------------------------
+_MS = re.compile(r'ms(?!\w)')
+
+
+def _words(text):
+    """text の空白の違い (空白1つ ⇔ 改行とインデントなど) を許す正規表現"""
+    return r'\s+'.join(re.escape(word) for word in text.split())
+
+
+def _longest_word(text):
+    """_words(text) のマッチに必ず含まれる最も長い語 (正規表現の前に in で探す)"""
+    return max(text.split() or [''], key=len)
+
+
+@lru_cache(maxsize=None)
+def _compile(pattern):
+    return re.compile(pattern)
+
+
+def _has_text_node(patch, text, following=r'[<{]'):
+    """空白を除くと text だけのテキストノードの候補があるか (following はその直後)
+
+    まず text の最も長い語を in で探し (無ければ正規表現も使わない)、正規表現は文言から始めて
+    (先頭のリテラルは C の検索で飛ばせる)、直前がタグか {…} の終わりかは見つけた位置から戻って確かめる。
+    """
+    content = patch.content
+    if _longest_word(text) not in content:
+        return False
+    for m in _compile(_words(text) + r'\s*' + following).finditer(content):
+        start = m.start()
+        while start > 0 and content[start - 1].isspace():
+            start -= 1
+        if start > 0 and content[start - 1] in '>}':
+            return True
+    return False
+
+
+def _has(pattern, patch):
+    return _compile(pattern).search(patch.content) is not None
+
+
+@instrument.patch_rule('tsx.convert_ms_children')
+def convert_ms_children(patch, expressions):
+    """{式}ms の子を {秒に直した式}s にする (⑪)
+
+    expressions は {式: 秒に直した式}。式は空白をまとめて比較する。
+    """
+    # 正規表現を組み立てる前に、マッチに必ず含まれる '}ms' を in で探す
+    if not expressions or '}ms' not in patch.content or not _has(
+            r'\{\s*(?:' + '|'.join(_words(code) for code in expressions) + r')\s*\}ms(?!\w)', patch):
+        return
+    for expr in patch.tree.expressions:
+        seconds = expressions.get(_normalize(expr.code))
+        if seconds is None:
+            continue
+        unit = expr.next_sibling(skip_space=False)
+        if isinstance(unit, Text) and unit.start == expr.end and _MS.match(unit.text):
+            patch.replace(expr.start, unit.start + 2, '{' + seconds + '}s')
+
+
+@instrument.patch_rule('tsx.rename_heading')
+def rename_heading(patch, title, new_title, description=None):
+    """見出し <h3> の文言を変える
+
+    description を渡した場合は、直後の要素の文言が一致する見出しだけを変える。
+    """
+    # 見出しの子のテキストの直後は </h3> か子の要素・式の始まり
+    if not _has_text_node(patch, title, r'(?:</h3\s*>|<(?!/)|\{)'):
+        return
+    for heading in patch.tree.find('h3', text=title):
+        if description is not None:
+            following = heading.next_sibling()
+            if not (isinstance(following, Element) and following.text == description):
+                continue
+        for text in heading.children:
+            if isinstance(text, Text) and text.text.strip() == title:
+                start = text.start + text.text.index(title)
+                patch.replace(start, start + len(title), new_title)
+
+
+@instrument.patch_rule('tsx.add_badge')
+def add_badge(patch, titles, after, badge, markup):
+    """見出しが titles のいずれかのカードで、文言 after のバッジの後ろに新しいバッジを入れる
+
+    badge と同じ文言のバッジが既にあるカードには何もしない。
+    インデントは後ろに続くバッジとの間の空白をそのまま使う。
+    """
+    if isinstance(titles, str):
+        titles = (titles,)
+    if not any(_has_text_node(patch, title) for title in titles):
+        return
+    # after のバッジのうち、直後に badge のバッジが続くものは、そのカードに badge があるので候補にしない
+    badge_follows = r'/span\s*>\s*<span\b[^>]*>\s*' + _words(badge) + r'\s*</span'
+    if not _has_text_node(patch, after, r'(?:\{|<(?!' + badge_follows + '))'):
+        return
+    for heading in patch.tree.find('h3'):
+        if heading.text not in titles:
+            continue
+        # カードは見出しを囲む最も近い要素 ({…} の式の中にあれば式の外側の要素、無ければ飛ばす)
+        card = heading.parent
+        while card is not None and not isinstance(card, Element):
+            card = card.parent
+        if card is None:
+            continue
+        spans = card.descendants('span')
+        if any(span.text == badge for span in spans):
+            continue
+        for span in spans:
+            if span.text != after:
+                continue
+            space = span.next_sibling(skip_space=False)
+            indent = space.text if isinstance(space, Text) and space.is_space else ''
+            patch.insert(span.end, indent + markup)
+            break
+
+
+@instrument.patch_rule('tsx.remove_elements')
+def remove_elements(patch, name, text=None, **attrs):
+    """条件に合う要素を取り除く (前後の空白はそのまま。入れ子の内側は外側ごと消える)"""
+    if text is not None and not _has_text_node(patch, text):
+        return
+    if not all(_longest_word(value) in patch.content and _has(_words(value), patch) for value in attrs.values()):
+        return
+    removed_end = -1
+    for element in patch.tree.find(name, text=text, **attrs):
+        if element.start >= removed_end:
+            patch.remove(element)
+            removed_end = element.end
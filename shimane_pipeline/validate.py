@@ -0,0 +1,266 @@
+"""
+変換後のファイルの構文チェック (括弧と JSX タグの対応)
+npm run dev でコンパイルするまで分からなかった壊れ方 (閉じタグの重複・括弧の欠け) を、
+書き込む前にミリ秒単位で見つける。
+
+文字列・テンプレートリテラル (${…} の中はコード)・コメント・正規表現リテラルの中は数えない。
+JSX の子のテキストでは引用符を文字列とみなさない (Don't などがあるため)。
+字句の規則と '<' を JSX とみなす条件は tsx.py の索引と共有する (jslex.py) が、こちらは
+閉じていない文字列・読めない閉じタグ・閉じていない要素をそのままにせずエラーにする。
+
+    problem = validate.check(content)        # None または (行, 桁, メッセージ)
+    python3 -m shimane_pipeline.validate app/**/*.tsx
+"""
+
+import argparse
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from shimane_pipeline import jslex
+from shimane_pipeline.jslex import ATTR_NAME, NAME, SPACE
+
+# チェックするファイルの拡張子 (.ts は JSX を含まない)
+EXTENSIONS = ('.tsx', '.jsx', '.ts', '.js', '.mjs')
+# JSX を含まない拡張子
+PLAIN_EXTENSIONS = ('.ts', '.mjs')
+
+# 合計がこのバイト数以上なら、複数のファイルをプロセスに分けてチェックする
+# (少なければプロセスを起動するより順番に見る方が速い)
+PARALLEL_MIN_BYTES = 1 << 20
+
+_CHILD_SPECIAL = re.compile(r'[<{}]')
+_PAIRS = {')': '(', ']': '[', '}': '{'}
+
+
+class _Problem(Exception):
+    def __init__(self, pos, message):
+        super().__init__(message)
+        self.pos = pos
+        self.message = message
+
+
+class _NotTag(Exception):
+    """'<' がタグとして読めない (比較演算子や型引数)"""
+
+
+class _Checker(jslex.Scanner):
+    """JS のコードと JSX の子を相互に再帰して、対応の崩れを最初の1つだけ見つける"""
+
+    def __init__(self, content, jsx=True):
+        super().__init__(content)
+        self.jsx = jsx
+
+    def line(self, pos):
+        return self.content.count('\n', 0, pos) + 1
+
+    def unclosed(self, pos, message):
+        raise _Problem(pos, message)
+
+    def js(self, pos, stop):
+        """JS のコードを読み、stop ('}' など) の位置を返す (stop が None なら末尾まで)"""
+        content = self.content
+        stack = []      # (開き括弧, 位置)
+        while True:
+            m = jslex.JS_SPECIAL.search(content, pos)
+            if m is None:
+                if stack:
+                    c, i = stack[-1]
+                    raise _Problem(i, f"{c} が閉じていません")
+                if stop is not None:
+                    raise _Problem(len(content), f"{stop} が足りません")
+                return len(content)
+            c = m.group()
+            i = m.start()
+            if c == '`':
+                pos = self.template(i)
+            elif c in jslex.SKIPPED:
+                pos = self.skip(i, c)
+            elif c in '{([':
+                stack.append((c, i))
+                pos = i + 1
+            elif c in '})]':
+                if stack:
+                    opening, at = stack.pop()
+                    if opening != _PAIRS[c]:
+                        raise _Problem(i, f"{c} が {self.line(at)} 行目の {opening} と対応しません")
+                elif c == stop:
+                    return i
+                else:
+                    raise _Problem(i, f"対応する開き括弧の無い {c} があります")
+                pos = i + 1
+            elif (self.jsx and content.startswith('</', i)
+                  and jslex.after(content, i, jslex.JSX_PRECEDERS, jslex.JSX_KEYWORDS)):
+                raise _Problem(i, "対応する開始タグの無い閉じタグがあります")
+            elif self.jsx and jslex.jsx_start(content, i):
+                try:
+                    pos = self.element(i)
+                except _NotTag:
+                    pos = i + 1
+            else:
+                pos = i + 1
+
+    def element(self, i):
+        """i の '<' から要素を1つ読み、その後ろの位置を返す
+
+        開始タグが読めなければ _NotTag (タグではない)。開始タグが読めた後の崩れは _Problem。
+        """
+        content = self.content
+        if content.startswith('<>', i):
+            name, pos = '', i + 1
+        else:
+            m = NAME.match(content, i + 1)
+            if m is None:
+                raise _NotTag
+            name, pos = m.group(), m.end()
+        while True:
+            pos = SPACE.match(content, pos).end()
+            if content.startswith('/>', pos):
+                return pos + 2
+            if content.startswith('>', pos):
+                return self.children(i, name, pos + 1)
+            if content.startswith('{', pos):
+                # {...props}
+                pos = self._attr_expr(pos)
+                continue
+            m = ATTR_NAME.match(content, pos)
+            if m is None:
+                raise _NotTag
+            pos = SPACE.match(content, m.end()).end()
+            if not content.startswith('=', pos):
+                pos = m.end()
+                continue
+            pos = SPACE.match(content, pos + 1).end()
+            quote = content[pos:pos + 1]
+            if quote in ('"', "'"):
+                pos = jslex.attr_string_end(content, pos)
+                if pos < 0:
+                    raise _NotTag
+            elif quote == '{':
+                pos = self._attr_expr(pos)
+            else:
+                raise _NotTag
+
+    def _attr_expr(self, pos):
+        try:
+            return self.js(pos + 1, '}') + 1
+        except _Problem:
+            # 属性の {…} が読めないなら、そもそもタグではなかったとみなす
+            raise _NotTag from None
+
+    def children(self, start, name, pos):
+        """開始タグの後ろから対応する閉じタグまでを読み、閉じタグの後ろの位置を返す"""
+        content = self.content
+        label = f'<{name}>'
+        while True:
+            m = _CHILD_SPECIAL.search(content, pos)
+            if m is None:
+                raise _Problem(start, f"{label} が閉じていません")
+            i = m.start()
+            c = m.group()
+            if c == '{':
+                pos = self.js(i + 1, '}') + 1
+            elif c == '}':
+                raise _Problem(i, f"{label} の中のテキストに }} があります")
+            elif content.startswith('</', i):
+                m = NAME.match(content, i + 2)
+                close_name = m.group() if m else ''
+                close_end = SPACE.match(content, m.end() if m else i + 2).end()
+                if not content.startswith('>', close_end):
+                    raise _Problem(i, "閉じタグが読めません")
+                if close_name != name:
+                    raise _Problem(i, f"</{close_name}> が {self.line(start)} 行目の {label} と対応しません")
+                return close_end + 1
+            else:
+                try:
+                    pos = self.element(i)
+                except _NotTag:
+                    raise _Problem(i, f"{label} の中のテキストに < があります") from None
+
+
+def check(content, jsx=True):
+    """構文の崩れを探し、最初の1つを (行, 桁, メッセージ) で返す (無ければ None)
+
+    jsx=False (.ts など) では '<' を JSX とみなさない。
+    """
+    checker = _Checker(content, jsx)
+    try:
+        checker.js(0, None)
+    except _Problem as e:
+        line_start = content.rfind('\n', 0, e.pos) + 1
+        return checker.line(e.pos), e.pos - line_start + 1, e.message
+    except RecursionError:
+        return 1, 1, "入れ子が深すぎてチェックできません"
+    return None
+
+
+def checkable(filepath):
+    return str(filepath).endswith(EXTENSIONS)
+
+
+def is_jsx(filepath):
+    """filepath の中身を JSX を含むものとしてチェックするか (.ts / .mjs 以外)"""
+    return not str(filepath).endswith(PLAIN_EXTENSIONS)
+
+
+def check_file(filepath, data=None, jsx=None):
+    """ファイル (または data の内容) をチェックし、問題を (行, 桁, メッセージ) で返す (無ければ None)
+
+    jsx が None なら filepath の拡張子で決める (別名で置いた一時ファイルは元のパスで is_jsx を渡す)。
+    """
+    if data is None:
+        data = Path(filepath).read_bytes()
+    try:
+        content = data.decode('utf-8')
+    except UnicodeDecodeError:
+        return 1, 1, "UTF-8 として読めません"
+    if jsx is None:
+        jsx = is_jsx(filepath)
+    return check(content, jsx)
+
+
+def check_files(filepaths, jobs=None, jsx=None):
+    """ファイルをまとめてチェックし、(パス, 問題) のリストを同じ順番で返す
+
+    jsx はファイルごとのフラグのリスト (None なら各パスの拡張子で決める)。
+    合計が PARALLEL_MIN_BYTES 以上ならプロセスに分けて並列にチェックする (jobs は既定で CPU 数)。
+    """
+    filepaths = [str(path) for path in filepaths]
+    if jsx is None:
+        jsx = [is_jsx(path) for path in filepaths]
+    total = 0
+    for path in filepaths:
+        try:
+            total += Path(path).stat().st_size
+        except OSError:
+            pass
+    if len(filepaths) > 1 and total >= PARALLEL_MIN_BYTES and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            return list(zip(filepaths, executor.map(check_file, filepaths, [None] * len(filepaths), jsx)))
+    return [(path, check_file(path, jsx=flag)) for path, flag in zip(filepaths, jsx)]
+
+
+def format_problem(filepath, problem):
+    line, column, message = problem
+    return f"{filepath}:{line}:{column}: {message}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TSX / TS の括弧・JSX タグの対応をチェックする")
+    parser.add_argument('paths', nargs='+', help='チェックするファイル')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='並列に調べるプロセス数 (既定は CPU 数)')
+    args = parser.parse_args(argv)
+
+    results = check_files(args.paths, args.jobs)
+    failed = [(path, problem) for path, problem in results if problem is not None]
+    for path, problem in failed:
+        print(f"❌ {format_problem(path, problem)}")
+    if failed:
+        return 1
+    print(f"✅ {len(results)} ファイルに構文の崩れはありません")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
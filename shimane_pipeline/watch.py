@@ -0,0 +1,261 @@
+"""
+ウォッチモード: 保存されたファイルにだけパイプラインを適用し続ける常駐プロセス
+実行方法: python3 -m shimane_pipeline.watch [--stages customization,v2,v3] [--skip v2] [--poll] [--interval 0.2]
+
+保存のたびにパイプラインを実行し直すと、スクリプトの読み込み・パターンのコンパイル・
+バックアップ・全ファイルの索引作成が毎回かかる。ここでは起動時に1回だけ準備し、
+変換済みの内容と索引 (tsx.parse) をメモリに持ち続ける。保存された内容の索引は
+前の版から変わった範囲を含む要素の子だけを読み直して作る (tsx.reparse)。
+
+変更の通知は Linux では inotify (ctypes)、使えなければ mtime のポーリングで受け取る。
+終了は Ctrl+C。起動後に増えたトレーニングページは対象にならないので、起動し直すこと。
+"""
+
+import argparse
+import contextlib
+import ctypes
+import ctypes.util
+import io
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+from shimane_pipeline import diff, discover, tsx, validate
+from shimane_pipeline.backups import BackupStore
+from shimane_pipeline.fileio import atomic_write
+from shimane_pipeline.pipeline import add_stage_arguments, build_tasks, stages_from_args
+from shimane_pipeline.runner import decode
+
+# 最初の通知から、続けて届く通知 (エディタの一時ファイル・名前の変更など) をまとめて待つ秒数
+DEBOUNCE = 0.03
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_EVENT = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """inotify でファイルの変更を待つ (監視するのはファイルのあるディレクトリ)
+
+    エディタが一時ファイルを書いてから名前を変える保存も拾えるように、
+    書き込みの完了と名前の変更・作成の通知を受け取る。
+    """
+
+    def __init__(self, paths):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 に失敗しました')
+        self.paths = set(paths)
+        self.directories = {}
+        for directory in sorted({os.path.dirname(path) or '.' for path in paths}):
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f'{directory} を監視できません')
+            self.directories[wd] = directory
+
+    def wait(self, timeout=None):
+        """変更された対象ファイルのパスの集合を返す (timeout 秒で何も無ければ空)"""
+        changed = set()
+        while True:
+            ready, _, _ = select.select([self.fd], [], [], timeout)
+            if not ready:
+                return changed
+            data = os.read(self.fd, 64 * 1024)
+            pos = 0
+            while pos < len(data):
+                wd, _, _, length = _EVENT.unpack_from(data, pos)
+                pos += _EVENT.size
+                name = data[pos:pos + length].rstrip(b'\0').decode('utf-8', 'replace')
+                pos += length
+                directory = self.directories.get(wd)
+                path = name if directory == '.' else f'{directory}/{name}'
+                if path in self.paths:
+                    changed.add(path)
+            if changed:
+                timeout = DEBOUNCE
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """(サイズ, mtime) のポーリングでファイルの変更を待つ (inotify が使えない環境用)"""
+
+    def __init__(self, paths, interval=0.2):
+        self.interval = interval
+        self.stats = {path: self._stat(path) for path in paths}
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = set()
+            for path, previous in self.stats.items():
+                current = self._stat(path)
+                if current != previous:
+                    self.stats[path] = current
+                    changed.add(path)
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return changed
+            time.sleep(self.interval)
+
+    def close(self):
+        pass
+
+
+def watcher(paths, poll=False, interval=0.2):
+    """inotify の監視 (使えなければポーリング) を返す"""
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(paths, interval)
+
+
+def _lines(patch):
+    """スパンパッチの変わった行の範囲 (変更後の行番号、1始まり) の表示"""
+    start = patch[0][0] + 1
+    offset = sum(len(lines) - (span_end - span_start) for span_start, span_end, lines in patch[:-1])
+    end = patch[-1][0] + offset + len(patch[-1][2])
+    return f'{start} 行目' if end <= start else f'{start}〜{end} 行目'
+
+
+class Daemon:
+    """ファイルごとの変換と、最後に読んだ・書いた内容を持ち続ける"""
+
+    def __init__(self, tasks):
+        self.transforms = dict(tasks)
+        self.last = {}      # ファイルパス → 最後に読んだ・書いた内容 (bytes)
+
+    def update(self, filepath):
+        """保存された filepath に変換を適用して書き戻し、結果を1行で表示する"""
+        start = time.perf_counter()
+        try:
+            data = Path(filepath).read_bytes()
+        except OSError:
+            return
+        previous = self.last.get(filepath)
+        # 自分が書き戻した内容の通知・内容の変わらない保存は無視する
+        if data == previous:
+            return
+        self.last[filepath] = data
+        content = decode(data)
+        transform = self.transforms[filepath]
+        try:
+            # 変換中の進捗メッセージは出さない
+            with contextlib.redirect_stdout(io.StringIO()):
+                output = transform(content) if discover.may_change(transform, content) else content
+        except Exception as e:
+            # 編集途中で構文が崩れているときなどは書き戻さずに次の保存を待つ
+            print(f"❌ {filepath}: 変換できません ({e})")
+            return
+        label = filepath
+        if previous is not None:
+            patch = diff.span_patch(decode(previous), content)
+            if patch:
+                label += f' ({_lines(patch)}の変更)'
+        if output != content and validate.checkable(filepath):
+            # 変換で構文が崩れたら書き戻さない (保存された内容が既に崩れているときは書き戻す)
+            jsx = validate.is_jsx(filepath)
+            problem = validate.check(output, jsx)
+            if problem is not None and validate.check(content, jsx) is None:
+                print(f"❌ {validate.format_problem(filepath, problem)} (変換すると構文が崩れるので書き戻しません)",
+                      flush=True)
+                return
+        if output != content:
+            encoded = output.encode('utf-8')
+            atomic_write(filepath, encoded)
+            self.last[filepath] = encoded
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"🔁 {label}: 変換して書き戻しました ({elapsed:.1f}ms)", flush=True)
+        else:
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"✅ {label}: 変換の対象なし ({elapsed:.1f}ms)", flush=True)
+        # 次の保存に備えて、書き戻した内容の索引を作っておく
+        tsx.parse(output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="島根県大田市カスタマイズ - ウォッチモード")
+    add_stage_arguments(parser)
+    parser.add_argument(
+        '--poll',
+        action='store_true',
+        help='inotify を使わずに mtime のポーリングで変更を調べる',
+    )
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=0.2,
+        help='ポーリングの間隔 (秒、既定は 0.2)',
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        stages = stages_from_args(args)
+    except ValueError as e:
+        print(f"❌ エラー: {e}")
+        return 1
+    if not stages:
+        print("ℹ️  実行するステージがありません")
+        return 0
+
+    # カレントディレクトリの確認
+    if not os.path.exists('app/page.tsx'):
+        print("❌ エラー: app/page.tsx が見つかりません")
+        print("   プロジェクトのルートディレクトリで実行してください")
+        return 1
+
+    # スクリプトはリポジトリ直下にあるので、そこから import できるようにする
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+
+    print("=" * 60)
+    print("👀 島根県大田市カスタマイズ - ウォッチモード")
+    print("=" * 60)
+    print("🧩 ステージ: " + " → ".join(f"{stage.name} ({stage.description})" for stage in stages))
+
+    # スクリプトの読み込みとパターンのコンパイルはここで1回だけ
+    tasks = [(filepath, transform) for filepath, transform in build_tasks(stages) if os.path.exists(filepath)]
+
+    # 起動時に1回だけバックアップを作り、全ファイルを変換済みの状態にそろえる
+    print("💾 バックアップを作成中...")
+    snapshot_id = BackupStore().snapshot([filepath for filepath, _ in tasks], 'watch')
+    print(f"✅ バックアップ完了 ({snapshot_id})\n")
+    daemon = Daemon(tasks)
+    for filepath, _ in tasks:
+        daemon.update(filepath)
+
+    watch = watcher([filepath for filepath, _ in tasks], poll=args.poll, interval=args.interval)
+    kind = 'ポーリング' if isinstance(watch, PollingWatcher) else 'inotify'
+    print(f"\n👀 {len(tasks)} ファイルを監視中 ({kind})。終了は Ctrl+C\n", flush=True)
+    try:
+        while True:
+            for filepath in sorted(watch.wait()):
+                daemon.update(filepath)
+    except KeyboardInterrupt:
+        print("\n👋 ウォッチモードを終了しました")
+        print(f"   元に戻す: python3 -m shimane_pipeline.backups restore {snapshot_id}")
+    finally:
+        watch.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,4 @@
+"""
+記録データ (lib/types.ts の Record) を扱う集計ツール群
+Firestore / localStorage からエクスポートした記録を、ブラウザではなく Python でまとめて処理する
+"""
@@ -0,0 +1,9 @@
+"""
+python3 -m shimane_records で記録の一括評価を実行する
+"""
+
+import sys
+
+from shimane_records.evaluation import main
+
+sys.exit(main())
@@ -0,0 +1,208 @@
+"""
+記録のエクスポートを列 (array) に読み込む
+1件ずつの dict のまま持つと数百万件でメモリと時間がかかるので、Record のフィールドごとに
+配列にし、userId と mode は辞書 (番号 → 値) と番号の配列にする。
+
+    records = load('records.json')     # JSON の配列 / {"records": [...]} / 1行1件の JSON Lines
+    records.reaction_time[i], records.users[records.user[i]], records.modes[records.mode[i]]
+
+数値の省略可能なフィールド (accuracy, score, sleepHours) が無い記録は NaN になる。
+"""
+
+import contextlib
+import gc
+import json
+import math
+from array import array
+from operator import itemgetter
+
+# lib/types.ts の ModeType (エクスポートに他のモードがあれば後ろに追加する)
+MODES = ('simple', 'color', 'sprint', 'dual')
+
+MISSING = math.nan
+
+_OPTIONAL = (('accuracy', 'accuracy'), ('score', 'score'), ('sleep_hours', 'sleepHours'))
+
+
+def is_missing(value):
+    return value != value
+
+
+class RecordColumns:
+    """Record の列
+
+    id, created_at         list (str)
+    user                   array('I')  users の番号 (userId)
+    mode                   array('B')  modes の番号
+    reaction_time          array('d')  ミリ秒
+    accuracy, score, sleep_hours       array('d')  無ければ NaN
+    users, user_names      userId と、その最後の記録の userName (番号順)
+    modes                  モード名 (番号順、MODES が先頭)
+    """
+
+    def __init__(self):
+        self.id = []
+        self.created_at = []
+        self.user = array('I')
+        self.mode = array('B')
+        self.reaction_time = array('d')
+        self.accuracy = array('d')
+        self.score = array('d')
+        self.sleep_hours = array('d')
+        self.users = []
+        self.user_names = []
+        self.modes = list(MODES)
+
+    def __len__(self):
+        return len(self.reaction_time)
+
+    def record(self, i):
+        """i 番目の記録を Record と同じ形の dict に戻す"""
+        record = {
+            'id': self.id[i],
+            'userId': self.users[self.user[i]],
+            'userName': self.user_names[self.user[i]],
+            'mode': self.modes[self.mode[i]],
+            'reactionTime': json_number(self.reaction_time[i]),
+        }
+        for attr, key in _OPTIONAL:
+            value = getattr(self, attr)[i]
+            if not is_missing(value):
+                record[key] = json_number(value)
+        record['createdAt'] = self.created_at[i]
+        return record
+
+
+def json_number(value):
+    """整数の値は int で返す (JSON で 123.0 ではなく 123 と書く)"""
+    return int(value) if value.is_integer() else value
+
+
+def _floats(rows, key, optional):
+    """rows の key の値の array('d') (optional なら無い・null を NaN にする)"""
+    try:
+        if not optional:
+            return array('d', map(itemgetter(key), rows))
+        values = [row.get(key, MISSING) for row in rows]
+        try:
+            return array('d', values)
+        except TypeError:
+            # null は無いのと同じ
+            return array('d', [MISSING if value is None else value for value in values])
+    except (TypeError, KeyError):
+        pass
+    # 文字列などが混ざっているときだけ1件ずつ見て、どの記録かを知らせる
+    values = array('d')
+    for i, row in enumerate(rows):
+        value = row.get(key)
+        if value is None and optional:
+            value = MISSING
+        elif isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{i + 1} 件目の {key} が数値ではありません: {value!r}")
+        values.append(value)
+    return values
+
+
+def from_rows(rows):
+    """Record の dict のリストから列を作る"""
+    columns = RecordColumns()
+    try:
+        user_ids = list(map(itemgetter('userId'), rows))
+        mode_names = list(map(itemgetter('mode'), rows))
+    except KeyError as e:
+        raise ValueError(f"userId / mode の無い記録があります ({e})") from None
+    except TypeError:
+        raise ValueError("記録 (オブジェクト) ではない要素があります") from None
+
+    codes = {}
+    columns.user = array('I', [codes.setdefault(user_id, len(codes)) for user_id in user_ids])
+    columns.users = list(codes)
+    names = dict(zip(user_ids, [row.get('userName', '') for row in rows]))
+    columns.user_names = [names[user_id] for user_id in columns.users]
+
+    mode_codes = {name: code for code, name in enumerate(MODES)}
+    for name in dict.fromkeys(mode_names):
+        if name not in mode_codes:
+            mode_codes[name] = len(mode_codes)
+    if len(mode_codes) > 256:
+        raise ValueError("モードの種類が多すぎます")
+    columns.modes = list(mode_codes)
+    columns.mode = array('B', [mode_codes[name] for name in mode_names])
+
+    columns.reaction_time = _floats(rows, 'reactionTime', optional=False)
+    for attr, key in _OPTIONAL:
+        setattr(columns, attr, _floats(rows, key, optional=True))
+    columns.id = [row.get('id', '') for row in rows]
+    columns.created_at = [row.get('createdAt', '') for row in rows]
+    return columns
+
+
+def iter_rows(path):
+    """エクスポートの記録を1件ずつ返す (.jsonl / .ndjson は1行ずつ読むので全体をメモリに置かない)
+
+    .shrec (store.py の列形式ストア) も読める。
+    """
+    from shimane_records import store
+    if store.is_store(path):
+        with store.RecordStore(path) as records:
+            yield from records.records()
+    elif str(path).endswith(('.jsonl', '.ndjson')):
+        with open(path, encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{number}: JSON として読めません ({e})") from None
+    else:
+        yield from read_rows(path)
+
+
+def read_rows(path):
+    """エクスポートのファイルから Record の dict のリストを読む"""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    try:
+        with _gc_paused():
+            data = json.loads(text)
+    except json.JSONDecodeError:
+        # JSON Lines (1行1件)
+        try:
+            return [json.loads(line) for line in text.splitlines() if line.strip()]
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{path}: JSON として読めません ({e})") from None
+    if isinstance(data, dict):
+        if isinstance(data.get('records'), list):
+            return data['records']
+        # 1件だけの JSON Lines
+        return [data]
+    if not isinstance(data, list):
+        raise ValueError(f"{path}: 記録の配列ではありません")
+    return data
+
+
+@contextlib.contextmanager
+def _gc_paused():
+    """数百万件の dict を作る間は循環参照の GC を止める (作るたびに全体を走査して遅くなる)"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def load(path, fields=None):
+    """エクスポートのファイルを列に読み込む
+
+    .shrec (store.py の列形式ストア) は JSON を経由せずに列をそのまま読む。fields を渡すと
+    その列だけを読み、他の列は空のまま (JSON は全体を読むので fields は使わない)。
+    """
+    from shimane_records import store
+    if store.is_store(path):
+        with store.RecordStore(path) as records:
+            return records.to_columns(fields)
+    with _gc_paused():
+        return from_rows(read_rows(path))
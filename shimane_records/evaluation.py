@@ -0,0 +1,253 @@
+"""
+lib/evaluation.ts の評価ロジックを記録のエクスポート全体にまとめて適用する
+実行方法: python3 -m shimane_records records.json [--by user|mode] [--format csv|json] [-o 出力先]
+
+ブラウザの calculateStats は1人分の記録を Math.min(...times) で集計するので、
+記録が多いと引数の数の上限で失敗する。ここでは記録を列に読み込み (columns.py)、
+(userId, mode) ごとに並べ替えてまとめて集計する。評価の段階 (超人級! など) は
+if の連鎖ではなく、しきい値の昇順の配列を bisect で引く。
+
+    --by user   userId × mode ごとの統計と評価 (既定)
+    --by mode   mode ごとの統計と、1件ずつの評価の段階ごとの件数
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+from bisect import bisect_left, bisect_right
+from itertools import repeat
+from operator import mul, sub
+
+from shimane_records import columns as records_columns
+
+
+def _result(emoji, label, message, sprint_impact):
+    return {'emoji': emoji, 'label': label, 'message': message, 'sprintImpact': sprint_impact}
+
+
+# evaluateReactionTime: reactionTime <= しきい値 の最初の段階 (どれでもなければ最後)
+REACTION_THRESHOLDS = (150, 200, 250, 300)
+REACTION_RESULTS = (
+    _result('⚡', '超人級!', 'オリンピック選手レベルの反応速度です!', 'スタートダッシュで大きなアドバンテージ!'),
+    _result('🔥', '素晴らしい!', 'トップアスリート並みの反応です!', '理想的なスタート反応時間です'),
+    _result('👍', '良い!', '良好な反応速度です。この調子!', 'さらに磨けば0.1秒速くなります'),
+    _result('💪', '練習中!', '練習で必ず速くなります!', '反応を0.05秒改善すれば50m走が速くなる'),
+    _result('🌱', 'これから!', 'まずは集中力を高めましょう!', 'リラックスして練習を重ねよう'),
+)
+
+# evaluateDualTaskScore: score >= しきい値 の最も高い段階 (低い順に並べる)
+DUAL_THRESHOLDS = (40, 60, 80)
+DUAL_RESULTS = (
+    _result('🌱', 'チャレンジャー!', '継続練習で必ず上達します!', 'まずは単一課題から慣れていこう'),
+    _result('💪', '成長中!', 'マルチタスク能力を鍛えましょう!', '一つずつ確実に、そして複合的に'),
+    _result('🎯', 'バランス良好!', '二重課題をうまくこなしています!', 'ピッチとフォーム、両方を意識できる'),
+    _result('🧠', 'マルチタスクマスター!', '認知的負荷下でも完璧な判断力!', '複雑な状況でも冷静な判断ができる'),
+)
+
+# calculateStats の consistency: stdDev < しきい値 の最初の段階
+CONSISTENCY_THRESHOLDS = (20, 40)
+CONSISTENCY_LABELS = ('安定', '普通', '不安定')
+
+IDEAL_REACTION_TIME = 150   # ms (calculateSprintImpact)
+
+# 集計に使う列 (.shrec からはこの列だけを読む)
+FIELDS = ('user', 'user_name', 'mode', 'reaction_time', 'score')
+
+
+def js_round(value):
+    """JavaScript の Math.round (.5 は大きい方へ丸める)"""
+    return math.floor(value + 0.5)
+
+
+def reaction_level(reaction_time):
+    """REACTION_RESULTS の番号 (NaN は比較がすべて偽になるので最後の段階)"""
+    if reaction_time != reaction_time:
+        return len(REACTION_THRESHOLDS)
+    return bisect_left(REACTION_THRESHOLDS, reaction_time)
+
+
+def dual_level(score):
+    """DUAL_RESULTS の番号 (NaN は最初の段階)"""
+    if score != score:
+        return 0
+    return bisect_right(DUAL_THRESHOLDS, score)
+
+
+def evaluate_reaction_time(reaction_time):
+    """evaluateReactionTime"""
+    return REACTION_RESULTS[reaction_level(reaction_time)]
+
+
+def evaluate_dual_task_score(score):
+    """evaluateDualTaskScore"""
+    return DUAL_RESULTS[dual_level(score)]
+
+
+def calculate_sprint_impact(reaction_time):
+    """calculateSprintImpact (秒、小数第3位まで)"""
+    start_advantage = reaction_time / 1000
+    improvement_potential = max(0, (reaction_time - IDEAL_REACTION_TIME) / 1000)
+    return {
+        'startAdvantage': js_round(start_advantage * 1000) / 1000,
+        'improvementPotential': js_round(improvement_potential * 1000) / 1000,
+    }
+
+
+def calculate_stats(times):
+    """calculateStats (times が空なら None)
+
+    min / max は引数を展開しないので、件数に上限は無い。
+    """
+    if not times:
+        return None
+    average = math.fsum(times) / len(times)
+    # 偏差の2乗の和 (ループを map で C 側に任せる)
+    deviations = list(map(sub, times, repeat(average, len(times))))
+    variance = math.fsum(map(mul, deviations, deviations)) / len(times)
+    std_dev = math.sqrt(variance)
+    return {
+        'average': js_round(average),
+        'fastest': records_columns.json_number(float(min(times))),
+        'slowest': records_columns.json_number(float(max(times))),
+        'stdDev': js_round(std_dev),
+        'consistency': CONSISTENCY_LABELS[bisect_right(CONSISTENCY_THRESHOLDS, std_dev)],
+    }
+
+
+def level_counts(sorted_values, thresholds, side=bisect_left):
+    """昇順に並んだ値を、しきい値で区切った段階ごとの件数にする (段階の数 = しきい値の数 + 1)"""
+    bounds = [0] + [side(sorted_values, threshold) for threshold in thresholds] + [len(sorted_values)]
+    return [bounds[k + 1] - bounds[k] for k in range(len(bounds) - 1)]
+
+
+def _groups(keys):
+    """keys の値ごとに、(キー, 記録の番号のリスト) をキーの順に返す"""
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    sorted_keys = list(map(keys.__getitem__, order))
+    start = 0
+    while start < len(order):
+        key = sorted_keys[start]
+        end = bisect_right(sorted_keys, key, start)
+        yield key, order[start:end]
+        start = end
+
+
+def _mean_score(scores):
+    present = [score for score in scores if score == score]
+    return math.fsum(present) / len(present) if present else None
+
+
+def user_mode_stats(records):
+    """userId × mode ごとの統計と評価の行 (userId の登場順、同じ人はモードの順)
+
+    評価はアプリと同じく平均 (四捨五入後) の反応時間で決める。dual の行には平均スコアの
+    evaluateDualTaskScore も付ける。
+    """
+    n_modes = len(records.modes)
+    keys = [user * n_modes + mode for user, mode in zip(records.user, records.mode)]
+    reaction_time = records.reaction_time
+    score = records.score
+    rows = []
+    for key, indexes in _groups(keys):
+        user, mode = divmod(key, n_modes)
+        stats = calculate_stats(list(map(reaction_time.__getitem__, indexes)))
+        evaluation = evaluate_reaction_time(stats['average'])
+        row = {
+            'userId': records.users[user],
+            'userName': records.user_names[user],
+            'mode': records.modes[mode],
+            'count': len(indexes),
+            **stats,
+            'emoji': evaluation['emoji'],
+            'label': evaluation['label'],
+            'dualLabel': '',
+        }
+        if records.modes[mode] == 'dual':
+            mean = _mean_score(list(map(score.__getitem__, indexes)))
+            if mean is not None:
+                row['dualLabel'] = evaluate_dual_task_score(mean)['label']
+        rows.append(row)
+    return rows
+
+
+def mode_stats(records):
+    """mode ごとの統計と、1件ずつの反応時間 (dual はスコアも) の評価の段階ごとの件数"""
+    reaction_time = records.reaction_time
+    score = records.score
+    rows = []
+    for mode, indexes in _groups(records.mode):
+        times = sorted(map(reaction_time.__getitem__, indexes))
+        row = {
+            'mode': records.modes[mode],
+            'count': len(indexes),
+            'users': len({records.user[i] for i in indexes}),
+            **calculate_stats(times),
+        }
+        # 段階の境界は「以下」なので bisect_right (150 ちょうどは 超人級!)
+        for result, count in zip(REACTION_RESULTS, level_counts(times, REACTION_THRESHOLDS, bisect_right)):
+            row[result['label']] = count
+        if records.modes[mode] == 'dual':
+            scores = sorted(s for s in map(score.__getitem__, indexes) if s == s)
+            for result, count in zip(DUAL_RESULTS, level_counts(scores, DUAL_THRESHOLDS)):
+                row[result['label']] = count
+        rows.append(row)
+    return rows
+
+
+def write_rows(rows, out, fmt):
+    if fmt == 'json':
+        json.dump(rows, out, ensure_ascii=False, indent=2)
+        out.write('\n')
+        return
+    fields = {}
+    for row in rows:
+        fields.update(dict.fromkeys(row))
+    writer = csv.DictWriter(out, fieldnames=fields, restval='', lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="島根県大田市カスタマイズ - 記録の一括評価")
+    parser.add_argument('export', help='記録のエクスポート (JSON の配列 / JSON Lines / .shrec)')
+    parser.add_argument('--by', choices=('user', 'mode'), default='user',
+                        help='集計の単位 (user: userId × mode、mode: モードごと)')
+    parser.add_argument('--format', choices=('csv', 'json'), default='csv', help='出力形式 (既定は csv)')
+    parser.add_argument('-o', '--output', help='出力先 (省略時は標準出力)')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        records = records_columns.load(args.export, fields=FIELDS)
+    except (OSError, ValueError) as e:
+        print(f"❌ エラー: {e}", file=sys.stderr)
+        return 1
+    loaded = time.perf_counter()
+    rows = user_mode_stats(records) if args.by == 'user' else mode_stats(records)
+    done = time.perf_counter()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            write_rows(rows, f, args.format)
+    else:
+        try:
+            write_rows(rows, sys.stdout, args.format)
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # 読み手 (| head など) が先に閉じた: 残りは捨て、終了時の flush でも失敗しないようにする
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 1
+    # 進捗は標準エラーへ (標準出力は結果だけ)
+    print(
+        f"✅ {len(records)} 件 → {len(rows)} 行 (読み込み {loaded - start:.2f}s, 集計 {done - loaded:.2f}s)",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
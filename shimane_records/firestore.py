@@ -0,0 +1,533 @@
+"""
+lib/firestore.ts が使う Firestore の機能だけを持つ、ローカルの代わりのサービス
+実行方法: python3 -m shimane_records.firestore {import,get,query,bench} ...
+
+lib/firestore.ts の関数はすべて本物の Firestore に問い合わせるので、ネットワークなしでは
+クエリの重さを測れない。ここではコレクション → ドキュメント (dict) をメモリに持ち、
+setDoc / getDoc / where('==') / orderBy と同じ結果を返しながら、関数ごとの読み取り数・
+調べたドキュメント数・時間を記録する。
+
+    import records.json [--users users.json]     エクスポートを --dir に取り込む
+    get users <id>                               ドキュメントを1件
+    query records --where userId==u1 [--order-by reactionTime] [--limit 50]
+    bench records.json [-n 1000] [--seed 0] [--no-index]
+                                                 lib/firestore.ts の関数を決まった順で呼び、コストを表示する
+
+Firestore と同じ決まり:
+    - where は '==' だけ。フィールドが無いドキュメントは一致しない。1 と 1.0 は同じ、true と 1 は違う
+    - orderBy のフィールドが無いドキュメントは結果に入らない
+    - 値の順は null < 真偽値 < 数値 (NaN が先頭) < 文字列 < 配列 < マップ、同じならドキュメント ID の順
+    - 読み取り数は返したドキュメントの数 (0 件でも 1)
+
+索引 (既定は records の userId と mode) があるフィールドの where は、そのフィールドの値が
+一致するドキュメントだけを調べる。無ければコレクション全体を調べる。
+
+--dir を付けると保存する (index.py と同じく checkpoint.pickle と追加ログ log-<世代>.jsonl)。
+"""
+
+import argparse
+import json
+import os
+import pickle
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from shimane_pipeline.fileio import atomic_write
+from shimane_records.columns import iter_rows
+
+DEFAULT_DIR = Path('.shimane_cache') / 'firestore'
+
+STORE_VERSION = 1
+
+# 追加ログがこの件数を超えたらチェックポイントを書く
+CHECKPOINT_EVERY = 10000
+
+# lib/firestore.ts の COLLECTIONS
+USERS = 'users'
+RECORDS = 'records'
+SESSIONS = 'sessions'
+
+DEFAULT_INDEXES = {RECORDS: ('userId', 'mode')}
+
+DEFAULT_SESSION_ID = 'default-session'
+DEFAULT_SESSION_NAME = '島根県大田市 × 日本体育大学 特別講座'
+
+_BASE36 = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def value_key(value):
+    """比較・索引に使うキー (Firestore の値の順に並ぶ)"""
+    if value is None:
+        return (0,)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, 0, 0) if value != value else (2, 1, value)
+    if isinstance(value, str):
+        return (4, value)
+    if isinstance(value, (list, tuple)):
+        return (8, tuple(map(value_key, value)))
+    if isinstance(value, dict):
+        return (9, tuple(sorted((k, value_key(v)) for k, v in value.items())))
+    raise ValueError(f"Firestore に保存できない値です: {value!r}")
+
+
+class Cost:
+    """1つの関数 (ラベル) のコストの合計"""
+
+    def __init__(self):
+        self.calls = 0
+        self.reads = 0          # 課金される読み取り (返したドキュメント数、クエリは最低 1)
+        self.writes = 0
+        self.scanned = 0        # 調べたドキュメント数 (索引を使えば一致する候補だけ)
+        self.seconds = 0.0
+
+
+class Firestore:
+    """コレクション → ドキュメント ID → データ (dict) と、フィールドごとの索引
+
+    root を渡すと open() で読み込み、書き込みを追加ログに残す。root が None ならメモリだけ。
+    """
+
+    def __init__(self, root=None, indexes=DEFAULT_INDEXES, checkpoint_every=CHECKPOINT_EVERY, fsync=True):
+        self.root = Path(root) if root is not None else None
+        self.indexed = {name: tuple(fields) for name, fields in indexes.items()}
+        self.checkpoint_every = checkpoint_every
+        self.fsync = fsync
+        self.collections = {}   # コレクション → {ID: データ}
+        self.indexes = {}       # (コレクション, フィールド) → {value_key: {ID: None}}
+        self.profile = {}       # ラベル → Cost
+        self.generation = 0
+        self.logged = 0
+        self._log = None
+        self._reindex()
+
+    # ---------------------------------------------------------------
+    # 保存・読み込み
+    # ---------------------------------------------------------------
+    @property
+    def checkpoint_path(self):
+        return self.root / 'checkpoint.pickle'
+
+    def _log_path(self):
+        return self.root / f'log-{self.generation}.jsonl'
+
+    def open(self):
+        """チェックポイントを読み、追加ログを再生する (メモリだけなら何もしない)"""
+        if self.root is None:
+            return self
+        self.root.mkdir(parents=True, exist_ok=True)
+        if self.checkpoint_path.exists():
+            with open(self.checkpoint_path, 'rb') as f:
+                try:
+                    state = pickle.load(f)
+                except (pickle.UnpicklingError, AttributeError, ImportError, EOFError) as e:
+                    raise ValueError(f"{self.checkpoint_path}: 読み込めません ({e})") from None
+            if not isinstance(state, dict) or state.get('version') != STORE_VERSION:
+                raise ValueError(f"{self.checkpoint_path}: 形式が違います")
+            self.generation = state['generation']
+            self.collections = state['collections']
+        self._reindex()
+        self._replay()
+        for path in self.root.glob('log-*.jsonl'):
+            if path != self._log_path():
+                path.unlink()
+        self._log = open(self._log_path(), 'a', encoding='utf-8')
+        return self
+
+    def _replay(self):
+        path = self._log_path()
+        if not path.exists():
+            return
+        good = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    op, collection, doc_id, data = json.loads(line)
+                except (json.JSONDecodeError, ValueError) as e:
+                    raise ValueError(f"{path}: 追加ログが壊れています ({e})") from None
+                if op == 'set':
+                    self._put(collection, doc_id, data)
+                else:
+                    self._remove(collection, doc_id)
+                good += len(line)
+                self.logged += 1
+        if good != path.stat().st_size:
+            os.truncate(path, good)
+
+    def checkpoint(self):
+        """全ドキュメントをチェックポイントに書き、追加ログを空にする (索引は読み込み時に作り直す)"""
+        if self.root is None:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        old_log = self._log_path()
+        state = {'version': STORE_VERSION, 'generation': self.generation + 1, 'collections': self.collections}
+        atomic_write(self.checkpoint_path, pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+        self.generation += 1
+        self.logged = 0
+        if self._log is not None:
+            self._log.close()
+            self._log = open(self._log_path(), 'a', encoding='utf-8')
+        old_log.unlink(missing_ok=True)
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write_log(self, entries):
+        if self.root is None:
+            return
+        if self._log is None:
+            raise ValueError("open() してから書き込んでください")
+        self._log.write(''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries))
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+        self.logged += len(entries)
+
+    def _maybe_checkpoint(self):
+        # 反映した後に呼ぶ (チェックポイントに追加ログの分が含まれるように)
+        if self.root is not None and self.logged >= self.checkpoint_every:
+            self.checkpoint()
+
+    # ---------------------------------------------------------------
+    # 索引
+    # ---------------------------------------------------------------
+    def _reindex(self):
+        self.indexes = {}
+        for collection, fields in self.indexed.items():
+            for field in fields:
+                self.indexes[(collection, field)] = {}
+            for doc_id, data in self.collections.get(collection, {}).items():
+                self._index(collection, doc_id, data)
+
+    def _index(self, collection, doc_id, data):
+        for field in self.indexed.get(collection, ()):
+            if field in data:
+                self.indexes[(collection, field)].setdefault(value_key(data[field]), {})[doc_id] = None
+
+    def _unindex(self, collection, doc_id, data):
+        for field in self.indexed.get(collection, ()):
+            if field in data:
+                index = self.indexes[(collection, field)]
+                key = value_key(data[field])
+                members = index[key]
+                del members[doc_id]
+                if not members:
+                    del index[key]
+
+    def _put(self, collection, doc_id, data):
+        docs = self.collections.setdefault(collection, {})
+        old = docs.get(doc_id)
+        if old is not None:
+            self._unindex(collection, doc_id, old)
+        docs[doc_id] = data
+        self._index(collection, doc_id, data)
+
+    def _remove(self, collection, doc_id):
+        old = self.collections.get(collection, {}).pop(doc_id, None)
+        if old is not None:
+            self._unindex(collection, doc_id, old)
+
+    # ---------------------------------------------------------------
+    # 読み書き
+    # ---------------------------------------------------------------
+    def _charge(self, label, start, reads=0, writes=0, scanned=0):
+        cost = self.profile.get(label)
+        if cost is None:
+            cost = self.profile[label] = Cost()
+        cost.calls += 1
+        cost.reads += reads
+        cost.writes += writes
+        cost.scanned += scanned
+        cost.seconds += time.perf_counter() - start
+
+    @staticmethod
+    def _check(collection, doc_id, data):
+        if not isinstance(doc_id, str) or not doc_id or '/' in doc_id:
+            raise ValueError(f"{collection}: ドキュメント ID が不正です: {doc_id!r}")
+        if not isinstance(data, dict):
+            raise ValueError(f"{collection}/{doc_id}: データはオブジェクトにしてください")
+        for value in data.values():
+            value_key(value)
+
+    def get(self, collection, doc_id, label=None):
+        """getDoc (無ければ None)"""
+        start = time.perf_counter()
+        data = self.collections.get(collection, {}).get(doc_id)
+        self._charge(label or f'get {collection}', start, reads=1, scanned=1)
+        return None if data is None else dict(data)
+
+    def set(self, collection, doc_id, data, label=None):
+        """setDoc (ドキュメントを丸ごと置き換える)"""
+        self.set_many(collection, [(doc_id, data)], label or f'set {collection}')
+
+    def set_many(self, collection, docs, label=None):
+        """(ID, データ) をまとめて書き込み、件数を返す (追加ログへの書き込みは1回)"""
+        start = time.perf_counter()
+        docs = [(doc_id, dict(data)) for doc_id, data in docs]
+        for doc_id, data in docs:
+            self._check(collection, doc_id, data)
+        self._write_log([('set', collection, doc_id, data) for doc_id, data in docs])
+        for doc_id, data in docs:
+            self._put(collection, doc_id, data)
+        self._maybe_checkpoint()
+        self._charge(label or f'set {collection}', start, writes=len(docs))
+        return len(docs)
+
+    def delete(self, collection, doc_id, label=None):
+        """deleteDoc"""
+        start = time.perf_counter()
+        self._write_log([('delete', collection, doc_id, None)])
+        self._remove(collection, doc_id)
+        self._maybe_checkpoint()
+        self._charge(label or f'delete {collection}', start, writes=1)
+
+    def query(self, collection, where=(), order_by=(), limit=None, label=None):
+        """getDocs(query(collection, where(...), orderBy(...))) のドキュメントのリスト
+
+        where は (フィールド, '==', 値)、order_by は (フィールド, 'asc' | 'desc') のリスト。
+        """
+        start = time.perf_counter()
+        docs = self.collections.get(collection, {})
+        filters = []
+        for field, op, value in where:
+            if op != '==':
+                raise ValueError(f"where は '==' だけに対応しています: {op!r}")
+            filters.append((field, value_key(value)))
+        for field, direction in order_by:
+            if direction not in ('asc', 'desc'):
+                raise ValueError(f"orderBy の向きは 'asc' か 'desc' です: {direction!r}")
+
+        # 索引のあるフィールドのうち、一致する候補が一番少ないものを使う。
+        # 他の索引のあるフィールドは索引に含まれるかで、索引の無いフィールドは値で確かめる
+        candidates = docs
+        members_of = []
+        checks = []
+        for field, key in filters:
+            index = self.indexes.get((collection, field))
+            if index is None:
+                checks.append((field, key))
+                continue
+            members = index.get(key, {})
+            members_of.append(members)
+            if candidates is docs or len(members) < len(candidates):
+                candidates = members
+        scanned = len(candidates)
+        members_of = [members for members in members_of if members is not candidates]
+        matched = [
+            doc_id for doc_id in candidates
+            if all(doc_id in members for members in members_of)
+            and all(field in docs[doc_id] and value_key(docs[doc_id][field]) == key for field, key in checks)
+        ]
+
+        # 同じ値はドキュメント ID の順 (向きは最後の orderBy に合わせる)
+        descending = bool(order_by) and order_by[-1][1] == 'desc'
+        fields = [field for field, _ in order_by]
+        if fields:
+            matched = [doc_id for doc_id in matched if all(field in docs[doc_id] for field in fields)]
+        if len({direction for _, direction in order_by}) <= 1:
+            # 向きが揃っていれば (値..., ID) で1回だけ並べ替える
+            matched.sort(key=lambda doc_id: (*[value_key(docs[doc_id][field]) for field in fields], doc_id),
+                         reverse=descending)
+        else:
+            matched.sort(reverse=descending)
+            for field, direction in reversed(order_by):
+                matched.sort(key=lambda doc_id: value_key(docs[doc_id][field]), reverse=direction == 'desc')
+        if limit is not None:
+            matched = matched[:limit]
+        results = [dict(docs[doc_id]) for doc_id in matched]
+        self._charge(label or f'query {collection}', start, reads=max(1, len(results)), scanned=scanned)
+        return results
+
+
+# -------------------------------------------------------------------
+# lib/firestore.ts の関数
+# -------------------------------------------------------------------
+def iso_now(ms):
+    """new Date().toISOString()"""
+    return datetime.fromtimestamp(ms // 1000, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S') + f'.{ms % 1000:03d}Z'
+
+
+def get_user(db, user_id):
+    return db.get(USERS, user_id, label='getUser')
+
+
+def save_user(db, user):
+    db.set(USERS, user['id'], user, label='saveUser')
+
+
+def get_records(db):
+    return db.query(RECORDS, label='getRecords')
+
+
+def add_record(db, record, now_ms=None, rng=random):
+    """addRecord (id は `${Date.now()}-<base36 9文字>`、createdAt は今の時刻)
+
+    now_ms と rng を渡すと、同じ id と createdAt を作り直せる。
+    """
+    if now_ms is None:
+        now_ms = time.time_ns() // 1_000_000
+    new_record = {
+        **record,
+        'id': f"{now_ms}-{''.join(rng.choice(_BASE36) for _ in range(9))}",
+        'createdAt': iso_now(now_ms),
+    }
+    db.set(RECORDS, new_record['id'], new_record, label='addRecord')
+    return new_record
+
+
+def get_records_by_user(db, user_id):
+    return db.query(RECORDS, where=[('userId', '==', user_id)], label='getRecordsByUser')
+
+
+def get_records_by_mode(db, mode):
+    return db.query(RECORDS, where=[('mode', '==', mode)], order_by=[('reactionTime', 'asc')],
+                    label='getRecordsByMode')
+
+
+def get_current_session(db, now_ms=None):
+    """getCurrentSession (無ければ既定のセッションを保存して返す)"""
+    session = db.get(SESSIONS, DEFAULT_SESSION_ID, label='getCurrentSession')
+    if session is not None:
+        return session
+    if now_ms is None:
+        now_ms = time.time_ns() // 1_000_000
+    session = {'id': DEFAULT_SESSION_ID, 'name': DEFAULT_SESSION_NAME, 'date': iso_now(now_ms).split('T')[0]}
+    db.set(SESSIONS, DEFAULT_SESSION_ID, session, label='getCurrentSession')
+    return session
+
+
+def set_session(db, session):
+    db.set(SESSIONS, session['id'], session, label='setSession')
+
+
+def import_export(db, records, users=None):
+    """エクスポートの記録 (と User) を id をドキュメント ID にして書き込み、(記録, ユーザー) の件数を返す"""
+    def docs(path, what):
+        for number, row in enumerate(iter_rows(path), 1):
+            if not isinstance(row, dict) or not isinstance(row.get('id'), str):
+                raise ValueError(f"{path}: {number} 件目の{what}に id がありません")
+            yield row['id'], row
+    count = db.set_many(RECORDS, docs(records, '記録'), label='import')
+    user_count = db.set_many(USERS, docs(users, 'ユーザー'), label='import') if users else 0
+    return count, user_count
+
+
+# -------------------------------------------------------------------
+# ベンチマーク
+# -------------------------------------------------------------------
+def bench(db, queries, seed=0):
+    """lib/firestore.ts の関数を、seed で決まる順に queries 回呼ぶ (ページの読み込みに近い割合)"""
+    rng = random.Random(seed)
+    user_ids = sorted({data['userId'] for data in db.collections.get(RECORDS, {}).values()
+                       if isinstance(data.get('userId'), str)})
+    modes = ('simple', 'color', 'sprint', 'dual')
+    now_ms = 1_700_000_000_000
+    for _ in range(queries):
+        user_id = rng.choice(user_ids) if user_ids else 'nobody'
+        choice = rng.random()
+        if choice < 0.3:
+            get_records_by_user(db, user_id)
+        elif choice < 0.5:
+            get_records_by_mode(db, rng.choice(modes))
+        elif choice < 0.7:
+            now_ms += rng.randrange(1, 5000)
+            add_record(db, {'userId': user_id, 'userName': user_id, 'mode': rng.choice(modes),
+                            'reactionTime': rng.randrange(120, 600)}, now_ms, rng)
+        elif choice < 0.9:
+            get_user(db, user_id)
+        else:
+            get_current_session(db, now_ms)
+
+
+def print_profile(profile, file=sys.stdout):
+    print(f"{'関数':<20} {'回数':>7} {'読み取り':>10} {'書き込み':>8} {'調べた数':>12} {'平均':>10}", file=file)
+    for label, cost in sorted(profile.items()):
+        print(f"{label:<20} {cost.calls:>7} {cost.reads:>10} {cost.writes:>8} {cost.scanned:>12}"
+              f" {cost.seconds / cost.calls * 1000:>8.3f}ms", file=file)
+
+
+def _parse_where(text):
+    field, sep, value = text.partition('==')
+    if not sep or not field:
+        raise ValueError(f"--where は フィールド==値 の形にしてください: {text!r}")
+    try:
+        return field, '==', json.loads(value)
+    except json.JSONDecodeError:
+        return field, '==', value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="島根県大田市カスタマイズ - ローカルの Firestore の代わり")
+    parser.add_argument('--dir', default=str(DEFAULT_DIR), help=f'保存先 (既定は {DEFAULT_DIR})')
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('import', help='エクスポートを取り込む')
+    command.add_argument('records')
+    command.add_argument('--users', help='ユーザーのエクスポート')
+    command = commands.add_parser('get', help='ドキュメントを1件表示する')
+    command.add_argument('collection')
+    command.add_argument('doc_id')
+    command = commands.add_parser('query', help='クエリの結果を JSON Lines で表示する')
+    command.add_argument('collection')
+    command.add_argument('--where', action='append', default=[], help='フィールド==値 (値は JSON、読めなければ文字列)')
+    command.add_argument('--order-by', action='append', default=[], help='フィールド または フィールド:desc')
+    command.add_argument('--limit', type=int)
+    command = commands.add_parser('bench', help='lib/firestore.ts の関数のコストを測る (メモリだけで実行)')
+    command.add_argument('records')
+    command.add_argument('--users', help='ユーザーのエクスポート')
+    command.add_argument('-n', '--queries', type=int, default=1000, help='呼び出しの回数 (既定は 1000)')
+    command.add_argument('--seed', type=int, default=0)
+    command.add_argument('--no-index', action='store_true', help='userId / mode の索引を使わない')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        if args.command == 'bench':
+            db = Firestore(indexes={} if args.no_index else DEFAULT_INDEXES).open()
+            count, _ = import_export(db, args.records, args.users)
+            print(f"📦 {count} 件を読み込みました {time.perf_counter() - start:.2f}s")
+            db.profile.clear()
+            bench(db, args.queries, args.seed)
+            print_profile(db.profile)
+            return 0
+        with Firestore(args.dir) as db:
+            if args.command == 'import':
+                count, user_count = import_export(db, args.records, args.users)
+                db.checkpoint()
+                print(f"✅ 記録 {count} 件、ユーザー {user_count} 人を {args.dir}/ に取り込みました"
+                      f" {time.perf_counter() - start:.2f}s")
+            elif args.command == 'get':
+                data = db.get(args.collection, args.doc_id)
+                if data is None:
+                    print(f"ℹ️  {args.collection}/{args.doc_id} はありません")
+                    return 1
+                print(json.dumps(data, ensure_ascii=False, indent=2))
+            elif args.command == 'query':
+                where = [_parse_where(text) for text in args.where]
+                order_by = [(field, direction or 'asc') for field, _, direction in
+                            (text.partition(':') for text in args.order_by)]
+                for data in db.query(args.collection, where, order_by, args.limit, label='query'):
+                    print(json.dumps(data, ensure_ascii=False))
+                # 結果は標準出力、コストは標準エラーへ
+                print_profile(db.profile, file=sys.stderr)
+    except (OSError, ValueError) as e:
+        print(f"❌ エラー: {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,419 @@
+"""
+記録を追加しながら保つランキングの索引 (モードごとの並べ替え済みブロック)
+実行方法: python3 -m shimane_records.index {build,add,top,rank,user,checkpoint,publish} ...
+
+addRecord のたびにランキングを表示すると、全記録を reactionTime で並べ替え直していた。
+ここではモード (と全モードの 'all') ごとに (reactionTime, 追加順) を並べ替え済みのブロックに
+分けて持ち、追加と「何番目か」の問い合わせを O(log n) で行う。
+
+    build records.json               エクスポートから作り直す (チェックポイントを書く)
+    add new.jsonl | -                記録を追加する (追加ログに書いてから反映する)
+    top [--mode simple] [-k 50]      上位の記録
+    rank --mode simple 187           187ms なら何位か (速い記録の数 + 1)
+    user --mode simple <userId>      ユーザーのベストと順位
+    checkpoint                       チェックポイントを書いて追加ログを空にする
+    publish [--out public/ranking-data]   ranking.py と同じスナップショットを書き出す
+
+保存先 (既定は .shimane_cache/ranking_index/):
+    checkpoint.pickle    ある時点の索引 (記録とモードごとのブロック、世代番号)
+    log-<世代>.jsonl     そのチェックポイントの後に追加した記録 (1行1件)
+再起動時はチェックポイントを読み、同じ世代の追加ログだけを再生する (全記録の並べ替えはしない)。
+書き込むプロセスは1つだけにすること。
+"""
+
+import argparse
+import json
+import os
+import pickle
+import sys
+import time
+from bisect import bisect_left, insort
+from itertools import chain, islice
+from pathlib import Path
+
+from shimane_pipeline.fileio import atomic_write
+from shimane_records import ranking
+from shimane_records.columns import iter_rows, json_number
+
+DEFAULT_DIR = Path('.shimane_cache') / 'ranking_index'
+
+INDEX_VERSION = 1
+
+# 追加ログがこの件数を超えたらチェックポイントを書く
+CHECKPOINT_EVERY = 10000
+
+ALL = ranking.ALL
+
+
+class SortedBlocks:
+    """並べ替え済みのブロックのリスト (追加・順位の問い合わせは O(log n))
+
+    各ブロックは LOAD 〜 2 × LOAD 個の昇順のキー。ブロックの最大値の配列を bisect して
+    ブロックを選び、ブロックの大きさの累積はフェニック木で持つ。
+    """
+
+    LOAD = 512
+
+    def __init__(self, keys=()):
+        """keys は昇順に並んでいること"""
+        keys = list(keys)
+        self._blocks = [keys[i:i + self.LOAD] for i in range(0, len(keys), self.LOAD)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._len = len(keys)
+        self._rebuild()
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return chain.from_iterable(self._blocks)
+
+    @classmethod
+    def from_blocks(cls, blocks):
+        """blocks (チェックポイントに保存したブロックのリスト) から作る"""
+        keys = cls()
+        keys._blocks = blocks
+        keys._maxes = [block[-1] for block in blocks]
+        keys._len = sum(map(len, blocks))
+        keys._rebuild()
+        return keys
+
+    def _rebuild(self):
+        """ブロックの大きさのフェニック木を作り直す (ブロックが増えたときだけ)"""
+        n = len(self._blocks)
+        tree = [0] * (n + 1)
+        for i, block in enumerate(self._blocks, 1):
+            tree[i] += len(block)
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _before(self, b):
+        """b 番目より前のブロックのキーの数"""
+        tree = self._tree
+        total = 0
+        while b:
+            total += tree[b]
+            b -= b & -b
+        return total
+
+    def add(self, key):
+        blocks = self._blocks
+        maxes = self._maxes
+        self._len += 1
+        if not blocks:
+            blocks.append([key])
+            maxes.append(key)
+            self._rebuild()
+            return
+        b = bisect_left(maxes, key)
+        if b == len(blocks):
+            b -= 1
+            blocks[b].append(key)
+            maxes[b] = key
+        else:
+            insort(blocks[b], key)
+        block = blocks[b]
+        if len(block) > 2 * self.LOAD:
+            half = block[self.LOAD:]
+            del block[self.LOAD:]
+            blocks.insert(b + 1, half)
+            maxes[b] = block[-1]
+            maxes.insert(b + 1, half[-1])
+            self._rebuild()
+            return
+        tree = self._tree
+        i = b + 1
+        while i < len(tree):
+            tree[i] += 1
+            i += i & -i
+
+    def rank(self, key):
+        """key より小さいキーの数"""
+        b = bisect_left(self._maxes, key)
+        if b == len(self._blocks):
+            return self._len
+        return self._before(b) + bisect_left(self._blocks[b], key)
+
+    def head(self, k):
+        """小さい方から k 個"""
+        return list(islice(self, k))
+
+
+class _Mode:
+    """1つのモードの並び (ranking.render に渡せる形)"""
+
+    def __init__(self, records, k=ranking.DEFAULT_K):
+        self.records = records      # 索引全体の記録 (追加順)
+        self.keys = SortedBlocks()  # (reactionTime, 追加順)
+        self.best = {}              # userId → ベストのキー
+        self.k = k
+
+    def add(self, key, user_id):
+        self.keys.add(key)
+        best = self.best.get(user_id)
+        if best is None or key < best:
+            self.best[user_id] = key
+
+    @property
+    def total(self):
+        return len(self.keys)
+
+    def top(self):
+        return [ranking.record_fields(self.records[seq]) for _, seq in self.keys.head(self.k)]
+
+    def faster(self, reaction_time):
+        """reaction_time より速い記録の数"""
+        return self.keys.rank((reaction_time, -1))
+
+    def ranks(self):
+        return {user_id: (key[0], self.faster(key[0]) + 1) for user_id, key in self.best.items()}
+
+
+class RankingIndex:
+    """モードごとの並びと、チェックポイント + 追加ログによる保存"""
+
+    def __init__(self, root=DEFAULT_DIR, checkpoint_every=CHECKPOINT_EVERY):
+        self.root = Path(root)
+        self.checkpoint_path = self.root / 'checkpoint.pickle'
+        self.checkpoint_every = checkpoint_every
+        self.records = []       # 追加順の記録 (番号 = 追加順)
+        self.modes = {}         # mode → _Mode
+        self.generation = 0
+        self.logged = 0         # 今の追加ログの件数
+        self._log = None
+
+    # ---------------------------------------------------------------
+    # 保存・読み込み
+    # ---------------------------------------------------------------
+    def _log_path(self, generation=None):
+        return self.root / f'log-{self.generation if generation is None else generation}.jsonl'
+
+    def open(self):
+        """チェックポイントを読み、追加ログを再生する"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        if self.checkpoint_path.exists():
+            with open(self.checkpoint_path, 'rb') as f:
+                try:
+                    state = pickle.load(f)
+                except (pickle.UnpicklingError, AttributeError, ImportError, EOFError) as e:
+                    raise ValueError(f"{self.checkpoint_path}: 読み込めません ({e})") from None
+            if not isinstance(state, dict) or state.get('version') != INDEX_VERSION:
+                raise ValueError(f"{self.checkpoint_path}: 索引の形式が違います (build で作り直してください)")
+            self.generation = state['generation']
+            self.records = state['records']
+            self.modes = {}
+            for name, (blocks, best) in state['modes'].items():
+                group = self.modes[name] = _Mode(self.records)
+                group.keys = SortedBlocks.from_blocks(blocks)
+                group.best = best
+        self._replay()
+        # チェックポイントに含まれた古い世代の追加ログ (書いた直後に止まった場合に残る)
+        for path in self.root.glob('log-*.jsonl'):
+            if path != self._log_path():
+                path.unlink()
+        self._log = open(self._log_path(), 'a', encoding='utf-8')
+        return self
+
+    def _replay(self):
+        path = self._log_path()
+        if not path.exists():
+            return
+        good = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # 書き込み途中で止まった最後の行は捨てる
+                    break
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}: 追加ログが壊れています ({e})") from None
+                self._apply(row)
+                good += len(line)
+                self.logged += 1
+        if good != path.stat().st_size:
+            os.truncate(path, good)
+
+    def checkpoint(self):
+        """索引をチェックポイントに書き、次の世代の空の追加ログに切り替える"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        old_log = self._log_path()
+        state = {
+            'version': INDEX_VERSION,
+            'generation': self.generation + 1,
+            'records': self.records,
+            # クラスではなくリストと dict だけを保存する
+            'modes': {name: (group.keys._blocks, group.best) for name, group in self.modes.items()},
+        }
+        atomic_write(self.checkpoint_path, pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+        self.generation += 1
+        self.logged = 0
+        if self._log is not None:
+            self._log.close()
+            self._log = open(self._log_path(), 'a', encoding='utf-8')
+        old_log.unlink(missing_ok=True)
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------------------------------------------------------------
+    # 追加
+    # ---------------------------------------------------------------
+    def _apply(self, row):
+        seq = len(self.records)
+        user_id, mode, reaction_time = ranking.check_record(seq, row)
+        self.records.append(row)
+        key = (reaction_time, seq)
+        for name in (mode, ALL):
+            group = self.modes.get(name)
+            if group is None:
+                group = self.modes[name] = _Mode(self.records)
+            group.add(key, user_id)
+        return seq
+
+    def add(self, rows):
+        """記録を追加ログに書いてから索引に反映し、追加した件数を返す"""
+        rows = list(rows)
+        for offset, row in enumerate(rows):
+            ranking.check_record(len(self.records) + offset, row)
+        if self._log is None:
+            raise ValueError("索引を open() してから追加してください")
+        self._log.write(''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows))
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        for row in rows:
+            self._apply(row)
+        self.logged += len(rows)
+        if self.logged >= self.checkpoint_every:
+            self.checkpoint()
+        return len(rows)
+
+    def rebuild(self, rows):
+        """記録から作り直す (並べ替えは1回だけ) してチェックポイントを書く"""
+        self.records = []
+        self.modes = {}
+        for seq, row in enumerate(rows):
+            ranking.check_record(seq, row)
+            self.records.append(row)
+        members = {}
+        for seq, row in enumerate(self.records):
+            for name in (row['mode'], ALL):
+                members.setdefault(name, []).append(seq)
+        for name, seqs in members.items():
+            group = self.modes[name] = _Mode(self.records)
+            keys = sorted((self.records[seq]['reactionTime'], seq) for seq in seqs)
+            group.keys = SortedBlocks(keys)
+            for key in reversed(keys):
+                group.best[self.records[key[1]]['userId']] = key
+        self.checkpoint()
+
+    # ---------------------------------------------------------------
+    # 問い合わせ
+    # ---------------------------------------------------------------
+    def _mode(self, mode):
+        return self.modes.get(mode) or _Mode(self.records)
+
+    def top(self, mode=ALL, k=ranking.DEFAULT_K):
+        """上位 k 件の記録 (速い順、同じ時間は先に追加した記録が上)"""
+        return [self.records[seq] for _, seq in self._mode(mode).keys.head(k)]
+
+    def rank(self, mode, reaction_time):
+        """reaction_time の記録が何位になるか (速い記録の数 + 1)"""
+        return self._mode(mode).faster(reaction_time) + 1
+
+    def user(self, mode, user_id):
+        """ユーザーの (ベスト, 順位) (記録が無ければ None)"""
+        key = self._mode(mode).best.get(user_id)
+        if key is None:
+            return None
+        return key[0], self.rank(mode, key[0])
+
+    def publish(self, out=ranking.DEFAULT_OUT, k=ranking.DEFAULT_K):
+        """ranking.py と同じスナップショット (type は 'all' だけ) を書き出し、(版, 書き換えたか) を返す"""
+        for group in self.modes.values():
+            group.k = k
+        groups = {(name, ALL): group for name, group in self.modes.items()}
+        files, rankings, shards = ranking.render(groups)
+        return ranking.publish(out, files, rankings, shards, k, len(self.records))
+
+
+def _show(record):
+    return f"{json_number(float(record['reactionTime']))}ms {record.get('userName', '')} ({record['userId']})"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="島根県大田市カスタマイズ - ランキングの索引")
+    parser.add_argument('--dir', default=str(DEFAULT_DIR), help=f'索引の保存先 (既定は {DEFAULT_DIR})')
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('build', help='エクスポートから作り直す')
+    command.add_argument('export')
+    command = commands.add_parser('add', help='記録を追加する (JSON の配列 / JSON Lines、- は標準入力)')
+    command.add_argument('records')
+    command = commands.add_parser('top', help='上位の記録')
+    command.add_argument('--mode', default=ALL)
+    command.add_argument('-k', type=int, default=ranking.DEFAULT_K)
+    command = commands.add_parser('rank', help='反応時間 (ms) の順位')
+    command.add_argument('--mode', default=ALL)
+    command.add_argument('reaction_time', type=float)
+    command = commands.add_parser('user', help='ユーザーのベストと順位')
+    command.add_argument('--mode', default=ALL)
+    command.add_argument('user_id')
+    commands.add_parser('checkpoint', help='チェックポイントを書く')
+    command = commands.add_parser('publish', help='ランキングのスナップショットを書き出す')
+    command.add_argument('--out', default=str(ranking.DEFAULT_OUT))
+    command.add_argument('-k', type=int, default=ranking.DEFAULT_K)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        with RankingIndex(args.dir) as index:
+            if args.command == 'build':
+                index.rebuild(iter_rows(args.export))
+                print(f"✅ {len(index.records)} 件から索引を作りました {time.perf_counter() - start:.2f}s")
+            elif args.command == 'add':
+                if args.records == '-':
+                    rows = [json.loads(line) for line in sys.stdin if line.strip()]
+                else:
+                    rows = iter_rows(args.records)
+                count = index.add(rows)
+                print(f"✅ {count} 件を追加しました (全 {len(index.records)} 件) {time.perf_counter() - start:.2f}s")
+            elif args.command == 'top':
+                for position, record in enumerate(index.top(args.mode, args.k), 1):
+                    print(f"{position:>4}. {_show(record)}")
+            elif args.command == 'rank':
+                print(f"{args.mode}: {json_number(args.reaction_time)}ms は {index.rank(args.mode, args.reaction_time)} 位"
+                      f" (全 {index._mode(args.mode).total} 件)")
+            elif args.command == 'user':
+                found = index.user(args.mode, args.user_id)
+                if found is None:
+                    print(f"ℹ️  {args.user_id} の {args.mode} の記録はありません")
+                    return 1
+                best, rank = found
+                print(f"{args.mode}: ベスト {json_number(float(best))}ms、{rank} 位")
+            elif args.command == 'checkpoint':
+                index.checkpoint()
+                print(f"✅ チェックポイントを書きました ({len(index.records)} 件)")
+            elif args.command == 'publish':
+                version, changed = index.publish(args.out, args.k)
+                if changed:
+                    print(f"✅ 版 {version} を {args.out}/ に書き出しました")
+                else:
+                    print(f"ℹ️  変更がないので、版 {version} のままです")
+    except (OSError, ValueError) as e:
+        print(f"❌ エラー: {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""
+ランキングのスナップショット (上位 K 件と、ユーザーごとのベスト・順位) を事前に計算する
+実行方法: python3 -m shimane_records.ranking records.json [--users users.json] [--out public/ranking-data] [-k 50]
+
+ランキングページは表示のたびに getRecords() で全記録を読み込み、並べ替えて上位50件を出していた。
+ここでは記録を1件ずつ読みながら、モード × UserType ごとに上位 K 件のヒープを持ち、
+結果を小さな JSON に分けて書き出す。ページは選んだモードのファイル (数 KB) だけを読む (lib/ranking.ts)。
+
+    <out>/manifest.json                 現在の版と各ファイルの場所 (最後に置き換える)
+    <out>/<版>/top-<mode>-<type>.json   上位 K 件 (reactionTime の昇順、同じ時間は記録の順)
+    <out>/<版>/users-<番号>.json        userId → {mode: {type: [ベスト, 順位]}}
+
+mode には全モードをまとめた 'all'、type には全員の 'all' がある。student / adult の
+ランキングは --users でユーザーのエクスポート (User の配列) を渡したときだけ作る。
+順位は「そのベストより速い記録の数 + 1」(同じ時間は同じ順位)。
+ユーザーのファイルの番号は userId の FNV-1a (UTF-16 の各単位) を shards で割った余り。
+版は内容のハッシュなので、記録が変わらなければ何も書き換えない。
+"""
+
+import argparse
+import json
+import math
+import re
+import shutil
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone
+from heapq import heappush, heapreplace
+from pathlib import Path
+
+from shimane_pipeline.fileio import atomic_write, content_hash
+from shimane_records.columns import iter_rows, json_number
+
+DEFAULT_OUT = Path('public') / 'ranking-data'
+DEFAULT_K = 50
+
+# ユーザーのファイル1つあたりの人数の目安 (1ファイル数 KB)
+USERS_PER_SHARD = 16
+
+ALL = 'all'
+
+# ページに渡す Record のフィールド (それ以外は書き出さない)
+RECORD_FIELDS = ('id', 'userId', 'userName', 'mode', 'reactionTime', 'accuracy', 'score', 'sleepHours',
+                 'createdAt')
+
+_SAFE_NAME = re.compile(r'[A-Za-z0-9_-]+')
+_VERSION_NAME = re.compile(r'[0-9a-f]{12}')
+
+
+def shard_of(user_id, shards):
+    """userId のファイル番号 (lib/ranking.ts の shardOf と同じ計算)"""
+    data = user_id.encode('utf-16-le')
+    h = 0x811c9dc5
+    for k in range(0, len(data), 2):
+        h ^= data[k] | data[k + 1] << 8
+        h = (h * 0x01000193) & 0xFFFFFFFF
+    return h % shards
+
+
+class _Group:
+    """1つのランキング (モード × UserType) の集計"""
+
+    def __init__(self, k):
+        self.k = k
+        self.heap = []              # (-reactionTime, -順番, 記録): 先頭が上位 K 件で一番遅い記録
+        self.times = array('d')     # 全記録の reactionTime (順位を求める)
+        self.best = {}              # userId → ベストの reactionTime
+
+    @property
+    def total(self):
+        return len(self.times)
+
+    def add(self, seq, reaction_time, user_id, row):
+        self.times.append(reaction_time)
+        best = self.best.get(user_id)
+        if best is None or reaction_time < best:
+            self.best[user_id] = reaction_time
+        heap = self.heap
+        if len(heap) < self.k:
+            heappush(heap, (-reaction_time, -seq, row))
+        elif reaction_time < -heap[0][0]:
+            heapreplace(heap, (-reaction_time, -seq, row))
+
+    def top(self):
+        """上位の記録 (速い順、同じ時間は先に読んだ記録が上)"""
+        return [record_fields(row) for _, _, row in sorted(self.heap, reverse=True)]
+
+    def ranks(self):
+        """userId → (ベスト, 順位)"""
+        times = sorted(self.times)
+        return {user_id: (best, bisect_left(times, best) + 1) for user_id, best in self.best.items()}
+
+
+def load_user_types(path):
+    """ユーザーのエクスポートから userId → UserType"""
+    types = {}
+    for user in iter_rows(path):
+        if isinstance(user, dict) and isinstance(user.get('id'), str) and isinstance(user.get('type'), str):
+            types[user['id']] = user['type']
+    return types
+
+
+def check_record(seq, row):
+    """ランキングに必要なフィールドを (userId, mode, reactionTime) で返す (足りなければ ValueError)"""
+    try:
+        user_id = row['userId']
+        mode = row['mode']
+        reaction_time = row['reactionTime']
+    except (KeyError, TypeError):
+        raise ValueError(f"{seq + 1} 件目に userId / mode / reactionTime がありません") from None
+    if isinstance(reaction_time, bool) or not isinstance(reaction_time, (int, float)) \
+            or math.isnan(reaction_time):
+        raise ValueError(f"{seq + 1} 件目の reactionTime が数値ではありません: {reaction_time!r}")
+    if not isinstance(user_id, str):
+        raise ValueError(f"{seq + 1} 件目の userId が文字列ではありません: {user_id!r}")
+    if not isinstance(mode, str) or not _SAFE_NAME.fullmatch(mode):
+        raise ValueError(f"{seq + 1} 件目: ファイル名に使えないモードです: {mode!r}")
+    return user_id, mode, reaction_time
+
+
+def record_fields(row):
+    """ページに渡すフィールドだけの記録"""
+    return {key: row[key] for key in RECORD_FIELDS if key in row}
+
+
+def collect(rows, user_types=None, k=DEFAULT_K):
+    """記録を読みながら集計し、((mode, type) → _Group, 記録の数) を返す"""
+    user_types = user_types or {}
+    groups = {}
+    seq = -1
+    for seq, row in enumerate(rows):
+        user_id, mode, reaction_time = check_record(seq, row)
+        user_type = user_types.get(user_id)
+        keys = ((mode, ALL), (ALL, ALL)) if user_type is None else \
+            ((mode, ALL), (ALL, ALL), (mode, user_type), (ALL, user_type))
+        for key in keys:
+            group = groups.get(key)
+            if group is None:
+                if not _SAFE_NAME.fullmatch(key[1]):
+                    raise ValueError(f"ファイル名に使えない UserType です: {key[1]!r}")
+                group = groups[key] = _Group(k)
+            group.add(seq, reaction_time, user_id, row)
+    return groups, seq + 1
+
+
+def _dump(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def render(groups):
+    """書き出すファイル (版のディレクトリからの相対パス → 内容) と、manifest の rankings / users
+
+    groups は (mode, type) → total (記録の数) / top() / ranks() を持つ集計。
+    """
+    files = {}
+    rankings = {}
+    table = {}
+    for (mode, user_type), group in sorted(groups.items()):
+        name = f'top-{mode}-{user_type}.json'
+        files[name] = _dump({
+            'mode': mode,
+            'type': user_type,
+            'total': group.total,
+            'records': group.top(),
+        })
+        rankings.setdefault(mode, {})[user_type] = name
+        for user_id, (best, rank) in group.ranks().items():
+            table.setdefault(user_id, {}).setdefault(mode, {})[user_type] = [json_number(float(best)), rank]
+
+    shards = max(1, math.ceil(len(table) / USERS_PER_SHARD))
+    parts = [{} for _ in range(shards)]
+    for user_id in sorted(table):
+        parts[shard_of(user_id, shards)][user_id] = table[user_id]
+    for number, part in enumerate(parts):
+        files[f'users-{number}.json'] = _dump(part)
+    return files, rankings, shards
+
+
+def publish(out, files, rankings, shards, k, total):
+    """版のディレクトリを作ってから manifest.json を置き換える (変わらなければ何もしない)
+
+    戻り値は (版, 書き換えたか)。読み込み中のページのために、1つ前の版は残す。
+    """
+    out = Path(out)
+    digest = content_hash(b''.join(name.encode('utf-8') + b'\0' + files[name] for name in sorted(files)))
+    version = digest[:12]
+    manifest_path = out / 'manifest.json'
+    previous = None
+    try:
+        previous = json.loads(manifest_path.read_text(encoding='utf-8')).get('version')
+    except (OSError, ValueError):
+        pass
+    if previous == version and (out / version).is_dir():
+        return version, False
+
+    target = out / version
+    if not target.is_dir():
+        tmp = out / f'{version}.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        for name, data in files.items():
+            (tmp / name).write_bytes(data)
+        tmp.rename(target)
+
+    manifest = {
+        'version': version,
+        'generatedAt': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'k': k,
+        'records': total,
+        'rankings': {mode: {t: f'{version}/{name}' for t, name in types.items()} for mode, types in rankings.items()},
+        'users': {'shards': shards, 'path': f'{version}/users-{{shard}}.json'},
+    }
+    atomic_write(manifest_path, _dump(manifest))
+
+    for entry in out.iterdir():
+        if entry.is_dir() and _VERSION_NAME.fullmatch(entry.name) and entry.name not in (version, previous):
+            shutil.rmtree(entry, ignore_errors=True)
+    return version, True
+
+
+def build(export, out=DEFAULT_OUT, users=None, k=DEFAULT_K):
+    """エクスポートからスナップショットを作って out に書き出し、(版, 書き換えたか, 記録の数, ランキング数) を返す"""
+    user_types = load_user_types(users) if users else None
+    groups, total = collect(iter_rows(export), user_types, k)
+    files, rankings, shards = render(groups)
+    version, changed = publish(out, files, rankings, shards, k, total)
+    return version, changed, total, len(groups)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="島根県大田市カスタマイズ - ランキングのスナップショット作成")
+    parser.add_argument('export', help='記録のエクスポート (JSON の配列 / JSON Lines / .shrec)')
+    parser.add_argument('--users', help='ユーザーのエクスポート (student / adult 別のランキングを作る)')
+    parser.add_argument('--out', default=str(DEFAULT_OUT), help=f'出力先 (既定は {DEFAULT_OUT})')
+    parser.add_argument('-k', type=int, default=DEFAULT_K, help=f'ランキングに載せる件数 (既定は {DEFAULT_K})')
+    args = parser.parse_args(argv)
+    if args.k < 1:
+        parser.error('-k は 1 以上にしてください')
+
+    start = time.perf_counter()
+    try:
+        version, changed, total, count = build(args.export, args.out, args.users, args.k)
+    except (OSError, ValueError) as e:
+        print(f"❌ エラー: {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+    if changed:
+        print(f"✅ {total} 件 → ランキング {count} 個 (版 {version}) を {args.out}/ に書き出しました {elapsed:.2f}s")
+    else:
+        print(f"ℹ️  記録に変更がないので、版 {version} のままです {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,436 @@
+"""
+Record の列形式ストア (.shrec): 列ごとのバイナリを mmap して、コピーせずに読む
+実行方法: python3 -m shimane_records.store {import,export,info,stats} ...
+
+Firestore は1記録1ドキュメント、localStorage は全記録を1つの JSON 配列として持ち、
+addRecord のたびに全体を書き直していた。ここでは記録をチャンク単位で末尾に追加し、
+チャンクの中は列ごとに並べる。集計は必要な列だけを memoryview で読む (他の列のページには触れない)。
+
+    import records.json season.shrec [--chunk-size N]   エクスポートを追加する (無ければ作る)
+    export season.shrec [-o records.json] [--jsonl]    JSON に戻す
+    info season.shrec                                  件数・チャンク・列ごとの大きさ
+    stats season.shrec                                 mode と reactionTime の列だけで集計する
+
+ファイルの形式 (数値はすべてリトルエンディアン):
+    b'SHREC001'
+    チャンク*:
+        ヘッダ      b'SRCK', メタデータの長さ (u4), チャンク全体の長さ (u8)
+        メタデータ  JSON {"count": 件数, "columns": {列: [チャンク先頭からの位置, バイト数, 型]},
+                          "dicts": {"user" / "user_name" / "mode": [このチャンクで増えた値...]}}
+        列          8 バイト境界に揃えて並べる
+列:
+    reaction_time, accuracy, score, sleep_hours   'd' (無い値は NaN)
+    user, user_name                               'I' (辞書の番号)
+    mode                                          'B' (辞書の番号)
+    id, created_at                                UTF-8 の文字列を '\\0' で区切って並べたもの
+辞書は各チャンクで増えた値を順番につないだもの。書き込み途中で止まった最後のチャンクは読まない
+(次の追加で切り詰める)。Record のフィールド以外と、null の数値は保存しない (JSON では省略になる)。
+"""
+
+import argparse
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from pathlib import Path
+
+from shimane_records import columns as records_columns
+
+SUFFIX = '.shrec'
+MAGIC = b'SHREC001'
+CHUNK_MAGIC = b'SRCK'
+_HEADER = struct.Struct('<4sIQ')
+
+DEFAULT_CHUNK_SIZE = 65536
+
+FLOAT_COLUMNS = ('reaction_time', 'accuracy', 'score', 'sleep_hours')
+CODE_COLUMNS = {'user': 'I', 'user_name': 'I', 'mode': 'B'}
+STRING_COLUMNS = ('id', 'created_at')
+COLUMNS = FLOAT_COLUMNS + tuple(CODE_COLUMNS) + STRING_COLUMNS
+
+_LITTLE = sys.byteorder == 'little'
+
+
+def is_store(path):
+    return str(path).endswith(SUFFIX)
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+class _Chunk:
+    def __init__(self, start, count, columns):
+        self.start = start
+        self.count = count
+        self.columns = columns      # 列 → (ファイル先頭からの位置, バイト数, 型)
+
+
+class RecordStore:
+    """.shrec ファイル (読み込みは mmap、追加はチャンク単位)"""
+
+    def __init__(self, path, create=False):
+        self.path = Path(path)
+        if not self.path.exists():
+            if not create:
+                raise FileNotFoundError(f"{path} がありません")
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'wb') as f:
+                f.write(MAGIC)
+        self._mm = None
+        self._map()
+
+    # ---------------------------------------------------------------
+    # 読み込み
+    # ---------------------------------------------------------------
+    def _map(self):
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                # 呼び出し側がまだ列の memoryview を持っている (使われなくなれば解放される)
+                pass
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path}: .shrec ファイルではありません")
+        self.chunks = []
+        self.dicts = {name: [] for name in CODE_COLUMNS}
+        size = len(self._mm)
+        offset = len(MAGIC)
+        while offset + _HEADER.size <= size:
+            magic, meta_length, chunk_length = _HEADER.unpack_from(self._mm, offset)
+            if magic != CHUNK_MAGIC or offset + chunk_length > size:
+                break
+            meta_start = offset + _HEADER.size
+            meta = json.loads(bytes(self._mm[meta_start:meta_start + meta_length]))
+            self.chunks.append(_Chunk(offset, meta['count'], {
+                name: (offset + position, length, code) for name, (position, length, code) in meta['columns'].items()
+            }))
+            for name, values in meta['dicts'].items():
+                self.dicts[name].extend(values)
+            offset += chunk_length
+        # ここより後ろは書き込み途中で止まったチャンク
+        self.end = offset
+
+    def close(self):
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                pass
+            self._mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return sum(chunk.count for chunk in self.chunks)
+
+    @property
+    def users(self):
+        return self.dicts['user']
+
+    @property
+    def modes(self):
+        return self.dicts['mode']
+
+    def _view(self, chunk, name):
+        position, length, code = chunk.columns[name]
+        view = memoryview(self._mm)[position:position + length]
+        if code == 'B' and name in STRING_COLUMNS:
+            return view
+        if not _LITTLE:
+            # ビッグエンディアンの環境ではコピーして並べ替える
+            values = array(code, view)
+            values.byteswap()
+            return memoryview(values)
+        return view.cast(code)
+
+    def scan(self, *names):
+        """チャンクごとに、names の列の memoryview のタプルを返す (他の列は読まない)"""
+        for name in names:
+            if name not in COLUMNS:
+                raise ValueError(f"未知の列です: {name} (選べるのは {', '.join(COLUMNS)})")
+        for chunk in self.chunks:
+            yield tuple(self._view(chunk, name) for name in names)
+
+    def strings(self, chunk, name):
+        """文字列の列をリストにする"""
+        return str(self._view(chunk, name), 'utf-8').split('\0')[:-1]
+
+    def records(self):
+        """Record の dict を順番に返す (JSON のエクスポートと同じ形)"""
+        number = records_columns.json_number
+        users, names, modes = self.dicts['user'], self.dicts['user_name'], self.dicts['mode']
+        for chunk in self.chunks:
+            ids = self.strings(chunk, 'id')
+            created = self.strings(chunk, 'created_at')
+            views = [self._view(chunk, name) for name in ('user', 'user_name', 'mode') + FLOAT_COLUMNS]
+            for i, (user, name, mode, reaction_time, accuracy, score, sleep_hours) in enumerate(zip(*views)):
+                record = {
+                    'id': ids[i],
+                    'userId': users[user],
+                    'userName': names[name],
+                    'mode': modes[mode],
+                    'reactionTime': number(reaction_time),
+                }
+                if accuracy == accuracy:
+                    record['accuracy'] = number(accuracy)
+                if score == score:
+                    record['score'] = number(score)
+                if sleep_hours == sleep_hours:
+                    record['sleepHours'] = number(sleep_hours)
+                record['createdAt'] = created[i]
+                yield record
+
+    def to_columns(self, fields=None):
+        """columns.RecordColumns にする (fields を渡すと、その列だけを読み、他は空のまま)"""
+        fields = COLUMNS if fields is None else fields
+        result = records_columns.RecordColumns()
+        result.users = list(self.dicts['user'])
+        result.modes = list(self.dicts['mode'])
+        for name in fields:
+            if name in STRING_COLUMNS:
+                values = []
+                for chunk in self.chunks:
+                    values.extend(self.strings(chunk, name))
+            elif name == 'user_name':
+                continue
+            else:
+                values = array(CODE_COLUMNS.get(name, 'd'))
+                for (view,) in self.scan(name):
+                    values.frombytes(view.cast('B'))
+            setattr(result, name, values)
+        # RecordColumns の user_names はユーザーごとの最後の userName
+        last = {}
+        if 'user' in fields and 'user_name' in fields:
+            for user_view, name_view in self.scan('user', 'user_name'):
+                last.update(zip(user_view, name_view))
+        names = self.dicts['user_name']
+        result.user_names = [names[last[code]] if code in last else '' for code in range(len(result.users))]
+        return result
+
+    # ---------------------------------------------------------------
+    # 追加
+    # ---------------------------------------------------------------
+    def _encode(self, rows, codes):
+        """rows を1つのチャンクのバイト列にする (codes は辞書の値 → 番号、増えた値はここで足す)"""
+        local = records_columns.from_rows(rows)
+        names = [row.get('userName', '') for row in rows]
+        for key, values in (('userId', local.users), ('userName', names), ('mode', local.modes),
+                            ('id', local.id), ('createdAt', local.created_at)):
+            if not set(map(type, values)) <= {str}:
+                raise ValueError(f"{key} が文字列ではない記録があります")
+        for key, values in (('id', local.id), ('createdAt', local.created_at)):
+            if any('\0' in value for value in values):
+                raise ValueError(f"{key} に \\0 を含む記録は保存できません")
+        added = {name: [] for name in CODE_COLUMNS}
+
+        def encode(name, values):
+            table = codes[name]
+            result = []
+            for value in values:
+                code = table.get(value)
+                if code is None:
+                    code = table[value] = len(table)
+                    added[name].append(value)
+                result.append(code)
+            return result
+
+        user_map = encode('user', local.users)
+        mode_map = encode('mode', local.modes)
+        if len(codes['mode']) > 256:
+            raise ValueError("モードの種類が多すぎます")
+        data = {
+            'user': array('I', map(user_map.__getitem__, local.user)),
+            'mode': array('B', map(mode_map.__getitem__, local.mode)),
+            'user_name': array('I', encode('user_name', names)),
+        }
+        for name in FLOAT_COLUMNS:
+            data[name] = getattr(local, name)
+        for name in STRING_COLUMNS:
+            data[name] = ''.join(value + '\0' for value in getattr(local, name)).encode('utf-8')
+        return self._pack(len(rows), data, added)
+
+    @staticmethod
+    def _pack(count, data, added):
+        blobs = []
+        for name in COLUMNS:
+            values = data[name]
+            if isinstance(values, array):
+                if not _LITTLE:
+                    values = array(values.typecode, values)
+                    values.byteswap()
+                blobs.append((name, values.tobytes(), values.typecode))
+            else:
+                blobs.append((name, values, 'B'))
+        layout = {}
+
+        def build(meta_length):
+            position = _align(_HEADER.size + meta_length)
+            for name, blob, code in blobs:
+                layout[name] = [position, len(blob), code]
+                position = _align(position + len(blob))
+            return position
+
+        # メタデータの長さが位置の桁数で変わるので、変わらなくなるまで決め直す
+        meta = b''
+        while True:
+            total = build(len(meta))
+            encoded = json.dumps({'count': count, 'columns': layout, 'dicts': added},
+                                 ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            done = len(encoded) == len(meta)
+            meta = encoded
+            if done:
+                break
+        out = bytearray(total)
+        _HEADER.pack_into(out, 0, CHUNK_MAGIC, len(meta), total)
+        out[_HEADER.size:_HEADER.size + len(meta)] = meta
+        for name, blob, code in blobs:
+            position = layout[name][0]
+            out[position:position + len(blob)] = blob
+        return bytes(out)
+
+    def append(self, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+        """記録を chunk_size 件ずつのチャンクにして末尾に追加し、追加した件数を返す"""
+        codes = {name: {value: code for code, value in enumerate(values)} for name, values in self.dicts.items()}
+        count = 0
+        batch = []
+        with open(self.path, 'r+b') as f:
+            # 書き込み途中で止まったチャンクを切り詰める
+            f.truncate(self.end)
+            f.seek(self.end)
+
+            def flush():
+                f.write(self._encode(batch, codes))
+                f.flush()
+                os.fsync(f.fileno())
+
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= chunk_size:
+                    flush()
+                    count += len(batch)
+                    batch = []
+            if batch:
+                flush()
+                count += len(batch)
+        self._map()
+        return count
+
+
+def mode_stats(store):
+    """mode と reaction_time の列だけで、モードごとの件数・平均・最速・最遅を求める"""
+    counts = {}
+    sums = {}
+    fastest = {}
+    slowest = {}
+    for modes, times in store.scan('mode', 'reaction_time'):
+        by_mode = {}
+        for mode, reaction_time in zip(modes, times):
+            values = by_mode.get(mode)
+            if values is None:
+                values = by_mode[mode] = []
+            values.append(reaction_time)
+        for mode, values in by_mode.items():
+            counts[mode] = counts.get(mode, 0) + len(values)
+            sums.setdefault(mode, []).append(math.fsum(values))
+            fastest[mode] = min(fastest.get(mode, math.inf), min(values))
+            slowest[mode] = max(slowest.get(mode, -math.inf), max(values))
+    number = records_columns.json_number
+    return [
+        {
+            'mode': store.modes[mode],
+            'count': counts[mode],
+            'average': math.fsum(sums[mode]) / counts[mode],
+            'fastest': number(fastest[mode]),
+            'slowest': number(slowest[mode]),
+        }
+        for mode in sorted(counts)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="島根県大田市カスタマイズ - 記録の列形式ストア")
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('import', help='エクスポートを追加する (ストアが無ければ作る)')
+    command.add_argument('export')
+    command.add_argument('store')
+    command.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='1チャンクの件数')
+    command = commands.add_parser('export', help='JSON に戻す')
+    command.add_argument('store')
+    command.add_argument('-o', '--output', help='出力先 (省略時は標準出力)')
+    command.add_argument('--jsonl', action='store_true', help='1行1件の JSON Lines で書く')
+    command = commands.add_parser('info', help='件数・チャンク・列ごとの大きさ')
+    command.add_argument('store')
+    command = commands.add_parser('stats', help='モードごとの反応時間 (mode と reactionTime の列だけを読む)')
+    command.add_argument('store')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        if args.command == 'import':
+            if args.chunk_size < 1:
+                parser.error('--chunk-size は 1 以上にしてください')
+            with RecordStore(args.store, create=True) as store:
+                count = store.append(records_columns.iter_rows(args.export), args.chunk_size)
+                print(f"✅ {count} 件を追加しました (全 {len(store)} 件、{len(store.chunks)} チャンク) "
+                      f"{time.perf_counter() - start:.2f}s")
+        elif args.command == 'export':
+            with RecordStore(args.store) as store:
+                out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+                try:
+                    _write_records(store.records(), out, args.jsonl)
+                    out.flush()
+                except BrokenPipeError:
+                    # 読み手 (| head など) が先に閉じた: 残りは捨て、終了時の flush でも失敗しないようにする
+                    os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+                    return 1
+                finally:
+                    if args.output:
+                        out.close()
+                if args.output:
+                    print(f"✅ {len(store)} 件を {args.output} に書き出しました {time.perf_counter() - start:.2f}s")
+        elif args.command == 'info':
+            with RecordStore(args.store) as store:
+                print(f"📦 {args.store}: {len(store)} 件、{len(store.chunks)} チャンク、"
+                      f"{store.path.stat().st_size / 1e6:.1f}MB")
+                for name in COLUMNS:
+                    size = sum(chunk.columns[name][1] for chunk in store.chunks)
+                    print(f"   {name:<14} {size / 1e6:>10.2f}MB")
+                print(f"   辞書: userId {len(store.users)}、userName {len(store.dicts['user_name'])}、"
+                      f"mode {len(store.modes)}")
+        elif args.command == 'stats':
+            with RecordStore(args.store) as store:
+                for row in mode_stats(store):
+                    print(f"{row['mode']:<8} {row['count']:>9} 件  平均 {row['average']:.1f}ms  "
+                          f"最速 {row['fastest']}ms  最遅 {row['slowest']}ms")
+            print(f"⏱️  {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    except (OSError, ValueError) as e:
+        print(f"❌ エラー: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def _write_records(records, out, jsonl):
+    if jsonl:
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return
+    out.write('[')
+    for i, record in enumerate(records):
+        out.write(',\n' if i else '\n')
+        out.write(json.dumps(record, ensure_ascii=False))
+    out.write('\n]\n')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
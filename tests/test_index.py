@@ -0,0 +1,110 @@
+import random
+import tempfile
+import unittest
+from pathlib import Path
+
+from shimane_records.index import RankingIndex, SortedBlocks
+
+MODES = ['simple', 'color', 'dual']
+
+
+def make_records(n, seed=0):
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        row = {
+            'id': f'r{i}',
+            'userId': f'u{rnd.randint(0, 20)}',
+            'userName': rnd.choice(['山田', 'Sato', '']),
+            'mode': rnd.choice(MODES),
+            'reactionTime': rnd.choice([rnd.randint(150, 600), round(rnd.uniform(150, 600), 1)]),
+        }
+        if rnd.random() < 0.5:
+            row['accuracy'] = rnd.randint(0, 100)
+        if rnd.random() < 0.3:
+            row['sleepHours'] = 7.5
+        row['createdAt'] = f'2025-01-{i % 28 + 1:02d}T00:00:00Z'
+        rows.append(row)
+    return rows
+
+
+def expected_top(rows, mode, k):
+    chosen = [(row['reactionTime'], seq) for seq, row in enumerate(rows) if mode == 'all' or row['mode'] == mode]
+    return [rows[seq] for _, seq in sorted(chosen)[:k]]
+
+
+class TempDirTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+
+
+class RankingIndexTest(TempDirTest):
+
+    def check(self, index, rows):
+        for mode in MODES + ['all']:
+            self.assertEqual(index.top(mode, k=10), expected_top(rows, mode, 10))
+            times = [row['reactionTime'] for row in rows if mode == 'all' or row['mode'] == mode]
+            for reaction_time in (0, 300, 300.5, 1000):
+                self.assertEqual(index.rank(mode, reaction_time), sum(t < reaction_time for t in times) + 1)
+
+    def test_reopen(self):
+        # チェックポイントと追加ログの両方から読み直しても同じ索引になる
+        rows = make_records(700)
+        with RankingIndex(self.dir, checkpoint_every=300) as index:
+            for start in range(0, 500, 50):
+                index.add(rows[start:start + 50])
+            self.check(index, rows[:500])
+        with RankingIndex(self.dir, checkpoint_every=300) as index:
+            self.check(index, rows[:500])
+            index.add(rows[500:])
+        with RankingIndex(self.dir) as index:
+            self.check(index, rows)
+            best = min((row['reactionTime'], seq) for seq, row in enumerate(rows)
+                       if row['userId'] == 'u3' and row['mode'] == 'simple')
+            self.assertEqual(index.user('simple', 'u3'), (best[0], index.rank('simple', best[0])))
+
+    def test_rebuild_same_as_add(self):
+        rows = make_records(400, seed=1)
+        with RankingIndex(self.dir / 'a') as built:
+            built.rebuild(rows)
+            with RankingIndex(self.dir / 'b') as added:
+                added.add(rows)
+                for mode in MODES + ['all']:
+                    self.assertEqual(built.top(mode, k=400), added.top(mode, k=400))
+
+    def test_torn_log_line(self):
+        # 書き込み途中で止まった最後の行は捨てる
+        rows = make_records(20)
+        with RankingIndex(self.dir) as index:
+            index.add(rows)
+        with open(self.dir / 'log-0.jsonl', 'a', encoding='utf-8') as f:
+            f.write('{"id": "r20", "userId"')
+        with RankingIndex(self.dir) as index:
+            self.assertEqual(len(index.records), 20)
+            self.check(index, rows)
+
+    def test_invalid_record(self):
+        with RankingIndex(self.dir) as index:
+            with self.assertRaises(ValueError):
+                index.add([{'userId': 'u', 'mode': 'simple', 'reactionTime': 'fast'}])
+            self.assertEqual(index.records, [])
+
+
+class SortedBlocksTest(unittest.TestCase):
+
+    def test_many_blocks(self):
+        rnd = random.Random(0)
+        keys = sorted(rnd.random() for _ in range(3000))
+        blocks = SortedBlocks(keys[:1000])
+        for key in keys[1000:]:
+            blocks.add(key)
+        self.assertEqual(list(blocks.head(3000)), keys)
+        for probe in (0, 0.25, 0.5, 1):
+            self.assertEqual(blocks.rank(probe), sum(key < probe for key in keys))
+
+
+if __name__ == '__main__':
+    unittest.main()
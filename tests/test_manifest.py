@@ -0,0 +1,50 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from shimane_pipeline.fileio import content_hash
+from shimane_pipeline.manifest import Manifest
+from shimane_pipeline.runner import transform_file
+
+
+def seconds(content):
+    return content.replace('}ms', '}s')
+
+
+def append_mark(content):
+    return content + '!'
+
+
+class IdempotentRecordTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.path = self.dir / 'page.tsx'
+        self.path.write_text('<p>{time}ms</p>\n', encoding='utf-8')
+
+    def test_transform_file_checks_output(self):
+        input_hash, output_hash, output, idempotent = transform_file(str(self.path), seconds, known={})
+        self.assertEqual(output, b'<p>{time}s</p>\n')
+        self.assertEqual(output_hash, content_hash(output))
+        self.assertTrue(idempotent)
+        *_, idempotent = transform_file(str(self.path), append_mark, known={})
+        self.assertFalse(idempotent)
+
+    def test_not_checked_without_manifest(self):
+        *_, idempotent = transform_file(str(self.path), seconds)
+        self.assertFalse(idempotent)
+
+    def test_record_output_entry(self):
+        manifest = Manifest(self.dir / 'manifest.json', self.dir / 'objects')
+        manifest.record('seconds', 'r1', 'in', 'out', b'data', idempotent=True)
+        manifest.record('append', 'r2', 'in', 'out', b'data')
+        self.assertEqual(manifest.entries('r1'), {'in': 'out', 'out': 'out'})
+        self.assertEqual(manifest.entries('r2'), {'in': 'out'})
+        manifest.save()
+        self.assertEqual(Manifest.load(self.dir / 'manifest.json').entries('r1'), {'in': 'out', 'out': 'out'})
+
+
+if __name__ == '__main__':
+    unittest.main()
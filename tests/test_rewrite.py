@@ -0,0 +1,168 @@
+import random
+import re
+import unittest
+
+from shimane_pipeline.rewrite import ConvergenceError, LiteralSet, Rule, RuleSet
+
+FRAGMENTS = ['a', 'b', 'c', 'ab', 'ba', 'cc', 'aab', ' ', '\n', '{time}ms', 'ms', '}', '{', 'シ', 'Z']
+
+
+def random_text(rnd, fragments=FRAGMENTS):
+    return ''.join(rnd.choice(fragments) for _ in range(rnd.randint(0, 30)))
+
+
+def fused(rules, content):
+    """合成パターン (r1)|(r2)|… の re.sub (RuleSet の結果の定義)"""
+    combined = re.compile('|'.join(f'({rule.inline()})' for rule in rules))
+    groups = {}
+    group = 1
+    for rule in rules:
+        groups[group] = rule
+        group += 1 + rule.regex.groups
+
+    def replace(m):
+        rule = next(rule for group, rule in groups.items() if m.group(group) is not None)
+        return rule.regex.match(m.string, m.start()).expand(rule.repl)
+    return combined.sub(replace, content)
+
+
+def naive_converge(rules, content, limit=16):
+    """apply を変わらなくなるまで繰り返す ((結果, 回数)、振動すれば 'cycle'、終わらなければ 'limit')"""
+    seen = {content}
+    for i in range(1, limit + 1):
+        result = rules.apply(content)
+        if result == content:
+            return content, i
+        if result in seen:
+            return 'cycle', i
+        seen.add(result)
+        content = result
+    return 'limit', limit
+
+
+class RuleSetTest(unittest.TestCase):
+
+    def test_same_as_fused_pattern(self):
+        rules = [
+            Rule('ab', 'ab', 'b'),
+            Rule('a_c', r'a(\s*)c', r'c\1a'),
+            Rule('ms', r'\{(\w+)\}ms', r'{(\1/1000).toFixed(3)}s'),
+            Rule('c', 'c+', 'C', flags=re.IGNORECASE),
+            Rule('b', r'b(?=a)', 'B'),
+            Rule('alt', r'ba|(c)b', 'Q'),
+            Rule('empty', r'(?=Z)', '<'),
+        ]
+        ruleset = RuleSet(rules, 'test')
+        rnd = random.Random(0)
+        for _ in range(500):
+            content = random_text(rnd)
+            self.assertEqual(ruleset.apply(content), fused(rules, content), content)
+
+    def test_dispatch_with_groups(self):
+        # ルールの中のグループや | があっても、マッチしたルールを正しく引く
+        ruleset = RuleSet([Rule('x', r'(a)(b)?|c', r'[x]'), Rule('y', r'a(d)', r'[y\1]')], 'test')
+        self.assertEqual(ruleset.subn('ab ad c a'), ('[x] [x]d [x] [x]', 4))
+
+    def test_earlier_rule_wins(self):
+        ruleset = RuleSet([Rule('long', 'abc', 'X'), Rule('short', 'ab', 'Y')], 'test')
+        self.assertEqual(ruleset.subn('abcab'), ('XY', 2))
+
+
+class LiteralSetTest(unittest.TestCase):
+
+    def check_same_as_replace(self, rules, rnd, fragments):
+        # _check を通った組み合わせでは、左から1パスで置き換えても str.replace の連続と同じになる
+        literals = LiteralSet(rules, 'test')
+        one_pass = re.compile('|'.join(re.escape(old) for _, old, _ in rules))
+        table = {old: new for _, old, new in rules}
+        for _ in range(50):
+            content = random_text(rnd, fragments)
+            expected = content
+            for _, old, new in rules:
+                expected = expected.replace(old, new)
+            self.assertEqual(one_pass.sub(lambda m: table[m.group()], content), expected, content)
+            self.assertEqual(literals.apply(content), expected, content)
+            self.assertEqual(literals.subn(content)[0], expected, content)
+            buffer = content.encode('utf-8')
+            for start, end, new in reversed(literals.byte_edits(buffer)):
+                buffer = buffer[:start] + new + buffer[end:]
+            self.assertEqual(buffer.decode('utf-8'), expected, content)
+
+    def test_same_as_replace_chain(self):
+        rnd = random.Random(0)
+        words = ['ab', 'cd', 'ef', 'シ', 'xyz', 'gh', 'ij', 'kl', 'mn', 'op', 'qr']
+        accepted = 0
+        for _ in range(300):
+            olds = rnd.sample(words, rnd.randint(1, len(words)))
+            rules = [(f'r{i}', old, rnd.choice(['', '-', old.upper(), '!!', 'ab']))
+                     for i, old in enumerate(olds)]
+            try:
+                LiteralSet(rules, 'test')
+            except ValueError:
+                continue
+            accepted += 1
+            self.check_same_as_replace(rules, rnd, words + ['a', 'b', 'c', 'x', ' '])
+        self.assertGreater(accepted, 50)
+
+    def test_check(self):
+        for rules in (
+            [('a', 'ab', 'x'), ('b', 'bc', 'y')],       # 置換前の文字列が重なる
+            [('a', 'abc', 'x'), ('b', 'b', 'y')],       # 一方が他方を含む
+            [('a', 'x', 'ab'), ('b', 'ab', 'y')],       # 置換後の文字列が後のルールにマッチする
+            [('a', 'x', 'ab'), ('b', 'bc', 'y')],       # 置換後の文字列と後のルールが重なる
+            [('a', '', 'y')],
+        ):
+            with self.subTest(rules=rules), self.assertRaises(ValueError):
+                LiteralSet(rules, 'test')
+        # 後のルールの出力が前のルールにマッチするのは str.replace の順と同じなので構わない
+        LiteralSet([('a', 'ab', 'x'), ('b', 'y', 'ab')], 'test')
+
+
+class ConvergeTest(unittest.TestCase):
+
+    def test_fixed_point(self):
+        rules = RuleSet([Rule('aa', 'aa', 'a'), Rule('ab', 'ab', 'b')], 'test')
+        self.assertEqual(rules.converge('aaaab xaab'), ('b xb', 4))
+
+    def test_edits_cancel_out(self):
+        # 書き換えが打ち消し合って内容が変わらないのは振動ではなく不動点
+        rules = RuleSet([
+            Rule('bc', r'b\s*c', ''),
+            Rule('ca', r'c\s*a', ''),
+            Rule('bcb', r'b(?=b)', 'bcb'),
+        ], 'test')
+        content, _ = rules.converge('aca a a b cabbbcbcca ca ')
+        self.assertEqual(rules.apply(content), content)
+
+    def test_oscillation(self):
+        rules = RuleSet([Rule('ab', 'a', 'b'), Rule('ba', 'b', 'a')], 'test')
+        with self.assertRaises(ConvergenceError) as cm:
+            rules.converge('a')
+        self.assertEqual(cm.exception.cycle, 2)
+
+    def test_limit(self):
+        rules = RuleSet([Rule('grow', 'a$', 'aa')], 'test')
+        with self.assertRaises(ConvergenceError) as cm:
+            rules.converge('a', max_iterations=4)
+        self.assertIsNone(cm.exception.cycle)
+
+    def test_same_as_naive_loop(self):
+        rulesets = [
+            RuleSet([Rule('ab', 'ab', 'b'), Rule('bb', 'bb', 'B'), Rule('cc', r'c\s*c', 'ab'),
+                     Rule('zz', 'z+z', 'c', unless='ZZ'), Rule('Z', r'(?<=a)Z', 'ZZ')], 'chain'),
+            RuleSet([Rule('p', 'aab', 'abb'), Rule('q', 'abb', 'aab')], 'oscillation'),
+        ]
+        rnd = random.Random(0)
+        for _ in range(500):
+            content = random_text(rnd, FRAGMENTS + ['z', 'zz', 'x' * 300])
+            for rules in rulesets:
+                expected, _ = naive_converge(rules, content)
+                try:
+                    result, _ = rules.converge(content)
+                except ConvergenceError as e:
+                    result = 'cycle' if e.cycle else 'limit'
+                self.assertEqual(result, expected, (rules.name, content))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import contextlib
+import importlib
+import io
+import unittest
+from pathlib import Path
+
+from shimane_pipeline import bench, tsx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+FUNCTIONS = {
+    'apply_shimane_customization': ['modify_layout_tsx', 'modify_page_tsx', 'modify_simple_page',
+                                    'modify_color_page', 'modify_dual_page', 'modify_ranking_page'],
+    'apply_shimane_fixes_v2': ['fix_page_tsx', 'fix_ranking_page', 'fix_all_training_pages'],
+    'apply_shimane_fixes_v3': ['fix_page_tsx', 'fix_ranking_page_complete', 'fix_training_page_units'],
+}
+# (filepath, content) を受け取る関数
+WITH_PATH = ('fix_all_training_pages', 'fix_training_page_units')
+# 最適化前の v3 は空白まで一致する文字列でバッジを探していたので、このページには「判断」を足せなかった
+# (今は足す)
+BADGE_ADDED = {
+    ('apply_shimane_fixes_v3', 'fix_page_tsx', 'backup_before_shimane/app_page.tsx'),
+    ('apply_shimane_fixes_v3', 'fix_page_tsx', 'backup_v2/app_page.tsx'),
+}
+
+
+def pages():
+    files = sorted(ROOT.glob('app/**/*.tsx')) + sorted(ROOT.glob('backup_*/*.tsx'))
+    return [(path.relative_to(ROOT).as_posix(), path.read_text(encoding='utf-8')) for path in files]
+
+
+def quiet(function, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args)
+
+
+class LegacyEquivalenceTest(unittest.TestCase):
+    """スクリプトの関数と最適化前のスクリプト (tests/original/) の関数の結果が実際のページで同じか"""
+
+    def test_same_output(self):
+        texts = pages()
+        self.assertTrue(texts)
+        for module, names in FUNCTIONS.items():
+            current = importlib.import_module(module)
+            legacy = quiet(bench.legacy_script, module)
+            for name in names:
+                for filepath, content in texts:
+                    args = (filepath, content) if name in WITH_PATH else (content,)
+                    with self.subTest(module=module, function=name, page=filepath):
+                        got = quiet(getattr(current, name), *args)
+                        want = quiet(getattr(legacy, name), *args)
+                        if (module, name, filepath) in BADGE_ADDED:
+                            self.assertNotEqual(got, want)
+                            self.assertIn('判断</span>', got)
+                        else:
+                            self.assertEqual(got, want)
+
+
+class IndexFallbackTest(unittest.TestCase):
+    """元の固定文字列・パターンが一致するページでは索引を作らず、一致しないページだけ索引で探すか"""
+
+    def test_real_pages_build_no_index(self):
+        for module, names in FUNCTIONS.items():
+            current = importlib.import_module(module)
+            for name in names:
+                for filepath, content in pages():
+                    args = (filepath, content) if name in WITH_PATH else (content,)
+                    with self.subTest(module=module, function=name, page=filepath):
+                        tsx.clear_cache()
+                        quiet(getattr(current, name), *args)
+                        self.assertFalse(tsx._trees)
+
+    def test_reindented_page_uses_index(self):
+        v3 = importlib.import_module('apply_shimane_fixes_v3')
+        content = (ROOT / 'backup_v2' / 'app_page.tsx').read_text(encoding='utf-8')
+        # 見出しのインデントやバッジの属性の改行が違うと、固定文字列・元のパターンは一致しない
+        reindented = content.replace('\n              シンプル反応・判断\n', '\n                シンプル反応・判断\n')
+        reindented = reindented.replace('<span className="bg-red-100', '<span\n                className="bg-red-100')
+        tsx.clear_cache()
+        got = quiet(v3.fix_page_tsx, reindented)
+        self.assertTrue(tsx._trees)
+        self.assertNotIn('シンプル反応・判断', got)
+        self.assertEqual(got.count('判断</span>'), reindented.count('判断</span>') + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+
+from shimane_records.store import RecordStore
+from tests.test_index import TempDirTest, make_records
+
+
+class RecordStoreTest(TempDirTest):
+
+    def test_round_trip(self):
+        rows = make_records(250)
+        path = self.dir / 'season.shrec'
+        with RecordStore(path, create=True) as store:
+            self.assertEqual(store.append(rows[:100], chunk_size=30), 100)
+        with RecordStore(path) as store:
+            store.append(rows[100:], chunk_size=64)
+            self.assertEqual(len(store), len(rows))
+            self.assertEqual(list(store.records()), rows)
+
+    def test_missing(self):
+        with self.assertRaises(FileNotFoundError):
+            RecordStore(self.dir / 'none.shrec')
+
+
+if __name__ == '__main__':
+    unittest.main()
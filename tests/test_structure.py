@@ -0,0 +1,46 @@
+import unittest
+
+from shimane_pipeline import bench_structure, structure
+
+RANKING = '<div>ranking</div>'
+
+
+class FastPathTest(unittest.TestCase):
+    """普通のページでは旧パターンと同じ結果になり、閉じ側が無い入力でもすぐ終わるか"""
+
+    def test_oversized_page_matches_legacy(self):
+        content = bench_structure._oversized_page(64 * 1024)
+        self.assertTrue(structure.follows_last(
+            content, structure.RANKING_MARKER, (structure.RANKING_BOX, structure._TWO_CLOSES)))
+        self.assertEqual(structure.replace_ranking_box(content, RANKING),
+                         structure.RANKING_BOX_PATTERN.sub(RANKING, content))
+        self.assertEqual(structure.replace_ranking_to_fragment_end(content, RANKING),
+                         structure.RANKING_FRAGMENT_PATTERN.sub(RANKING, content))
+
+    def test_card_values_match_legacy(self):
+        card = (f'{structure.RESULT_CARD}<h4>カラー判断</h4>{structure.AVERAGE_LABEL}'
+                '<p className="text-3xl font-bold text-blue-600">1</p>'
+                f'{structure.ACCURACY_LABEL}<p className="text-2xl font-bold text-green-600">2</p></div>\n')
+        content = card * 50
+        self.assertEqual(structure.resize_card_value(content, 'カラー判断', 'text-blue-600'),
+                         structure.card_value_pattern('カラー判断', 'text-blue-600').sub(r'\1text-xl\3', content))
+        self.assertEqual(structure.resize_accuracy_value(content, 'text-green-600'),
+                         structure.accuracy_value_pattern('text-green-600').sub(r'\1text-xl\3', content))
+
+    def test_adversarial_inputs_use_matcher(self):
+        # 旧パターンなら二乗以上かかる大きさ (数秒以上) でも、マッチャに落ちて変更なしで終わる
+        ranking = bench_structure._adversarial_ranking(256 * 1024)
+        self.assertEqual(structure.replace_ranking_box(ranking, RANKING), ranking)
+        self.assertEqual(structure.replace_ranking_to_fragment_end(ranking, RANKING), ranking)
+        card = bench_structure._adversarial_card(256 * 1024)
+        self.assertEqual(structure.resize_card_value(card, 'カラー判断', 'text-blue-600'), card)
+
+    def test_matcher_uses_balanced_close(self):
+        # 最後のマーカーの後ろに </div></div> が無いのでマッチャを使う
+        content = (f'<>{structure.RANKING_MARKER}{structure.RANKING_BOX}<p>a</p></div>'
+                   f'{structure.RANKING_MARKER}{structure.RANKING_BOX}<p>b</p></div></>')
+        self.assertEqual(structure.replace_ranking_box(content, RANKING), f'<>{RANKING}{RANKING}</>')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import random
+import unittest
+from pathlib import Path
+
+from shimane_pipeline import tsx
+
+ROOT = Path(__file__).resolve().parent.parent
+SNIPPETS = ['x', 'テキスト', '<span>a</span>', '<b>', '</div>', '{a}', '{', '}', '"', "'", '`', '\n  ', '',
+            '<p className="q">z</p>', 'await f()', '{/* c */}', '<>', '</>', '<br />', '//', '/*']
+
+JUDGE = '<span className="bg-blue-100">判断</span>'
+
+
+def add_judge_badge(source):
+    patch = tsx.edit(source)
+    tsx.add_badge(patch, ('シンプル反応',), after='認知', badge='判断', markup=JUDGE)
+    return patch.apply()
+
+
+class AddBadgeTest(unittest.TestCase):
+
+    def test_inserts_after_badge(self):
+        source = '<div><h3>シンプル反応</h3>\n  <span>認知</span>\n  <span>行動</span>\n</div>'
+        self.assertEqual(
+            add_judge_badge(source),
+            '<div><h3>シンプル反応</h3>\n  <span>認知</span>\n  ' + JUDGE + '\n  <span>行動</span>\n</div>',
+        )
+
+    def test_existing_badge_is_kept(self):
+        source = '<div><h3>シンプル反応</h3><span>認知</span><span>判断</span></div>'
+        self.assertEqual(add_judge_badge(source), source)
+
+    def test_heading_inside_expression(self):
+        # 見出しが {…} の中にあれば、式の外側の要素をカードとみなす
+        source = '<div>{show && <h3>シンプル反応</h3>}<span>認知</span></div>'
+        self.assertEqual(add_judge_badge(source),
+                         '<div>{show && <h3>シンプル反応</h3>}<span>認知</span>' + JUDGE + '</div>')
+
+    def test_heading_without_element_ancestor(self):
+        for source in ('<h3>シンプル反応</h3>', 'const a = show && <h3>シンプル反応</h3>;'):
+            self.assertEqual(add_judge_badge(source), source)
+
+
+
+def dump(tree):
+    """木の内容 (位置・親子・索引) を比べられる形にする"""
+    def node(n):
+        fields = [type(n).__name__, n.start, n.end, n.index,
+                  type(n.parent).__name__ if n.parent else None, n.parent.start if n.parent else None]
+        if isinstance(n, tsx.Element):
+            fields += [n.name, n.open_end, n.close_start, n.text, [c.start for c in n.children],
+                       [(a.name, a.start, a.end, a.value_start, a.value_end, a.kind) for a in n.attrs]]
+        if isinstance(n, tsx.Expr):
+            fields.append([c.start for c in n.children])
+        return fields
+    return ([node(n) for n in tree.elements], [node(n) for n in tree.expressions], [node(n) for n in tree.texts],
+            tree.braces, tree.awaits, [c.start for c in tree.children],
+            {name: [e.start for e in elements] for name, elements in tree._by_name.items()}, tree._starts)
+
+
+class ReparseTest(unittest.TestCase):
+
+    def test_same_as_full_parse(self):
+        # 実際のページをランダムに編集し、部分的な再解析と最初からの解析を比べる
+        sources = [path.read_text(encoding='utf-8') for path in sorted(ROOT.glob('backup_*/*.tsx'))]
+        rnd = random.Random(0)
+        reparsed = 0
+        for _ in range(300):
+            content = rnd.choice(sources)
+            tree = tsx.Tree(content)
+            closed = [e for e in tree.elements if e.close_start is not None]
+            if closed and rnd.random() < 0.8:
+                element = rnd.choice(closed)
+                a = rnd.randint(element.open_end, element.close_start)
+                b = rnd.randint(a, min(element.close_start, a + 40))
+            else:
+                a = rnd.randint(0, len(content))
+                b = min(len(content), a + rnd.randint(0, 30))
+            edited = content[:a] + rnd.choice(SNIPPETS) + content[b:]
+            prefix, suffix = tsx._common_ends(content, edited)
+            result = tsx.reparse(tree, edited, prefix, suffix)
+            if result is None:
+                continue
+            reparsed += 1
+            self.assertEqual(dump(result), dump(tsx.Tree(edited)), (a, b))
+        self.assertGreater(reparsed, 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
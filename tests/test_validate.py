@@ -0,0 +1,70 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from shimane_pipeline import validate
+
+TYPE_ASSERTION = 'const a = <string>b;\n'
+
+
+class CheckTest(unittest.TestCase):
+
+    def test_valid(self):
+        for source in (
+            'const A = () => <div className="a">{items.map(i => <p key={i}>{i}</p>)}</div>;\n',
+            "const re = /[{(]/g;\nconst s = '}';\n",
+            'const t = `${a({b: 1})}}`;\n',
+            "const A = () => <p>Don't stop</p>;\n",
+        ):
+            self.assertIsNone(validate.check(source), source)
+
+    def test_problems(self):
+        cases = [
+            ('const a = (1;\n', "( が閉じていません"),
+            ('const a = 1);\n', "対応する開き括弧の無い ) があります"),
+            ('const A = () => <div><p></div>;\n', "</div> が 1 行目の <p> と対応しません"),
+            ("const s = 'abc\n", "文字列が閉じていません"),
+            ('const A = () => </div>;\n', "対応する開始タグの無い閉じタグがあります"),
+        ]
+        for source, message in cases:
+            problem = validate.check(source)
+            self.assertIsNotNone(problem, source)
+            self.assertEqual(problem[2], message)
+
+    def test_position(self):
+        self.assertEqual(validate.check('a;\nb = (c;\n'), (2, 5, "( が閉じていません"))
+
+    def test_ts_type_assertion(self):
+        # .ts では '<' を JSX とみなさない
+        self.assertIsNone(validate.check(TYPE_ASSERTION, jsx=False))
+        self.assertIsNotNone(validate.check(TYPE_ASSERTION))
+
+
+class CheckFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, content):
+        path = Path(self.tmp.name) / name
+        path.write_text(content, encoding='utf-8')
+        return path
+
+    def test_extension(self):
+        self.assertIsNone(validate.check_file(self.write('a.ts', TYPE_ASSERTION)))
+        self.assertIsNotNone(validate.check_file(self.write('a.tsx', TYPE_ASSERTION)))
+
+    def test_staged_uses_original_path(self):
+        # 一時ファイルの名前 (a.ts.staged) ではなく元のパスで JSX を含むかを決める
+        staged = self.write('a.ts.staged', TYPE_ASSERTION)
+        self.assertIsNone(validate.check_file(staged, jsx=validate.is_jsx('a.ts')))
+        results = validate.check_files([staged], jsx=[validate.is_jsx('a.ts')])
+        self.assertEqual(results, [(str(staged), None)])
+
+    def test_not_utf8(self):
+        self.assertEqual(validate.check_file('a.tsx', data=b'\xff'), (1, 1, "UTF-8 として読めません"))
+
+
+if __name__ == '__main__':
+    unittest.main()